@@ -0,0 +1,127 @@
+import argparse
+from datetime import date, timedelta
+from typing import List, Dict, Tuple
+import numpy as np
+from database import Database, Stock
+from forecast import load_daily_demand, to_weekly
+from analytics import SALE_LINES, sale_lines_period
+
+HISTORY_WEEKS = 26
+
+# ABC: share of revenue, most valuable SKUs first. A SKU belongs to the class
+# in which its cumulative share starts.
+A_SHARE = 0.80
+B_SHARE = 0.95
+
+# XYZ: coefficient of variation of weekly units
+X_CV = 0.5
+Y_CV = 1.0
+
+# Safety-stock z-score per ABC class (roughly 95%, 90% and 80% service)
+SERVICE_Z = {"A": 1.65, "B": 1.28, "C": 0.84}
+LEAD_TIME_DAYS = 7
+
+
+def abc_classes(revenue: np.ndarray, a_share: float = A_SHARE, b_share: float = B_SHARE) -> np.ndarray:
+    """A/B/C per SKU from its place in the cumulative revenue curve"""
+    revenue = np.asarray(revenue, dtype=np.float64)
+    classes = np.full(len(revenue), "C", dtype="<U1")
+    total = revenue.sum()
+    if total <= 0:
+        return classes
+    order = np.argsort(-revenue, kind="stable")
+    share_before = (np.cumsum(revenue[order]) - revenue[order]) / total
+    ranked = np.where(share_before < a_share, "A", np.where(share_before < b_share, "B", "C"))
+    ranked[revenue[order] <= 0] = "C"
+    classes[order] = ranked
+    return classes
+
+
+def xyz_classes(weekly_units: np.ndarray, x_cv: float = X_CV, y_cv: float = Y_CV) -> Tuple[np.ndarray, np.ndarray]:
+    """X/Y/Z per SKU and the coefficient of variation it was based on"""
+    mean = weekly_units.mean(axis=1)
+    std = weekly_units.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = np.where(mean > 0, std / mean, np.inf)
+    classes = np.where(cv <= x_cv, "X", np.where(cv <= y_cv, "Y", "Z"))
+    return classes, cv
+
+
+def suggested_reorder_levels(weekly_units: np.ndarray, abc: np.ndarray,
+                             lead_time_days: float = LEAD_TIME_DAYS) -> np.ndarray:
+    """Demand over the lead time plus class-dependent safety stock"""
+    z = np.vectorize(SERVICE_Z.get, otypes=[np.float64])(abc)
+    weeks = lead_time_days / 7
+    mean = weekly_units.mean(axis=1)
+    std = weekly_units.std(axis=1)
+    return np.ceil(mean * weeks + z * std * np.sqrt(weeks)).astype(np.int64)
+
+
+def load_revenue(medicine_ids: np.ndarray, start: date) -> np.ndarray:
+    rows = Database.fetch_all(
+        f"""SELECT l.medicine_id, SUM(l.revenue) AS revenue
+            FROM {SALE_LINES} l
+            GROUP BY l.medicine_id""",
+        sale_lines_period(start)
+    )
+    revenue = np.zeros(len(medicine_ids), dtype=np.float64)
+    if rows and len(medicine_ids):
+        row_ids = np.fromiter((r["medicine_id"] for r in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((r["revenue"] for r in rows), dtype=np.float64, count=len(rows))
+        index = np.minimum(np.searchsorted(medicine_ids, row_ids), len(medicine_ids) - 1)
+        keep = medicine_ids[index] == row_ids
+        revenue[index[keep]] = values[keep]
+    return revenue
+
+
+def classify(history_weeks: int = HISTORY_WEEKS, lead_time_days: float = LEAD_TIME_DAYS) -> Dict[str, np.ndarray]:
+    """ABC and XYZ class, CV and a suggested reorder level for every medicine"""
+    medicine_ids, daily, _ = load_daily_demand(history_weeks * 7)
+    weekly = to_weekly(daily)
+    revenue = load_revenue(medicine_ids, date.today() - timedelta(days=history_weeks * 7))
+    abc = abc_classes(revenue)
+    xyz, cv = xyz_classes(weekly)
+    return {
+        "medicine_id": medicine_ids,
+        "revenue": revenue,
+        "abc": abc,
+        "xyz": xyz,
+        "cv": cv,
+        "reorder_level": suggested_reorder_levels(weekly, abc, lead_time_days),
+        "has_demand": weekly.sum(axis=1) > 0,
+    }
+
+
+def get_classification(history_weeks: int = HISTORY_WEEKS) -> List[Dict]:
+    result = classify(history_weeks)
+    return [
+        {
+            "medicine_id": int(result["medicine_id"][i]),
+            "revenue": float(result["revenue"][i]),
+            "class": result["abc"][i] + result["xyz"][i],
+            "cv": float(result["cv"][i]),
+            "suggested_reorder_level": int(result["reorder_level"][i]),
+        }
+        for i in np.argsort(-result["revenue"], kind="stable")
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ABC/XYZ inventory classification")
+    parser.add_argument("--weeks", type=int, default=HISTORY_WEEKS, help="Weeks of sales history to use")
+    parser.add_argument("--lead-time", type=float, default=LEAD_TIME_DAYS, help="Replenishment lead time in days")
+    parser.add_argument("--apply", action="store_true", help="Write suggested reorder levels to stock")
+    args = parser.parse_args()
+
+    result = classify(args.weeks, args.lead_time)
+    labels, counts = np.unique(np.char.add(result["abc"], result["xyz"]), return_counts=True)
+    for label, count in zip(labels, counts):
+        print(f"{label}: {count} medicines")
+    if args.apply:
+        # Without sales in the window the suggestion is 0, which says nothing
+        # about the right level; keep whatever is set for those medicines
+        demand = result["has_demand"]
+        updated = Stock.set_reorder_levels(list(zip(result["medicine_id"][demand].tolist(),
+                                                    result["reorder_level"][demand].tolist())))
+        print(f"Updated reorder level on {updated} stock rows; "
+              f"kept {int((~demand).sum())} without sales in the window")
@@ -0,0 +1,136 @@
+import argparse
+from datetime import datetime
+from typing import List, Dict, Tuple
+from database import Database, SalesRollup
+
+# Every report aggregates inside MySQL and returns at most a few hundred rows.
+# The queries are module constants so bench_analytics.py can time exactly
+# what the application runs.
+
+# Every sold line in a period: order lines plus the counter bills SalesManager
+# writes to `sales`. A bill's lines share its order_key, which stands in for
+# the order id as the basket; legacy sales without one are a basket each.
+# Takes the (start, end) period twice, see sale_lines_period().
+SALE_LINES = """(
+        SELECT CONCAT('o', o.order_id) AS basket, oi.medicine_id, oi.quantity,
+               oi.subtotal AS revenue, o.order_date AS sold_at
+        FROM order_items oi
+        JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.order_date >= %s AND o.order_date < %s
+        UNION ALL
+        SELECT COALESCE(s.order_key, CONCAT('s', s.sale_id)), s.medicine_id, s.quantity,
+               s.total_price, s.sale_date
+        FROM sales s
+        WHERE s.sale_date >= %s AND s.sale_date < %s
+    )"""
+
+TOP_SELLERS_QUERY = """
+    SELECT m.medicine_id, m.name,
+           SUM(l.quantity) AS units_sold,
+           SUM(l.revenue) AS revenue
+    FROM """ + SALE_LINES + """ l
+    JOIN medicines m ON l.medicine_id = m.medicine_id
+    GROUP BY m.medicine_id, m.name
+    ORDER BY units_sold DESC
+    LIMIT %s
+"""
+
+MONTHLY_REVENUE_QUERY = """
+    SELECT t.year, t.month, t.orders, t.revenue,
+           SUM(t.revenue) OVER (ORDER BY t.year, t.month) AS running_revenue,
+           t.revenue - LAG(t.revenue) OVER (ORDER BY t.year, t.month) AS change_from_previous
+    FROM (
+        SELECT YEAR(l.sold_at) AS year, MONTH(l.sold_at) AS month,
+               COUNT(DISTINCT l.basket) AS orders, SUM(l.revenue) AS revenue
+        FROM """ + SALE_LINES + """ l
+        GROUP BY YEAR(l.sold_at), MONTH(l.sold_at)
+    ) t
+    ORDER BY t.year, t.month
+"""
+
+EMPLOYEE_PERFORMANCE_QUERY = """
+    SELECT e.employee_id, e.name, t.orders, t.revenue,
+           RANK() OVER (ORDER BY t.revenue DESC) AS revenue_rank,
+           t.revenue / SUM(t.revenue) OVER () AS revenue_share
+    FROM (
+        SELECT employee_id, COUNT(*) AS orders, SUM(total_amount) AS revenue
+        FROM orders
+        WHERE employee_id IS NOT NULL AND order_date >= %s AND order_date < %s
+        GROUP BY employee_id
+    ) t
+    JOIN employees e ON t.employee_id = e.employee_id
+    ORDER BY revenue_rank
+"""
+
+LOW_STOCK_QUERY = """
+    SELECT medicine_id, name, quantity
+    FROM medicines
+    WHERE quantity < %s
+    ORDER BY quantity
+"""
+
+# order_count is per (day, medicine, employee), so an order with N medicines
+# contributes N to the sum: it counts order lines, not orders
+ROLLUP_REVENUE_QUERY = """
+    SELECT YEAR(sale_date) AS year, {period}(sale_date) AS {period_name},
+           SUM(quantity) AS units, SUM(revenue) AS revenue, SUM(order_count) AS order_lines
+    FROM daily_sales_rollup
+    WHERE sale_date >= %s AND sale_date < %s
+    GROUP BY YEAR(sale_date), {period}(sale_date)
+    ORDER BY year, {period_name}
+"""
+
+# Wide enough to cover any order date without special-casing "no filter"
+ALL_TIME = (datetime(1970, 1, 1), datetime(9999, 12, 31))
+
+
+def _period(start: datetime = None, end: datetime = None) -> Tuple[datetime, datetime]:
+    return (start or ALL_TIME[0], end or ALL_TIME[1])
+
+
+def sale_lines_period(start=None, end=None) -> Tuple:
+    """Parameters for SALE_LINES: the period once per branch"""
+    return _period(start, end) * 2
+
+
+def top_sellers(limit: int = 10, start: datetime = None, end: datetime = None) -> List[Dict]:
+    """Best-selling medicines by units sold, orders and counter bills together"""
+    return Database.fetch_all(TOP_SELLERS_QUERY, sale_lines_period(start, end) + (limit,))
+
+
+def monthly_revenue(start: datetime = None, end: datetime = None) -> List[Dict]:
+    """Item revenue per calendar month with a running total and month-on-month change.
+
+    Each order and each counter bill counts as one in `orders`.
+    """
+    return Database.fetch_all(MONTHLY_REVENUE_QUERY, sale_lines_period(start, end))
+
+
+def rollup_revenue(period: str = "month", start: datetime = None, end: datetime = None) -> List[Dict]:
+    """Units, revenue and order lines per month or quarter, read from daily_sales_rollup"""
+    if period not in ("month", "quarter"):
+        raise ValueError("period must be 'month' or 'quarter'")
+    query = ROLLUP_REVENUE_QUERY.format(period=period.upper(), period_name=period)
+    return Database.fetch_all(query, _period(start, end))
+
+
+def employee_performance(start: datetime = None, end: datetime = None) -> List[Dict]:
+    """Orders and revenue per employee, ranked, with each one's share of the total"""
+    return Database.fetch_all(EMPLOYEE_PERFORMANCE_QUERY, _period(start, end))
+
+
+def low_stock(threshold: int = 20) -> List[Dict]:
+    """Medicines with fewer than threshold units on hand"""
+    return Database.fetch_all(LOW_STOCK_QUERY, (threshold,))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sales analytics maintenance")
+    parser.add_argument("--backfill-rollup", action="store_true",
+                        help="Rebuild daily_sales_rollup from orders and sales history")
+    args = parser.parse_args()
+
+    if args.backfill_rollup:
+        print(f"daily_sales_rollup rebuilt with {SalesRollup.backfill()} rows")
+    else:
+        parser.print_help()
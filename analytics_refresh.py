@@ -0,0 +1,191 @@
+import argparse
+from datetime import datetime, date, timedelta
+from typing import List, Dict
+from database import Database
+from analytics import ALL_TIME
+
+PIPELINE = "daily_sales"
+
+# Orders and counter bills (`sales` rows) each have their own id watermark.
+# Rows younger than this are left for the next run, so a checkout that took
+# an id but has not committed yet cannot slip under the watermark.
+SETTLE_SECONDS = 60
+
+# A transaction can still commit after SETTLE_SECONDS, below an order_id the
+# watermark has already passed. Every run therefore recomputes the days from
+# RESCAN_DAYS ago onwards from scratch, which picks such orders up as long as
+# they commit within that window.
+RESCAN_DAYS = 2
+
+FOLD_MEDICINE_SALES = """
+    INSERT INTO daily_medicine_sales (sale_date, medicine_id, units, revenue, order_lines)
+    SELECT DATE(o.order_date), oi.medicine_id, SUM(oi.quantity), SUM(oi.subtotal), COUNT(*)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.order_id
+    WHERE o.order_id <= %s AND (o.order_id > %s OR o.order_date >= %s)
+    GROUP BY DATE(o.order_date), oi.medicine_id
+    ON DUPLICATE KEY UPDATE
+        units = units + VALUES(units),
+        revenue = revenue + VALUES(revenue),
+        order_lines = order_lines + VALUES(order_lines)
+"""
+
+# Counter bills have no employee, so they feed daily_medicine_sales only
+FOLD_BILL_SALES = """
+    INSERT INTO daily_medicine_sales (sale_date, medicine_id, units, revenue, order_lines)
+    SELECT DATE(s.sale_date), s.medicine_id, SUM(s.quantity), SUM(s.total_price), COUNT(*)
+    FROM sales s
+    WHERE s.sale_id <= %s AND (s.sale_id > %s OR s.sale_date >= %s)
+    GROUP BY DATE(s.sale_date), s.medicine_id
+    ON DUPLICATE KEY UPDATE
+        units = units + VALUES(units),
+        revenue = revenue + VALUES(revenue),
+        order_lines = order_lines + VALUES(order_lines)
+"""
+
+FOLD_EMPLOYEE_SALES = """
+    INSERT INTO daily_employee_sales (sale_date, employee_id, orders, revenue)
+    SELECT DATE(o.order_date), o.employee_id, COUNT(*), SUM(o.total_amount)
+    FROM orders o
+    WHERE o.order_id <= %s AND (o.order_id > %s OR o.order_date >= %s) AND o.employee_id IS NOT NULL
+    GROUP BY DATE(o.order_date), o.employee_id
+    ON DUPLICATE KEY UPDATE
+        orders = orders + VALUES(orders),
+        revenue = revenue + VALUES(revenue)
+"""
+
+
+def get_watermark() -> Dict:
+    row = Database.fetch_one(
+        """SELECT last_order_id, last_order_created_at, last_sale_id, refreshed_at
+           FROM analytics_watermarks WHERE pipeline = %s""",
+        (PIPELINE,)
+    )
+    return row or {"last_order_id": 0, "last_order_created_at": None, "last_sale_id": 0, "refreshed_at": None}
+
+
+def refresh() -> int:
+    """Fold orders and counter bills above the watermarks into the daily aggregates.
+
+    The last RESCAN_DAYS days are deleted and recomputed on every run (see
+    RESCAN_DAYS). Aggregates and the new watermark are written in one
+    transaction, so a failed run leaves both untouched and is simply
+    retried. Returns the number of orders above the old watermark.
+    """
+    watermark = get_watermark()
+    last_order_id = watermark["last_order_id"]
+    last_sale_id = watermark["last_sale_id"]
+    rescan_from = date.today() - timedelta(days=RESCAN_DAYS)
+    conn = Database.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """SELECT MAX(order_id) AS max_id, COUNT(*) AS new_orders, MAX(created_at) AS max_created
+               FROM orders
+               WHERE order_id > %s AND created_at < NOW() - INTERVAL %s SECOND""",
+            (last_order_id, SETTLE_SECONDS)
+        )
+        batch = cursor.fetchone()
+        if not batch or batch["max_id"] is None:
+            batch = {"max_id": last_order_id, "new_orders": 0,
+                     "max_created": watermark["last_order_created_at"]}
+        cursor.execute(
+            """SELECT MAX(sale_id) AS max_id FROM sales
+               WHERE sale_id > %s AND created_at < NOW() - INTERVAL %s SECOND""",
+            (last_sale_id, SETTLE_SECONDS)
+        )
+        bills = cursor.fetchone()
+        max_sale_id = bills["max_id"] if bills and bills["max_id"] is not None else last_sale_id
+
+        cursor.execute("DELETE FROM daily_medicine_sales WHERE sale_date >= %s", (rescan_from,))
+        cursor.execute("DELETE FROM daily_employee_sales WHERE sale_date >= %s", (rescan_from,))
+        cursor.execute(FOLD_MEDICINE_SALES, (batch["max_id"], last_order_id, rescan_from))
+        cursor.execute(FOLD_BILL_SALES, (max_sale_id, last_sale_id, rescan_from))
+        cursor.execute(FOLD_EMPLOYEE_SALES, (batch["max_id"], last_order_id, rescan_from))
+        cursor.execute(
+            """INSERT INTO analytics_watermarks (pipeline, last_order_id, last_order_created_at, last_sale_id)
+               VALUES (%s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE
+                   last_order_id = VALUES(last_order_id),
+                   last_order_created_at = VALUES(last_order_created_at),
+                   last_sale_id = VALUES(last_sale_id)""",
+            (PIPELINE, batch["max_id"], batch["max_created"], max_sale_id)
+        )
+        conn.commit()
+        return batch["new_orders"]
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Failed to refresh analytics: {str(e)}")
+    finally:
+        Database.close_connection(conn, cursor)
+
+
+def rebuild() -> int:
+    """Discard the aggregates and recompute them from all history.
+
+    Use after editing or deleting past orders or bills, which the incremental
+    refresh does not see.
+    """
+    conn = Database.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM daily_medicine_sales")
+        cursor.execute("DELETE FROM daily_employee_sales")
+        cursor.execute("DELETE FROM analytics_watermarks WHERE pipeline = %s", (PIPELINE,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Failed to reset analytics: {str(e)}")
+    finally:
+        Database.close_connection(conn, cursor)
+    return refresh()
+
+
+def top_sellers(limit: int = 10, start: date = None, end: date = None) -> List[Dict]:
+    """Best-selling medicines, orders and counter bills, read from the daily aggregates"""
+    return Database.fetch_all(
+        """SELECT m.medicine_id, m.name, SUM(d.units) AS units_sold, SUM(d.revenue) AS revenue
+           FROM daily_medicine_sales d
+           JOIN medicines m ON d.medicine_id = m.medicine_id
+           WHERE d.sale_date >= %s AND d.sale_date < %s
+           GROUP BY m.medicine_id, m.name
+           ORDER BY units_sold DESC
+           LIMIT %s""",
+        (start or ALL_TIME[0], end or ALL_TIME[1], limit)
+    )
+
+
+def monthly_revenue(start: date = None, end: date = None) -> List[Dict]:
+    """Item revenue per calendar month, orders and counter bills, read from the daily aggregates"""
+    return Database.fetch_all(
+        """SELECT YEAR(sale_date) AS year, MONTH(sale_date) AS month, SUM(revenue) AS revenue
+           FROM daily_medicine_sales
+           WHERE sale_date >= %s AND sale_date < %s
+           GROUP BY YEAR(sale_date), MONTH(sale_date)
+           ORDER BY year, month""",
+        (start or ALL_TIME[0], end or ALL_TIME[1])
+    )
+
+
+def employee_performance(start: date = None, end: date = None) -> List[Dict]:
+    """Orders and revenue per employee read from the daily aggregates; counter bills have no employee"""
+    return Database.fetch_all(
+        """SELECT e.employee_id, e.name, SUM(d.orders) AS orders, SUM(d.revenue) AS revenue
+           FROM daily_employee_sales d
+           JOIN employees e ON d.employee_id = e.employee_id
+           WHERE d.sale_date >= %s AND d.sale_date < %s
+           GROUP BY e.employee_id, e.name
+           ORDER BY revenue DESC""",
+        (start or ALL_TIME[0], end or ALL_TIME[1])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the daily sales aggregates")
+    parser.add_argument("--full", action="store_true", help="Rebuild from all history instead of the watermark")
+    args = parser.parse_args()
+
+    folded = rebuild() if args.full else refresh()
+    watermark = get_watermark()
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} folded {folded} orders; "
+          f"watermark at order {watermark['last_order_id']}, sale {watermark['last_sale_id']}")
@@ -0,0 +1,21 @@
+import os
+
+# Model classes and the change feed for the Tk managers. With
+# PHARMACY_SERVICE_URL set (e.g. http://127.0.0.1:8765) they are proxies to
+# the shared service_api process; otherwise they talk to MySQL directly, as
+# before.
+CLIENT_MODE = bool(os.environ.get("PHARMACY_SERVICE_URL"))
+
+if CLIENT_MODE:
+    from database import Database
+    # A terminal in client mode must not open its own pool; anything still
+    # reaching for MySQL directly fails instead of quietly connecting
+    Database.DIRECT_ACCESS = False
+    from service_client import Medicine, Customer, Order, Prescription, Supplier, Employee, Sale, Stock, PurchaseOrder
+    from service_client import RemoteChangeFeed as ChangeFeed
+else:
+    from database import Medicine, Customer, Order, Prescription, Supplier, Employee, Sale, Stock, PurchaseOrder
+    from change_feed import ChangeFeed
+
+__all__ = ["CLIENT_MODE", "Medicine", "Customer", "Order", "Prescription", "Supplier", "Employee", "Sale",
+           "Stock", "PurchaseOrder", "ChangeFeed"]
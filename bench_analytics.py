@@ -0,0 +1,113 @@
+# Compares the old load-everything-into-pandas analysis with SQL pushdown.
+#
+# Builds a scratch database (pharmacy_bench by default) holding N order_items
+# rows, three items per order, then times both approaches for top sellers,
+# monthly revenue and employee performance:
+#
+#     python bench_analytics.py --rows 10000000
+#
+# The scratch database is dropped again unless --keep is given.
+import argparse
+import time
+import mysql.connector
+import pandas as pd
+import analytics
+
+CONNECTION = {"host": "localhost", "user": "root", "password": ""}
+MEDICINES = 1000
+EMPLOYEES = 50
+
+
+def build_dataset(cursor, rows: int):
+    """Generate rows server-side from a digits cross join, avoiding client round trips"""
+    cursor.execute("CREATE TABLE digits (d int NOT NULL PRIMARY KEY)")
+    cursor.execute("INSERT INTO digits VALUES (0), (1), (2), (3), (4), (5), (6), (7), (8), (9)")
+    places = max(1, len(str(rows - 1)))
+    number = " + ".join(f"d{i}.d * {10 ** i}" for i in range(places))
+    joins = ", ".join(f"digits d{i}" for i in range(places))
+    cursor.execute(f"CREATE TABLE seq (n int NOT NULL PRIMARY KEY) SELECT {number} AS n FROM {joins}")
+    cursor.execute("DELETE FROM seq WHERE n >= %s", (rows,))
+
+    cursor.execute("""CREATE TABLE medicines (
+        medicine_id int NOT NULL PRIMARY KEY, name varchar(100) NOT NULL, quantity int NOT NULL)""")
+    cursor.execute("""INSERT INTO medicines
+        SELECT n + 1, CONCAT('Medicine ', n + 1), MOD(n, 200) FROM seq WHERE n < %s""", (MEDICINES,))
+    cursor.execute("""CREATE TABLE employees (
+        employee_id int NOT NULL PRIMARY KEY, name varchar(100) NOT NULL)""")
+    cursor.execute("""INSERT INTO employees
+        SELECT n + 1, CONCAT('Employee ', n + 1) FROM seq WHERE n < %s""", (EMPLOYEES,))
+    cursor.execute("""CREATE TABLE orders (
+        order_id int NOT NULL PRIMARY KEY, employee_id int, total_amount decimal(10, 2) NOT NULL,
+        order_date timestamp NOT NULL, KEY employee_id (employee_id), KEY order_date (order_date))""")
+    cursor.execute("""INSERT INTO orders
+        SELECT n DIV 3 + 1, MOD(n DIV 3, %s) + 1, 0, TIMESTAMP('2020-01-01') + INTERVAL MOD(n DIV 3, 43800) HOUR
+        FROM seq WHERE MOD(n, 3) = 0""", (EMPLOYEES,))
+    cursor.execute("""CREATE TABLE order_items (
+        item_id int NOT NULL PRIMARY KEY, order_id int NOT NULL, medicine_id int NOT NULL,
+        quantity int NOT NULL, unit_price decimal(10, 2) NOT NULL, subtotal decimal(10, 2) NOT NULL,
+        KEY order_id (order_id), KEY medicine_id (medicine_id))""")
+    cursor.execute("""INSERT INTO order_items
+        SELECT n + 1, n DIV 3 + 1, MOD(n * 7919, %s) + 1, MOD(n, 5) + 1, 2.50, (MOD(n, 5) + 1) * 2.50
+        FROM seq""", (MEDICINES,))
+    cursor.execute("""UPDATE orders o JOIN (
+        SELECT order_id, SUM(subtotal) AS total FROM order_items GROUP BY order_id) t
+        ON o.order_id = t.order_id SET o.total_amount = t.total""")
+
+
+def pandas_reports(conn):
+    """The original data_analysis.py approach: pull whole tables, group client-side"""
+    items = pd.read_sql("SELECT * FROM order_items", conn)
+    orders = pd.read_sql("SELECT * FROM orders", conn)
+    medicines = pd.read_sql("SELECT * FROM medicines", conn)
+    employees = pd.read_sql("SELECT * FROM employees", conn)
+
+    merged = items.merge(medicines, on="medicine_id")
+    merged.groupby("name")["quantity_x"].sum().sort_values(ascending=False).head(10)
+    orders["month"] = pd.to_datetime(orders["order_date"]).dt.to_period("M")
+    orders.groupby("month")["total_amount"].sum()
+    orders.groupby("employee_id")["total_amount"].sum().reset_index().merge(employees, on="employee_id")
+
+
+def pushdown_reports(cursor):
+    period = analytics.ALL_TIME
+    cursor.execute(analytics.TOP_SELLERS_QUERY, analytics.sale_lines_period() + (10,))
+    cursor.fetchall()
+    cursor.execute(analytics.MONTHLY_REVENUE_QUERY, analytics.sale_lines_period())
+    cursor.fetchall()
+    cursor.execute(analytics.EMPLOYEE_PERFORMANCE_QUERY, period)
+    cursor.fetchall()
+
+
+def timed(label: str, func, *args):
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed:8.2f} s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pandas analysis against SQL pushdown")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="order_items rows to generate")
+    parser.add_argument("--database", default="pharmacy_bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**CONNECTION)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+        cursor.execute(f"CREATE DATABASE {args.database}")
+        cursor.execute(f"USE {args.database}")
+        print(f"Generating {args.rows:,} order_items rows...")
+        timed("build dataset", build_dataset, cursor, args.rows)
+        conn.commit()
+
+        pandas_time = timed("pandas (load + group)", pandas_reports, conn)
+        pushdown_time = timed("SQL pushdown", pushdown_reports, cursor)
+        print(f"Speed-up: {pandas_time / pushdown_time:.1f}x")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+        cursor.close()
+        conn.close()
@@ -0,0 +1,66 @@
+# Measures how long receipt handling keeps the checkout handler busy.
+#
+# "inline" reproduces the old SalesManager path: load the three fonts and
+# draw and save the PNG before returning. "queued" is the current path: build
+# the receipt dict and hand it to the ReceiptRenderer workers. Rendering still
+# happens in the background, so the run also reports how long the queue takes
+# to drain.
+#
+#     python bench_receipts.py --checkouts 200 --lines 8
+import argparse
+import statistics
+import tempfile
+import time
+from receipts import ReceiptRenderer, build_receipt, get_fonts, receipt_path, render_png
+
+
+def make_bill(lines: int):
+    bill = [(f"Medicine {i} 500mg tablets", i % 3 + 1, 2.5 + i, (i % 3 + 1) * (2.5 + i)) for i in range(lines)]
+    return bill, sum(line[3] for line in bill)
+
+
+def checkout_inline(bill, total, receipt_dir):
+    get_fonts.cache_clear()
+    receipt = build_receipt(bill, total, {"name": "Jane Smith", "phone": "9876543210"})
+    render_png(receipt, receipt_path(receipt, receipt_dir))
+
+
+def checkout_queued(renderer, bill, total):
+    renderer.submit(build_receipt(bill, total, {"name": "Jane Smith", "phone": "9876543210"}))
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<8} median {statistics.median(samples) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkout latency with inline vs queued receipt rendering")
+    parser.add_argument("--checkouts", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=8, help="Items per bill")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    bill, total = make_bill(args.lines)
+    with tempfile.TemporaryDirectory() as receipt_dir:
+        inline = []
+        for _ in range(args.checkouts):
+            started = time.perf_counter()
+            checkout_inline(bill, total, receipt_dir)
+            inline.append(time.perf_counter() - started)
+
+        renderer = ReceiptRenderer(args.workers, receipt_dir)
+        queued = []
+        drain_started = time.perf_counter()
+        for _ in range(args.checkouts):
+            started = time.perf_counter()
+            checkout_queued(renderer, bill, total)
+            queued.append(time.perf_counter() - started)
+        renderer.jobs.join()
+        drained = time.perf_counter() - drain_started
+        renderer.shutdown()
+
+    report("inline", inline)
+    report("queued", queued)
+    print(f"Queue of {args.checkouts} receipts rendered in the background in {drained:.2f} s")
@@ -0,0 +1,300 @@
+import csv
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import List, Dict, Tuple, Iterator
+from database import Database
+
+
+def _to_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{value}' is not an integer")
+
+
+def _to_positive_int(value: str) -> int:
+    number = _to_int(value)
+    if number <= 0:
+        raise ValueError(f"'{value}' must be positive")
+    return number
+
+
+def _to_decimal(value: str) -> Decimal:
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"'{value}' is not a number")
+    if number < 0:
+        raise ValueError(f"'{value}' must not be negative")
+    return number.quantize(Decimal("0.01"))
+
+
+def _to_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"'{value}' is not a YYYY-MM-DD date")
+
+
+def _max_length(length: int):
+    def convert(value: str) -> str:
+        if len(value) > length:
+            raise ValueError(f"'{value[:20]}...' is longer than {length} characters")
+        return value
+    return convert
+
+
+# Column converters, required columns and foreign keys for every importable
+# entity, mirroring the table definitions in pharmacy_db.sql.
+IMPORT_SCHEMAS = {
+    "medicines": {
+        "table": "medicines",
+        "columns": OrderedDict([
+            ("name", _max_length(100)),
+            ("quantity", _to_int),
+            ("price", _to_decimal),
+            ("expiry_date", _to_date),
+            ("manufacturer", _max_length(100)),
+            ("batch_number", _max_length(50)),
+            ("category", _max_length(50)),
+            ("description", str),
+            ("supplier_id", _to_int),
+            ("sku", _max_length(64)),
+        ]),
+        "required": ("name", "price", "supplier_id"),
+        "references": {"supplier_id": ("suppliers", "supplier_id")},
+        # NULLs never collide in the name_batch unique key, so a blank batch
+        # is stored as '' to make re-imports upsert instead of duplicating
+        "blanks": {"batch_number": ""},
+    },
+    "customers": {
+        "table": "customers",
+        "columns": OrderedDict([
+            ("name", _max_length(100)),
+            ("phone", _max_length(15)),
+            ("email", _max_length(100)),
+            ("address", str),
+            ("age", _to_int),
+            ("loyalty_points", _to_int),
+        ]),
+        "required": ("name", "email"),
+        "references": {},
+    },
+    "stock": {
+        "table": "stock",
+        "columns": OrderedDict([
+            ("medicine_id", _to_int),
+            ("quantity", _to_positive_int),
+            ("reorder_level", _to_int),
+            ("received_date", _to_date),
+        ]),
+        "required": ("medicine_id", "quantity"),
+        "references": {"medicine_id": ("medicines", "medicine_id")},
+    },
+}
+
+
+class ImportReport:
+    """Outcome of one bulk import: row counts and per-row errors."""
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.processed = 0
+        self.imported = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def add_error(self, line_no: int, message: str):
+        self.errors.append((line_no, message))
+
+    def summary(self) -> str:
+        return (f"{self.entity}: {self.processed} rows read, {self.imported} imported, "
+                f"{len(self.errors)} rejected")
+
+
+class BulkImporter:
+    """Stream a CSV/TSV file into one table in validated, multi-row batches.
+
+    Rows that fail validation are reported with their line number and the
+    rest of the file keeps loading. Medicines upsert on (name, batch_number),
+    customers on email, and stock receipts add to quantity_in_stock.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, entity: str, batch_size: int = None):
+        if entity not in IMPORT_SCHEMAS:
+            raise ValueError(f"Unknown import type '{entity}'. "
+                             f"Expected one of: {', '.join(IMPORT_SCHEMAS)}")
+        self.entity = entity
+        self.schema = IMPORT_SCHEMAS[entity]
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    def import_file(self, path: str, delimiter: str = None) -> ImportReport:
+        """Import a file, choosing tab or comma from the extension if not given"""
+        if delimiter is None:
+            delimiter = "\t" if path.lower().endswith((".tsv", ".tab")) else ","
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            return self.import_stream(handle, delimiter)
+
+    def import_stream(self, handle, delimiter: str = ",") -> ImportReport:
+        report = ImportReport(self.entity)
+        reader = csv.DictReader(handle, delimiter=delimiter)
+        if not reader.fieldnames:
+            raise ValueError("Import file has no header row")
+
+        headers = [h.strip().lower() for h in reader.fieldnames]
+        missing = [c for c in self.schema["required"] if c not in headers]
+        if missing:
+            raise ValueError(f"Import file is missing required columns: {', '.join(missing)}")
+        reader.fieldnames = headers
+        # Only columns present in the file are written, so a partial catalogue
+        # update does not blank out fields it does not mention
+        columns = [c for c in self.schema["columns"] if c in headers]
+
+        for batch in self._batches(reader):
+            records = []
+            for line_no, row in batch:
+                report.processed += 1
+                try:
+                    records.append((line_no, self._validate(row)))
+                except ValueError as e:
+                    report.add_error(line_no, str(e))
+            records = self._check_references(records, report)
+            if records:
+                self._write_batch(records, columns, report)
+        return report
+
+    def _batches(self, reader: csv.DictReader) -> Iterator[List[Tuple[int, Dict]]]:
+        rows = ((reader.line_num, row) for row in reader)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _validate(self, row: Dict) -> Dict:
+        record = {}
+        for column, convert in self.schema["columns"].items():
+            raw = (row.get(column) or "").strip()
+            if not raw:
+                if column in self.schema["required"]:
+                    raise ValueError(f"{column} is required")
+                record[column] = self.schema.get("blanks", {}).get(column)
+                continue
+            try:
+                record[column] = convert(raw)
+            except ValueError as e:
+                raise ValueError(f"{column}: {e}")
+        return record
+
+    def _check_references(self, records: List[Tuple[int, Dict]], report: ImportReport) -> List[Tuple[int, Dict]]:
+        """Reject rows pointing at missing parents with one lookup per batch"""
+        for column, (table, key) in self.schema["references"].items():
+            wanted = {r[column] for _, r in records if r[column] is not None}
+            if not wanted:
+                continue
+            placeholders = ", ".join(["%s"] * len(wanted))
+            found = Database.fetch_all(
+                f"SELECT {key} FROM {table} WHERE {key} IN ({placeholders})", tuple(wanted)
+            )
+            known = {row[key] for row in found}
+            valid = []
+            for line_no, record in records:
+                if record[column] is not None and record[column] not in known:
+                    report.add_error(line_no, f"{column} {record[column]} does not exist in {table}")
+                else:
+                    valid.append((line_no, record))
+            records = valid
+        return records
+
+    def _write_batch(self, records: List[Tuple[int, Dict]], columns: List[str], report: ImportReport):
+        """Write a batch in one transaction, retrying row by row if it fails"""
+        try:
+            self._execute([r for _, r in records], columns)
+            report.imported += len(records)
+        except Exception:
+            for line_no, record in records:
+                try:
+                    self._execute([record], columns)
+                    report.imported += 1
+                except Exception as e:
+                    report.add_error(line_no, f"Database rejected row: {str(e)}")
+
+    def _execute(self, records: List[Dict], columns: List[str]):
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            if self.entity == "stock":
+                self._write_stock(cursor, records)
+            else:
+                self._write_upsert(cursor, records, columns)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            Database.close_connection(conn, cursor)
+
+    def _write_upsert(self, cursor, records: List[Dict], columns: List[str]):
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        updates = ", ".join(f"{c} = VALUES({c})" for c in columns)
+        query = (f"INSERT INTO {self.schema['table']} ({', '.join(columns)}) "
+                 f"VALUES {', '.join([row_placeholder] * len(records))} "
+                 f"ON DUPLICATE KEY UPDATE {updates}")
+        params = []
+        for record in records:
+            params.extend(record[c] for c in columns)
+        cursor.execute(query, tuple(params))
+
+    def _write_stock(self, cursor, records: List[Dict]):
+        """Add received quantities to stock and to the medicine's on-hand count"""
+        received = OrderedDict()
+        for record in records:
+            entry = received.setdefault(record["medicine_id"], {
+                "quantity": 0, "reorder_level": None, "received_date": None
+            })
+            entry["quantity"] += record["quantity"]
+            if record["reorder_level"] is not None:
+                entry["reorder_level"] = record["reorder_level"]
+            entry["received_date"] = record["received_date"] or entry["received_date"]
+
+        today = date.today()
+        params = []
+        for medicine_id, entry in received.items():
+            params.extend((medicine_id, entry["quantity"], entry["reorder_level"],
+                           entry["received_date"] or today))
+        cursor.execute(
+            f"""INSERT INTO stock (medicine_id, quantity_in_stock, reorder_level, last_updated)
+                VALUES {', '.join(['(%s, %s, COALESCE(%s, 0), %s)'] * len(received))}
+                ON DUPLICATE KEY UPDATE
+                    quantity_in_stock = quantity_in_stock + VALUES(quantity_in_stock),
+                    reorder_level = IF(VALUES(reorder_level) > 0, VALUES(reorder_level), reorder_level),
+                    last_updated = GREATEST(COALESCE(last_updated, VALUES(last_updated)), VALUES(last_updated))""",
+            tuple(params)
+        )
+
+        case_params = []
+        for medicine_id, entry in received.items():
+            case_params.extend((medicine_id, entry["quantity"]))
+        ids = tuple(received)
+        cursor.execute(
+            f"""UPDATE medicines
+                SET quantity = quantity + CASE medicine_id {' '.join(['WHEN %s THEN %s'] * len(received))} END
+                WHERE medicine_id IN ({', '.join(['%s'] * len(ids))})""",
+            tuple(case_params) + ids
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(f"Usage: python {os.path.basename(sys.argv[0])} <medicines|customers|stock> <file.csv|file.tsv>")
+        sys.exit(1)
+
+    import_report = BulkImporter(sys.argv[1]).import_file(sys.argv[2])
+    print(import_report.summary())
+    for error_line, error_message in import_report.errors:
+        print(f"  line {error_line}: {error_message}")
@@ -0,0 +1,226 @@
+import argparse
+import queue
+import threading
+from collections import deque
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+from database import Database
+
+POLL_INTERVAL = 2.0
+DISPATCH_MS = 250
+CHANGE_LOG_SIZE = 10000
+
+# Tables whose row changes are published, with their primary keys
+WATCHED = {
+    "medicines": "medicine_id",
+    "customers": "customer_id",
+    "suppliers": "supplier_id",
+    "employees": "employee_id",
+    "stock": "stock_id",
+    "orders": "order_id",
+    "prescriptions": "prescription_id",
+}
+
+# Timestamps have one-second resolution and a transaction can commit rows
+# stamped slightly before the poll that should have seen them, so each poll
+# re-reads this much history. Subscribers get those rows twice, which is
+# harmless for row-level refreshes.
+#
+# Limit: a row whose transaction commits more than OVERLAP after its
+# updated_at/created_at stamp (a long-running import or a stalled checkout)
+# is never reported. Views pick such rows up on their next full load, i.e.
+# a search, a screen's own reload or a restart.
+OVERLAP = timedelta(seconds=2)
+
+
+class ChangeFeed:
+    """Polls every watched table for rows changed since the last poll and fans them out.
+
+    Inserts and updates are found through created_at/updated_at, deletes
+    through the deleted_rows tombstones. A background thread polls and
+    subscribers get callback(row_id, row), with row None for a deleted row.
+    When changes may have been missed (see ChangeLog.since) a table's
+    on_reset callbacks run instead, and should reload the whole view.
+    """
+
+    def __init__(self, tables: Dict[str, str] = None, interval: float = POLL_INTERVAL):
+        self.tables = tables or WATCHED
+        self.interval = interval
+        self.watermark = None
+        self.subscribers: Dict[str, List[Callable]] = {table: [] for table in self.tables}
+        self.reset_subscribers: Dict[str, List[Callable]] = {table: [] for table in self.tables}
+        self.changes = queue.Queue()
+        self._stop = threading.Event()
+        self.thread = None
+        self.widget = None
+
+    def subscribe(self, table: str, callback: Callable[[int, Optional[Dict]], None],
+                  on_reset: Callable[[], None] = None):
+        self.subscribers[table].append(callback)
+        if on_reset:
+            self.reset_subscribers[table].append(on_reset)
+
+    def unsubscribe(self, table: str, callback: Callable, on_reset: Callable = None):
+        if callback in self.subscribers.get(table, []):
+            self.subscribers[table].remove(callback)
+        if on_reset in self.reset_subscribers.get(table, []):
+            self.reset_subscribers[table].remove(on_reset)
+
+    def poll(self) -> List[tuple]:
+        """(table, row_id, row) for every change since the previous call.
+
+        row_id None means changes to table may have been missed.
+        """
+        now = Database.fetch_one("SELECT NOW() AS now")["now"]
+        if self.watermark is None:
+            self.watermark = now
+            return []
+        since = self.watermark - OVERLAP
+        changes = []
+        for table, key in self.tables.items():
+            if not self.subscribers[table]:
+                continue
+            for row in Database.fetch_all(
+                f"SELECT * FROM {table} WHERE updated_at >= %s OR created_at >= %s", (since, since)
+            ):
+                changes.append((table, row[key], row))
+        for tombstone in Database.fetch_all(
+            "SELECT table_name, row_id FROM deleted_rows WHERE deleted_at >= %s", (since,)
+        ):
+            if tombstone["table_name"] in self.tables:
+                changes.append((tombstone["table_name"], tombstone["row_id"], None))
+        self.watermark = now
+        return changes
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                for change in self.poll():
+                    self.changes.put(change)
+            except Exception:
+                # Offline or a transient error: try again on the next tick;
+                # the watermark has not moved, so nothing is lost
+                pass
+            if self.widget is None:
+                self._deliver()
+            self._stop.wait(self.interval)
+
+    def start(self, widget=None):
+        """Start polling.
+
+        With a Tk widget, changes are delivered through its event loop;
+        without one (e.g. in service_api) callbacks run on the polling thread.
+        """
+        if self.thread is None:
+            self.widget = widget
+            self.thread = threading.Thread(target=self._work, daemon=True)
+            self.thread.start()
+            if widget is not None:
+                self._dispatch()
+
+    def _deliver(self):
+        while True:
+            try:
+                table, row_id, row = self.changes.get_nowait()
+            except queue.Empty:
+                return
+            if row_id is None:
+                callbacks, args = self.reset_subscribers.get(table, []), ()
+            else:
+                callbacks, args = self.subscribers.get(table, []), (row_id, row)
+            for callback in list(callbacks):
+                try:
+                    callback(*args)
+                except Exception:
+                    # A broken view must not stop the others from updating
+                    pass
+
+    def _dispatch(self):
+        self._deliver()
+        if not self._stop.is_set():
+            self.widget.after(DISPATCH_MS, self._dispatch)
+
+    def stop(self):
+        self._stop.set()
+
+
+class ChangeLog:
+    """The most recent changes seen by one ChangeFeed, numbered in arrival order.
+
+    service_api records its feed here so terminals in client mode read
+    changes with one RPC per poll instead of each polling MySQL.
+    """
+
+    def __init__(self, size: int = CHANGE_LOG_SIZE):
+        self.entries = deque(maxlen=size)
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, table: str, row_id: int, row: Optional[Dict]):
+        with self._lock:
+            self.seq += 1
+            self.entries.append((self.seq, table, row_id, row))
+
+    def since(self, seq: Optional[int] = None, tables: List[str] = None) -> Dict:
+        """Changes numbered above seq, and the number to pass next time.
+
+        A missing seq starts the caller at the current position, like
+        ChangeFeed's first poll. If changes after seq are no longer held,
+        because they were pushed out of the log or seq dates from before a
+        service restart, "reset" is set and the caller must reload in full.
+        """
+        with self._lock:
+            if seq is None:
+                return {"seq": self.seq, "changes": [], "reset": False}
+            oldest = self.entries[0][0] if self.entries else self.seq + 1
+            if seq > self.seq or seq < oldest - 1:
+                return {"seq": self.seq, "changes": [], "reset": True}
+            changes = [[table, row_id, row] for number, table, row_id, row in self.entries
+                       if number > seq and (tables is None or table in tables)]
+            return {"seq": self.seq, "changes": changes, "reset": False}
+
+
+class TreeviewSync:
+    """Applies row-level changes to a Treeview whose item ids are the row ids.
+
+    format_row turns a row into the item's values; include decides whether a
+    row that is not shown yet belongs in the current view (search filter).
+    fetch reads one row in the view's shape. Views that join other tables set
+    joined, so rows from the change feed are re-read through fetch.
+    """
+
+    def __init__(self, tree, format_row: Callable[[Dict], tuple], include: Callable[[Dict], bool] = None,
+                 fetch: Callable[[int], Optional[Dict]] = None, joined: bool = False):
+        self.tree = tree
+        self.format_row = format_row
+        self.include = include or (lambda row: True)
+        self.fetch = fetch
+        self.joined = joined
+
+    def __call__(self, row_id: int, row: Optional[Dict]):
+        if row is not None and self.joined:
+            row = self.fetch(row_id)
+        self._apply(row_id, row)
+
+    def refresh(self, row_id: int):
+        """Re-read one row through fetch, e.g. after an events.bus notification"""
+        self._apply(row_id, self.fetch(row_id))
+
+    def _apply(self, row_id: int, row: Optional[Dict]):
+        iid = str(row_id)
+        if row is None:
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        elif self.tree.exists(iid):
+            self.tree.item(iid, values=self.format_row(row))
+        elif self.include(row):
+            self.tree.insert("", "end", iid=iid, values=self.format_row(row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the change feed tombstones")
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--days", type=int, default=7, help="Keep tombstones this many days")
+    args = parser.parse_args()
+    removed = Database.execute("DELETE FROM deleted_rows WHERE deleted_at < NOW() - INTERVAL %s DAY", (args.days,))
+    print(f"Removed {removed} tombstones")
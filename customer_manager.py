@@ -1,12 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from database import Customer, Order, Prescription
+from backend import Customer, Order, Prescription
+from rfm import SEGMENTS
+from change_feed import TreeviewSync
+from events import bus, CustomerChanged
 
 class CustomerManager:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, change_feed=None):
         self.frame = ttk.Frame(parent_frame)
         self.current_customer = None
         self.setup_ui()
+        self.tree_sync = TreeviewSync(
+            self.tree, self.format_row,
+            include=lambda cust: (not self.search_entry.get()
+                                  and self.segment_var.get() in ("All", cust.get('rfm_segment'))),
+            fetch=Customer.get_by_id
+        )
+        bus.subscribe(CustomerChanged, lambda event: self.tree_sync.refresh(event.customer_id))
+        if change_feed:
+            change_feed.subscribe("customers", self.tree_sync, on_reset=self.search_customers)
 
     def setup_ui(self):
         # Search frame
@@ -17,10 +29,17 @@ class CustomerManager:
         self.search_entry = ttk.Entry(search_frame, width=30)
         self.search_entry.pack(side="left", padx=5)
         self.search_entry.bind("<KeyRelease>", self.search_customers)
+
+        ttk.Label(search_frame, text="Segment:").pack(side="left", padx=(15, 0))
+        self.segment_var = tk.StringVar(value="All")
+        segment_combo = ttk.Combobox(search_frame, textvariable=self.segment_var,
+                                     values=["All"] + SEGMENTS, state="readonly", width=18)
+        segment_combo.pack(side="left", padx=5)
+        segment_combo.bind("<<ComboboxSelected>>", self.search_customers)
         
         # Customer treeview
         self.tree = ttk.Treeview(self.frame, columns=(
-            "ID", "Name", "Phone", "Email", "Address", "Age", "Points"
+            "ID", "Name", "Phone", "Email", "Address", "Age", "Points", "Segment"
         ), show="headings", selectmode="browse")
         
         columns = [
@@ -30,7 +49,8 @@ class CustomerManager:
             ("Email", "Email", 150),
             ("Address", "Address", 200),
             ("Age", "Age", 50),
-            ("Points", "Loyalty Points", 80)
+            ("Points", "Loyalty Points", 80),
+            ("Segment", "Segment", 110)
         ]
         
         for col_id, col_text, width in columns:
@@ -61,20 +81,25 @@ class CustomerManager:
             self.tree.delete(row)
         
         try:
-            customers = Customer.get_all(search_term)
+            segment = self.segment_var.get()
+            customers = Customer.get_all(search_term, None if segment == "All" else segment)
             for cust in customers:
-                self.tree.insert("", "end", values=(
-                    cust['customer_id'],
-                    cust['name'],
-                    cust['phone'] or "N/A",
-                    cust['email'] or "N/A",
-                    cust['address'] or "N/A",
-                    cust['age'] or "N/A",
-                    cust['loyalty_points'] or 0
-                ))
+                self.tree.insert("", "end", iid=str(cust['customer_id']), values=self.format_row(cust))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load customers: {str(e)}")
 
+    def format_row(self, cust):
+        return (
+            cust['customer_id'],
+            cust['name'],
+            cust['phone'] or "N/A",
+            cust['email'] or "N/A",
+            cust['address'] or "N/A",
+            cust['age'] or "N/A",
+            cust['loyalty_points'] or 0,
+            cust.get('rfm_segment') or "Unscored"
+        )
+
     def search_customers(self, event=None):
         self.load_customers(self.search_entry.get())
 
@@ -0,0 +1,125 @@
+import argparse
+import csv
+import gzip
+import json
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, Optional
+from database import (Database, Order, Prescription, Sale, Customer, Medicine,
+                      Supplier, Employee, Stock)
+
+# Tables that can be dumped by name. order_items has no date of its own, so
+# it is filtered through its parent order's order_date.
+EXPORT_MODELS = {
+    "orders": Order,
+    "prescriptions": Prescription,
+    "sales": Sale,
+    "customers": Customer,
+    "medicines": Medicine,
+    "suppliers": Supplier,
+    "employees": Employee,
+    "stock": Stock,
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_order_items(start: datetime = None, end: datetime = None, batch_size: int = 1000) -> Iterator[Dict]:
+    query = "SELECT oi.* FROM order_items oi JOIN orders o ON oi.order_id = o.order_id"
+    conditions, params = [], []
+    if start:
+        conditions.append("o.order_date >= %s")
+        params.append(start)
+    if end:
+        conditions.append("o.order_date < %s")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return Database.stream_query(query, tuple(params), batch_size)
+
+
+def stream_table(table: str, start: datetime = None, end: datetime = None, batch_size: int = 1000) -> Iterator[Dict]:
+    if table == "order_items":
+        return stream_order_items(start, end, batch_size)
+    if table not in EXPORT_MODELS:
+        raise ValueError(f"Cannot export '{table}'. "
+                         f"Expected one of: order_items, {', '.join(EXPORT_MODELS)}")
+    return EXPORT_MODELS[table].stream(start, end, batch_size)
+
+
+def write_rows(rows: Iterator[Dict], path: str, fmt: str = "csv", compress: bool = None) -> int:
+    """Encode rows to CSV or JSON Lines as they arrive and return the row count.
+
+    Output is gzip-compressed when compress is True, or when it is left as
+    None and the path ends in .gz.
+    """
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("Export format must be 'csv' or 'jsonl'")
+    if compress is None:
+        compress = path.endswith(".gz")
+
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(path, "wt", newline="", encoding="utf-8") as handle:
+        if fmt == "jsonl":
+            for row in rows:
+                handle.write(json.dumps(row, default=_json_default))
+                handle.write("\n")
+                count += 1
+        else:
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.writer(handle)
+                    writer.writerow(row.keys())
+                writer.writerow([_csv_value(v) for v in row.values()])
+                count += 1
+    return count
+
+
+def export_table(table: str, path: str, fmt: str = "csv", start: datetime = None,
+                 end: datetime = None, compress: bool = None) -> int:
+    """Dump a table to a file without holding more than one fetch batch in memory"""
+    return write_rows(stream_table(table, start, end), path, fmt, compress)
+
+
+def export_query(query: str, path: str, params: tuple = None, fmt: str = "csv",
+                 compress: bool = None) -> int:
+    """Dump the result of an arbitrary SELECT to a file"""
+    return write_rows(Database.stream_query(query, params), path, fmt, compress)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export pharmacy tables to CSV or JSON Lines")
+    parser.add_argument("table", help=f"order_items, {', '.join(EXPORT_MODELS)}")
+    parser.add_argument("output", help="Output file; a .gz suffix enables gzip")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--start", help="Include rows on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Include rows before this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    exported = export_table(args.table, args.output, args.format,
+                            _parse_date(args.start), _parse_date(args.end))
+    print(f"Exported {exported} rows from {args.table} to {args.output}")
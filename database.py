@@ -1,17 +1,49 @@
+import time
+import uuid
 import mysql.connector
-from mysql.connector import pooling
+from mysql.connector import pooling, errorcode
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+from events import bus, MedicineChanged, StockMoved, CustomerChanged, OrderCreated
+
+class DatabaseUnavailable(Exception):
+    """The database server could not be reached"""
+
 
 class Database:
     __connection_pool = None
+    # Cleared by backend.py in client mode, where every terminal read and
+    # write goes through service_api and no local pool may be opened
+    DIRECT_ACCESS = True
+
+    # Dropped connections, deadlocks and lock wait timeouts. A connection lost
+    # during COMMIT leaves the outcome unknown, so only work guarded by an
+    # idempotency key (orders.order_key, sales.order_key) is retried
+    TRANSIENT_ERRORS = {
+        errorcode.CR_CONNECTION_ERROR,
+        errorcode.CR_CONN_HOST_ERROR,
+        errorcode.CR_SERVER_GONE_ERROR,
+        errorcode.CR_SERVER_LOST,
+        errorcode.CR_SERVER_LOST_EXTENDED,
+        errorcode.ER_LOCK_DEADLOCK,
+        errorcode.ER_LOCK_WAIT_TIMEOUT,
+    }
+    # CR_SERVER_LOST_EXTENDED is what the pure-Python connector raises when
+    # the socket drops mid-query
+    CONNECTION_ERRORS = {
+        errorcode.CR_CONNECTION_ERROR,
+        errorcode.CR_CONN_HOST_ERROR,
+        errorcode.CR_SERVER_GONE_ERROR,
+        errorcode.CR_SERVER_LOST,
+        errorcode.CR_SERVER_LOST_EXTENDED,
+    }
 
     @classmethod
-    def initialize_pool(cls):
+    def initialize_pool(cls, pool_size: int = 5):
         try:
             cls.__connection_pool = pooling.MySQLConnectionPool(
                 pool_name="pharmacy_pool",
-                pool_size=5,
+                pool_size=pool_size,
                 host="localhost",
                 user="root",
                 password="",
@@ -19,13 +51,20 @@ class Database:
                 autocommit=False
             )
         except mysql.connector.Error as err:
-            raise Exception(f"Database connection error: {err}")
+            raise DatabaseUnavailable(f"Database connection error: {err}")
 
     @classmethod
     def get_connection(cls):
+        if not cls.DIRECT_ACCESS:
+            raise RuntimeError("Direct database access is disabled in client mode; use the service models")
         if cls.__connection_pool is None:
             cls.initialize_pool()
-        return cls.__connection_pool.get_connection()
+        try:
+            return cls.__connection_pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            raise
+        except mysql.connector.Error as err:
+            raise DatabaseUnavailable(f"Database connection error: {err}")
 
     @classmethod
     def close_connection(cls, connection, cursor=None):
@@ -74,6 +113,61 @@ class Database:
     def execute(cls, query: str, params: tuple = None) -> int:
         return cls.execute_query(query, params)
 
+    @classmethod
+    def stream_query(cls, query: str, params: tuple = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Yield rows through an unbuffered cursor, holding one batch in memory at a time"""
+        conn = cls.get_connection()
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            # A consumer that stops early leaves rows on the wire; drain them
+            # so the connection goes back to the pool usable
+            if conn.unread_result:
+                conn.consume_results()
+            cls.close_connection(conn, cursor)
+
+    @classmethod
+    def run_with_retries(cls, work, attempts: int = 3, delay: float = 0.5):
+        """Call work(), running it again after a transient error with exponential backoff"""
+        for attempt in range(1, attempts + 1):
+            try:
+                return work()
+            except (mysql.connector.Error, DatabaseUnavailable) as err:
+                transient = isinstance(err, DatabaseUnavailable) or err.errno in cls.TRANSIENT_ERRORS
+                if attempt == attempts or not transient:
+                    raise
+                time.sleep(delay * 2 ** (attempt - 1))
+
+    @classmethod
+    def rollback_quietly(cls, conn):
+        """Roll back on a connection that may already be dead, so the error that killed it is the one raised"""
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+
+    @classmethod
+    def is_unreachable(cls, err: Exception) -> bool:
+        """Whether err means the server could not be reached, rather than that the work was rejected.
+
+        Models re-raise driver errors as Exception("Failed to ..."), so the
+        chain of errors it was raised from is checked as well.
+        """
+        while err is not None:
+            if isinstance(err, DatabaseUnavailable):
+                return True
+            if isinstance(err, mysql.connector.Error) and err.errno in cls.CONNECTION_ERRORS:
+                return True
+            err = err.__cause__ or err.__context__
+        return False
+
     @classmethod
     def execute_return_id(cls, query: str, params: tuple = None) -> int:
         conn = cls.get_connection()
@@ -92,6 +186,14 @@ class Database:
 
 class BaseModel:
     TABLE = ""
+    DATE_COLUMN = "created_at"
+    # events.* type published after create/update/delete, if any
+    CHANGED_EVENT = None
+
+    @classmethod
+    def _changed(cls, id: int, deleted: bool = False):
+        if cls.CHANGED_EVENT:
+            bus.publish(cls.CHANGED_EVENT(id, deleted))
 
     @classmethod
     def get_all(cls, search_term: str = None) -> List[Dict]:
@@ -101,6 +203,21 @@ class BaseModel:
             return Database.fetch_all(query, (f"%{search_term}%",))
         return Database.fetch_all(query)
     
+    @classmethod
+    def stream(cls, start: datetime = None, end: datetime = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream every row, optionally limited to DATE_COLUMN in [start, end)"""
+        query = f"SELECT * FROM {cls.TABLE}"
+        conditions, params = [], []
+        if start:
+            conditions.append(f"{cls.DATE_COLUMN} >= %s")
+            params.append(start)
+        if end:
+            conditions.append(f"{cls.DATE_COLUMN} < %s")
+            params.append(end)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return Database.stream_query(query, tuple(params), batch_size)
+
     @classmethod
     def get_by_id(cls, id: int) -> Optional[Dict]:
         query = f"SELECT * FROM {cls.TABLE} WHERE {cls.TABLE[:-1]}_id = %s"
@@ -112,7 +229,9 @@ class BaseModel:
         placeholders = ', '.join(['%s'] * len(data))
         query = f"INSERT INTO {cls.TABLE} ({columns}) VALUES ({placeholders})"
         Database.execute(query, tuple(data.values()))
-        return Database.execute_query("SELECT LAST_INSERT_ID()", fetch=True)[0]['LAST_INSERT_ID()']
+        new_id = Database.execute_query("SELECT LAST_INSERT_ID()", fetch=True)[0]['LAST_INSERT_ID()']
+        cls._changed(new_id)
+        return new_id
     
     @classmethod
     def update(cls, id: int, data: Dict) -> bool:
@@ -120,9 +239,10 @@ class BaseModel:
         query = f"UPDATE {cls.TABLE} SET {set_clause} WHERE {cls.TABLE[:-1]}_id = %s"
         try:
             Database.execute_query(query, tuple(data.values()) + (id,))
-            return True
         except:
             return False
+        cls._changed(id)
+        return True
     
     @classmethod
     def delete(cls, id: int) -> bool:
@@ -141,6 +261,8 @@ class BaseModel:
             # Proceed with deletion of the main record
             query = f"DELETE FROM {cls.TABLE} WHERE {cls.TABLE[:-1]}_id = %s"
             affected_rows = Database.execute_query(query, (id,))
+            if affected_rows > 0:
+                cls._changed(id, deleted=True)
             return affected_rows > 0
         except Exception as e:
             raise Exception(f"Failed to delete record: {str(e)}")
@@ -164,6 +286,7 @@ class BaseModel:
 
 class Medicine(BaseModel):
     TABLE = "medicines"
+    CHANGED_EVENT = MedicineChanged
 
     @classmethod
     def get_all(cls, search_term: str = None, include_supplier: bool = False) -> List[Dict]:
@@ -260,6 +383,7 @@ class Medicine(BaseModel):
             affected_rows = Database.execute_query(query, (quantity, medicine_id, quantity))
             if affected_rows == 0:
                 raise ValueError("Not enough stock or medicine not found")
+            bus.publish(StockMoved(medicine_id, -quantity, "sale"))
             return True
         except Exception as e:
             raise Exception(f"Failed to reduce stock: {str(e)}")
@@ -282,25 +406,117 @@ class Medicine(BaseModel):
                 return Database.fetch_all(query, (threshold,))
             raise
 
+    @classmethod
+    def get_sku_rows(cls, since: datetime = None) -> List[Dict]:
+        """Fields SkuCache keeps, for every medicine or those changed since, with the server's clock"""
+        query = "SELECT medicine_id, sku, name, price, quantity, NOW() AS server_time FROM medicines"
+        if since is None:
+            return Database.fetch_all(query)
+        return Database.fetch_all(query + " WHERE updated_at >= %s OR created_at >= %s", (since, since))
+
+    @classmethod
+    def get_expiring(cls, until) -> List[Dict]:
+        """Medicines whose expiry date is on or before until"""
+        return Database.fetch_all("SELECT name, expiry_date FROM medicines WHERE expiry_date <= %s", (until,))
+
+    @classmethod
+    def is_referenced(cls, medicine_id: int) -> bool:
+        """Whether any order line refers to the medicine"""
+        return Database.fetch_one(
+            "SELECT 1 AS found FROM order_items WHERE medicine_id = %s LIMIT 1", (medicine_id,)
+        ) is not None
+
 class Supplier(BaseModel):
     TABLE = "suppliers"
 
+    @classmethod
+    def update_lead_times(cls, rows: List[tuple]) -> int:
+        """Store (supplier_id, mean_days, std_days, samples) in one transaction"""
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""CREATE TEMPORARY TABLE IF NOT EXISTS supplier_lead_times (
+                supplier_id int NOT NULL PRIMARY KEY, mean_days decimal(8, 2),
+                std_days decimal(8, 2), samples int NOT NULL)""")
+            cursor.execute("DELETE FROM supplier_lead_times")
+            if rows:
+                cursor.executemany(
+                    "INSERT INTO supplier_lead_times (supplier_id, mean_days, std_days, samples) VALUES (%s, %s, %s, %s)",
+                    rows
+                )
+            cursor.execute("""UPDATE suppliers s JOIN supplier_lead_times l ON s.supplier_id = l.supplier_id
+                              SET s.lead_time_mean_days = l.mean_days, s.lead_time_std_days = l.std_days,
+                                  s.lead_time_samples = l.samples""")
+            updated = cursor.rowcount
+            cursor.execute("DROP TEMPORARY TABLE supplier_lead_times")
+            conn.commit()
+            return updated
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to update supplier lead times: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
+
 
 class Customer(BaseModel):
     TABLE = "customers"
+    CHANGED_EVENT = CustomerChanged
     
     @classmethod
     def add_loyalty_points(cls, customer_id: int, points: int) -> bool:
         query = "UPDATE customers SET loyalty_points = loyalty_points + %s WHERE customer_id = %s"
         try:
             Database.execute_query(query, (points, customer_id))
-            return True
         except:
             return False
+        cls._changed(customer_id)
+        return True
+
+    @classmethod
+    def get_all(cls, search_term: str = None, segment: str = None) -> List[Dict]:
+        conditions, params = [], []
+        if search_term:
+            conditions.append("name LIKE %s")
+            params.append(f"%{search_term}%")
+        if segment:
+            conditions.append("rfm_segment = %s")
+            params.append(segment)
+        query = "SELECT * FROM customers"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return Database.fetch_all(query, tuple(params))
+
+    @classmethod
+    def save_segments(cls, rows: List[tuple], batch_size: int = 5000) -> int:
+        """Store (customer_id, recency, frequency, monetary, segment) scores in one transaction"""
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""CREATE TEMPORARY TABLE IF NOT EXISTS rfm_scores (
+                customer_id int NOT NULL PRIMARY KEY, r tinyint, f tinyint, m tinyint, segment varchar(20))""")
+            cursor.execute("DELETE FROM rfm_scores")
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(
+                    "INSERT INTO rfm_scores (customer_id, r, f, m, segment) VALUES (%s, %s, %s, %s, %s)",
+                    rows[i:i + batch_size]
+                )
+            cursor.execute("""UPDATE customers c JOIN rfm_scores s ON c.customer_id = s.customer_id
+                              SET c.rfm_recency = s.r, c.rfm_frequency = s.f, c.rfm_monetary = s.m,
+                                  c.rfm_segment = s.segment, c.rfm_scored_at = NOW()""")
+            updated = cursor.rowcount
+            cursor.execute("DROP TEMPORARY TABLE rfm_scores")
+            conn.commit()
+            return updated
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to save customer segments: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
 
 
 class Order(BaseModel):
     TABLE = "orders"
+    DATE_COLUMN = "order_date"
     
     @classmethod
     def delete_by_customer_id(cls, customer_id: int) -> bool:
@@ -312,6 +528,101 @@ class Order(BaseModel):
         except Exception as e:
             raise Exception(f"Failed to delete orders by customer ID: {str(e)}")
 
+    @classmethod
+    def find_by_key(cls, order_key: str) -> Optional[int]:
+        row = Database.fetch_one("SELECT order_id FROM orders WHERE order_key = %s", (order_key,))
+        return row['order_id'] if row else None
+
+    @classmethod
+    def create_with_details(cls, order_data: Dict, items: List[Dict]) -> int:
+        """Insert an order, its items, stock decrements, loyalty points and rollup rows in one transaction.
+
+        With an order_key in order_data a resubmitted order is not inserted
+        again; the id of the order first stored under that key is returned.
+        """
+        order_key = order_data.get('order_key')
+        # One timestamp for the order row and its rollup rows, so an order
+        # placed across midnight is not split between two days
+        order_date = order_data.get('order_date') or datetime.now()
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            if order_key:
+                cursor.execute("SELECT order_id FROM orders WHERE order_key = %s", (order_key,))
+                existing = cursor.fetchone()
+                if existing:
+                    conn.rollback()
+                    return existing[0]
+
+            # Create order
+            query = """INSERT INTO orders 
+                       (customer_id, employee_id, order_date, total_amount, order_type, order_key) 
+                       VALUES (%s, %s, %s, %s, %s, %s)"""
+            cursor.execute(query, (
+                order_data.get('customer_id'),
+                order_data.get('employee_id'),
+                order_date,
+                order_data['total_amount'],
+                order_data.get('order_type', 'retail'),
+                order_key
+            ))
+            order_id = cursor.lastrowid
+            
+            # Add order items
+            for item in items:
+                query = """INSERT INTO order_items 
+                          (order_id, medicine_id, quantity, unit_price, subtotal) 
+                          VALUES (%s, %s, %s, %s, %s)"""
+                cursor.execute(query, (
+                    order_id,
+                    item['medicine_id'],
+                    item['quantity'],
+                    item['price'],
+                    item['subtotal']
+                ))
+                cursor.execute(
+                    "UPDATE medicines SET quantity = quantity - %s WHERE medicine_id = %s AND quantity >= %s",
+                    (item['quantity'], item['medicine_id'], item['quantity'])
+                )
+                if cursor.rowcount == 0:
+                    raise ValueError(f"Not enough stock for {item.get('name', item['medicine_id'])}")
+
+            if order_data.get('loyalty_points') and order_data.get('customer_id'):
+                cursor.execute(
+                    "UPDATE customers SET loyalty_points = loyalty_points + %s WHERE customer_id = %s",
+                    (order_data['loyalty_points'], order_data['customer_id'])
+                )
+
+            SalesRollup.record(
+                cursor,
+                order_date,
+                order_data.get('employee_id'),
+                [(item['medicine_id'], item['quantity'], item['subtotal']) for item in items]
+            )
+            
+            conn.commit()
+            for item in items:
+                bus.publish(StockMoved(item['medicine_id'], -item['quantity'], "order"))
+            if order_data.get('loyalty_points') and order_data.get('customer_id'):
+                bus.publish(CustomerChanged(order_data['customer_id']))
+            bus.publish(OrderCreated(order_id, order_key, order_data.get('customer_id'),
+                                     tuple(item['medicine_id'] for item in items)))
+            return order_id
+        except mysql.connector.IntegrityError as err:
+            Database.rollback_quietly(conn)
+            if order_key and err.errno == errorcode.ER_DUP_ENTRY:
+                # Another submission with the same key committed first
+                existing_id = cls.find_by_key(order_key)
+                if existing_id:
+                    return existing_id
+            raise err
+        except Exception as e:
+            Database.rollback_quietly(conn)
+            raise e
+        finally:
+            if conn and cursor:
+                Database.close_connection(conn, cursor)
+
     @classmethod
     def delete(cls, customer_id: int) -> bool:
         """Delete customer and all related records"""
@@ -347,6 +658,8 @@ class Employee(BaseModel):
 
 class Prescription(BaseModel):
     TABLE = "prescriptions"
+    DATE_COLUMN = "issue_date"
+    PAGE_SIZE = 200
 
     @classmethod
     def create(cls, data: Dict) -> int:
@@ -372,6 +685,51 @@ class Prescription(BaseModel):
             return Database.fetch_all(query, (f"%{search_term}%", f"%{search_term}%"))
         return Database.fetch_all(query)
 
+    @classmethod
+    def get_page(cls, customer_id: int = None, after: tuple = None, limit: int = PAGE_SIZE) -> List[Dict]:
+        """One page of prescriptions, newest first, each with its item_count.
+
+        after is the (issue_date, prescription_id) of the previous page's last
+        row, so deep pages read as few index entries as the first one. Item
+        counts come from one grouped query over the page's ids.
+        """
+        query = """SELECT p.*, c.name as customer_name 
+                   FROM prescriptions p JOIN customers c ON p.customer_id = c.customer_id"""
+        conditions, params = [], []
+        if customer_id:
+            conditions.append("p.customer_id = %s")
+            params.append(customer_id)
+        if after:
+            issue_date, prescription_id = after
+            conditions.append("(p.issue_date < %s OR (p.issue_date = %s AND p.prescription_id < %s))")
+            params.extend([issue_date, issue_date, prescription_id])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY p.issue_date DESC, p.prescription_id DESC LIMIT %s"
+        params.append(limit)
+
+        prescriptions = Database.fetch_all(query, tuple(params))
+        if prescriptions:
+            ids = [p['prescription_id'] for p in prescriptions]
+            counts = {row['prescription_id']: row['item_count'] for row in Database.fetch_all(
+                f"""SELECT prescription_id, COUNT(*) as item_count FROM prescription_items
+                    WHERE prescription_id IN ({', '.join(['%s'] * len(ids))})
+                    GROUP BY prescription_id""",
+                tuple(ids)
+            )}
+            for p in prescriptions:
+                p['item_count'] = counts.get(p['prescription_id'], 0)
+        return prescriptions
+
+    @classmethod
+    def get_items(cls, prescription_id: int) -> List[Dict]:
+        return Database.fetch_all(
+            """SELECT m.name, pi.medicine_id, pi.quantity, pi.dosage, pi.instructions 
+               FROM prescription_items pi JOIN medicines m ON pi.medicine_id = m.medicine_id 
+               WHERE pi.prescription_id = %s""",
+            (prescription_id,)
+        )
+
     @classmethod
     def delete_by_customer_id(cls, customer_id: int) -> bool:
         """Delete prescriptions and their related items associated with a specific customer ID."""
@@ -409,47 +767,6 @@ class Prescription(BaseModel):
             return True
         except Exception as e:
             raise Exception(f"Failed to delete prescriptions by customer ID: {str(e)}")
-    TABLE = "orders"
-    
-    @classmethod
-    def create_with_details(cls, order_data: Dict, items: List[Dict]) -> int:
-        conn = Database.get_connection()
-        cursor = conn.cursor()
-        try:
-            # Create order
-            query = """INSERT INTO orders 
-                       (customer_id, employee_id, order_date, total_amount, order_type) 
-                       VALUES (%s, %s, %s, %s, %s)"""
-            cursor.execute(query, (
-                order_data.get('customer_id'),
-                order_data.get('employee_id'),
-                order_data.get('order_date', datetime.now()),
-                order_data['total_amount'],
-                order_data.get('order_type', 'retail')
-            ))
-            order_id = cursor.lastrowid
-            
-            # Add order items
-            for item in items:
-                query = """INSERT INTO order_items 
-                          (order_id, medicine_id, quantity, unit_price, subtotal) 
-                          VALUES (%s, %s, %s, %s, %s)"""
-                cursor.execute(query, (
-                    order_id,
-                    item['medicine_id'],
-                    item['quantity'],
-                    item['price'],
-                    item['subtotal']
-                ))
-            
-            conn.commit()
-            return order_id
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            if conn and cursor:
-                Database.close_connection(conn, cursor)
 
     @classmethod
     def delete_by_customer_id(cls, customer_id: int) -> bool:
@@ -481,6 +798,382 @@ class Prescription(BaseModel):
 
 class Sale(BaseModel):
     TABLE = "sales"
+    DATE_COLUMN = "sale_date"
+
+    @classmethod
+    def _record_bill(cls, cursor, order_key: str, lines: List[tuple], customer_id: int = None,
+                     sale_date: datetime = None) -> bool:
+        """Write one bill with the caller's cursor and transaction; False if order_key is already recorded"""
+        sale_date = sale_date or datetime.now()
+        cursor.execute("SELECT 1 FROM sales WHERE order_key = %s LIMIT 1", (order_key,))
+        if cursor.fetchone():
+            return False
+
+        for medicine_id, quantity, unit_price, total in lines:
+            cursor.execute(
+                """INSERT INTO sales
+                   (medicine_id, quantity, unit_price, total_price, sale_date, customer_id, order_key)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                (medicine_id, quantity, unit_price, total, sale_date, customer_id, order_key)
+            )
+            cursor.execute(
+                "UPDATE medicines SET quantity = quantity - %s WHERE medicine_id = %s AND quantity >= %s",
+                (quantity, medicine_id, quantity)
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Not enough stock left for medicine {medicine_id}")
+
+        SalesRollup.record(cursor, sale_date, None,
+                           [(medicine_id, quantity, total) for medicine_id, quantity, _, total in lines])
+
+        if customer_id:
+            cursor.execute(
+                "UPDATE customers SET loyalty_points = loyalty_points + %s WHERE customer_id = %s",
+                (int(sum(float(total) for _, _, _, total in lines)), customer_id)
+            )
+        return True
+
+    @classmethod
+    def _publish_bill(cls, order_key: str, lines: List[tuple], customer_id: int = None):
+        for medicine_id, quantity, _, _ in lines:
+            bus.publish(StockMoved(int(medicine_id), -int(quantity), "sale"))
+        if customer_id:
+            bus.publish(CustomerChanged(customer_id))
+        bus.publish(OrderCreated(None, order_key, customer_id, tuple(int(line[0]) for line in lines)))
+
+    @classmethod
+    def record_bill(cls, order_key: str, lines: List[tuple], customer_id: int = None,
+                    sale_date: datetime = None) -> bool:
+        """Insert a bill of (medicine_id, quantity, unit_price, total) lines in one transaction.
+
+        Stock, loyalty points and the sales rollup are updated with it. Returns
+        False, writing nothing, when a bill with this order_key was already
+        recorded.
+        """
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            recorded = cls._record_bill(cursor, order_key, lines, customer_id, sale_date)
+            conn.commit()
+            if recorded:
+                cls._publish_bill(order_key, lines, customer_id)
+            return recorded
+        except mysql.connector.IntegrityError as err:
+            Database.rollback_quietly(conn)
+            if err.errno == errorcode.ER_DUP_ENTRY:
+                # Another submission with the same key committed first
+                return False
+            raise err
+        except Exception as e:
+            Database.rollback_quietly(conn)
+            raise e
+        finally:
+            Database.close_connection(conn, cursor)
+
+    @classmethod
+    def record_bills(cls, bills: List[tuple]) -> List:
+        """Group-commit (order_key, lines, customer_id, sale_date) bills in one transaction.
+
+        Each bill runs under its own savepoint, so a rejected bill is rolled
+        back alone. Returns, per bill, True, False (key already recorded) or
+        the exception that rejected it.
+        """
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        results = []
+        try:
+            for order_key, lines, customer_id, sale_date in bills:
+                cursor.execute("SAVEPOINT bill")
+                try:
+                    results.append(cls._record_bill(cursor, order_key, lines, customer_id, sale_date))
+                    cursor.execute("RELEASE SAVEPOINT bill")
+                except mysql.connector.Error as err:
+                    if err.errno in Database.CONNECTION_ERRORS:
+                        raise
+                    cursor.execute("ROLLBACK TO SAVEPOINT bill")
+                    results.append(False if err.errno == errorcode.ER_DUP_ENTRY else err)
+                except ValueError as err:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bill")
+                    results.append(err)
+            conn.commit()
+            for (order_key, lines, customer_id, _), result in zip(bills, results):
+                if result is True:
+                    cls._publish_bill(order_key, lines, customer_id)
+            return results
+        except Exception as e:
+            Database.rollback_quietly(conn)
+            raise e
+        finally:
+            Database.close_connection(conn, cursor)
+
+
+class SalesRollup(BaseModel):
+    """Per day, medicine and employee sales totals kept current by the checkout paths.
+
+    employee_id 0 stands for sales without an employee (SalesManager bills).
+    """
+    TABLE = "daily_sales_rollup"
+
+    @classmethod
+    def record(cls, cursor, sale_date, employee_id: Optional[int], lines: List[tuple]):
+        """Add (medicine_id, quantity, revenue) lines using the caller's cursor and transaction"""
+        totals = {}
+        for medicine_id, quantity, revenue in lines:
+            entry = totals.setdefault(int(medicine_id), [0, 0])
+            entry[0] += int(quantity)
+            entry[1] += float(revenue)
+        if not totals:
+            return
+
+        params = []
+        for medicine_id, (quantity, revenue) in totals.items():
+            params.extend((sale_date, medicine_id, employee_id or 0, quantity, round(revenue, 2)))
+        cursor.execute(
+            f"""INSERT INTO daily_sales_rollup
+                (sale_date, medicine_id, employee_id, quantity, revenue, order_count)
+                VALUES {', '.join(['(DATE(%s), %s, %s, %s, %s, 1)'] * len(totals))}
+                ON DUPLICATE KEY UPDATE
+                    quantity = quantity + VALUES(quantity),
+                    revenue = revenue + VALUES(revenue),
+                    order_count = order_count + 1""",
+            tuple(params)
+        )
+
+    @classmethod
+    def needs_backfill(cls) -> bool:
+        """True when sales history predates the rollup's first day, e.g. it was never backfilled"""
+        row = Database.fetch_one(
+            """SELECT COALESCE(r.first_day, DATE('9999-12-31'))
+                      > LEAST(COALESCE(o.first_day, DATE('9999-12-31')),
+                              COALESCE(s.first_day, DATE('9999-12-31'))) AS stale
+               FROM (SELECT MIN(sale_date) AS first_day FROM daily_sales_rollup) r,
+                    (SELECT DATE(MIN(order_date)) AS first_day FROM orders) o,
+                    (SELECT DATE(MIN(sale_date)) AS first_day FROM sales) s"""
+        )
+        return bool(row and row["stale"])
+
+    @classmethod
+    def backfill(cls) -> int:
+        """Rebuild the rollup from orders/order_items and sales history"""
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM daily_sales_rollup")
+            cursor.execute(
+                """INSERT INTO daily_sales_rollup
+                    (sale_date, medicine_id, employee_id, quantity, revenue, order_count)
+                   SELECT DATE(o.order_date), oi.medicine_id, COALESCE(o.employee_id, 0),
+                          SUM(oi.quantity), SUM(oi.subtotal), COUNT(DISTINCT o.order_id)
+                   FROM orders o
+                   JOIN order_items oi ON oi.order_id = o.order_id
+                   GROUP BY DATE(o.order_date), oi.medicine_id, COALESCE(o.employee_id, 0)"""
+            )
+            cursor.execute(
+                """INSERT INTO daily_sales_rollup
+                    (sale_date, medicine_id, employee_id, quantity, revenue, order_count)
+                   SELECT DATE(sale_date), medicine_id, 0, SUM(quantity), SUM(total_price), COUNT(*)
+                   FROM sales
+                   GROUP BY DATE(sale_date), medicine_id
+                   ON DUPLICATE KEY UPDATE
+                       quantity = quantity + VALUES(quantity),
+                       revenue = revenue + VALUES(revenue),
+                       order_count = order_count + VALUES(order_count)"""
+            )
+            cursor.execute("SELECT COUNT(*) FROM daily_sales_rollup")
+            rows = cursor.fetchone()[0]
+            conn.commit()
+            return rows
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to backfill sales rollup: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
+
+
+class PurchaseOrder(BaseModel):
+    """Orders placed with suppliers; status goes from 'open' to 'received'"""
+    TABLE = "purchase_orders"
+
+    @classmethod
+    def create_batch(cls, orders: Dict[int, List[tuple]], batch_size: int = 1000) -> List[int]:
+        """Create one PO per supplier from {supplier_id: [(medicine_id, quantity, unit_price), ...]}.
+
+        Headers and lines are each written with multi-row inserts in a single
+        transaction. Returns the new purchase_order_ids.
+        """
+        orders = {supplier_id: lines for supplier_id, lines in orders.items() if lines}
+        if not orders:
+            return []
+        batch_ref = str(uuid.uuid4())
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            params = []
+            for supplier_id, lines in orders.items():
+                total = sum(quantity * float(unit_price) for _, quantity, unit_price in lines)
+                params.extend((supplier_id, batch_ref, round(total, 2)))
+            cursor.execute(
+                f"""INSERT INTO purchase_orders (supplier_id, batch_ref, total_amount)
+                    VALUES {', '.join(['(%s, %s, %s)'] * len(orders))}""",
+                tuple(params)
+            )
+            cursor.execute(
+                "SELECT purchase_order_id, supplier_id FROM purchase_orders WHERE batch_ref = %s",
+                (batch_ref,)
+            )
+            po_ids = {supplier_id: po_id for po_id, supplier_id in cursor.fetchall()}
+
+            line_params = [
+                (po_ids[supplier_id], medicine_id, quantity, unit_price)
+                for supplier_id, lines in orders.items()
+                for medicine_id, quantity, unit_price in lines
+            ]
+            for i in range(0, len(line_params), batch_size):
+                chunk = line_params[i:i + batch_size]
+                cursor.execute(
+                    f"""INSERT INTO purchase_order_items
+                        (purchase_order_id, medicine_id, quantity_ordered, unit_price)
+                        VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))}""",
+                    tuple(value for line in chunk for value in line)
+                )
+            conn.commit()
+            return sorted(po_ids.values())
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to create purchase orders: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
+
+    @classmethod
+    def mark_sent(cls, purchase_order_ids: List[int]) -> int:
+        """Record when POs went out to the supplier; lead time is measured from here"""
+        if not purchase_order_ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(purchase_order_ids))
+        return Database.execute(
+            f"""UPDATE purchase_orders SET sent_at = NOW()
+                WHERE sent_at IS NULL AND purchase_order_id IN ({placeholders})""",
+            tuple(purchase_order_ids)
+        )
+
+    @classmethod
+    def get_open(cls) -> List[Dict]:
+        return Database.fetch_all(
+            """SELECT p.*, s.name AS supplier_name, COUNT(i.item_id) AS lines
+               FROM purchase_orders p
+               JOIN suppliers s ON p.supplier_id = s.supplier_id
+               LEFT JOIN purchase_order_items i ON i.purchase_order_id = p.purchase_order_id
+               WHERE p.status = 'open'
+               GROUP BY p.purchase_order_id
+               ORDER BY p.purchase_order_id"""
+        )
+
+    @classmethod
+    def generate(cls, dry_run: bool = False) -> tuple:
+        """purchasing.generate_purchase_orders, callable through service_api"""
+        # Imported here because purchasing imports this module
+        from purchasing import generate_purchase_orders
+        return generate_purchase_orders(dry_run)
+
+    @classmethod
+    def get_items(cls, purchase_order_id: int) -> List[Dict]:
+        return Database.fetch_all(
+            """SELECT i.*, m.name
+               FROM purchase_order_items i
+               JOIN medicines m ON i.medicine_id = m.medicine_id
+               WHERE i.purchase_order_id = %s""",
+            (purchase_order_id,)
+        )
+
+    @classmethod
+    def receive(cls, purchase_order_id: int, received: Dict[int, int] = None) -> int:
+        """Book goods in against a PO and add them to stock in one transaction.
+
+        received maps medicine_id to the quantity delivered; when omitted the
+        outstanding quantity of every line is assumed. The PO is closed once
+        every line is fully received. Returns the number of units booked in.
+        """
+        conn = Database.get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                "SELECT status FROM purchase_orders WHERE purchase_order_id = %s FOR UPDATE",
+                (purchase_order_id,)
+            )
+            header = cursor.fetchone()
+            if not header:
+                raise ValueError(f"No purchase order with ID {purchase_order_id}")
+            if header['status'] != 'open':
+                raise ValueError(f"Purchase order {purchase_order_id} is already {header['status']}")
+
+            cursor.execute(
+                """SELECT item_id, medicine_id, quantity_ordered - quantity_received AS outstanding
+                   FROM purchase_order_items WHERE purchase_order_id = %s""",
+                (purchase_order_id,)
+            )
+            lines = cursor.fetchall()
+            booked = {}
+            for line in lines:
+                if received is None:
+                    quantity = line['outstanding']
+                else:
+                    quantity = received.get(line['medicine_id'], 0)
+                if quantity > 0:
+                    booked[line['item_id']] = (line['medicine_id'], quantity)
+            if not booked:
+                raise ValueError("Nothing to receive")
+
+            item_case = ' '.join(['WHEN %s THEN %s'] * len(booked))
+            item_params = [value for item_id, (_, quantity) in booked.items() for value in (item_id, quantity)]
+            cursor.execute(
+                f"""UPDATE purchase_order_items
+                    SET quantity_received = quantity_received + CASE item_id {item_case} END
+                    WHERE item_id IN ({', '.join(['%s'] * len(booked))})""",
+                tuple(item_params) + tuple(booked)
+            )
+
+            per_medicine = {}
+            for medicine_id, quantity in booked.values():
+                per_medicine[medicine_id] = per_medicine.get(medicine_id, 0) + quantity
+            stock_params = [value for medicine_id, quantity in per_medicine.items()
+                            for value in (medicine_id, quantity)]
+            cursor.execute(
+                f"""INSERT INTO stock (medicine_id, quantity_in_stock, reorder_level, last_updated)
+                    VALUES {', '.join(['(%s, %s, 0, CURRENT_DATE)'] * len(per_medicine))}
+                    ON DUPLICATE KEY UPDATE
+                        quantity_in_stock = quantity_in_stock + VALUES(quantity_in_stock),
+                        last_updated = CURRENT_DATE""",
+                tuple(stock_params)
+            )
+            cursor.execute(
+                f"""UPDATE medicines
+                    SET quantity = quantity + CASE medicine_id {' '.join(['WHEN %s THEN %s'] * len(per_medicine))} END
+                    WHERE medicine_id IN ({', '.join(['%s'] * len(per_medicine))})""",
+                tuple(stock_params) + tuple(per_medicine)
+            )
+
+            # received_at keeps the first delivery, which is what lead time is measured to
+            cursor.execute(
+                """UPDATE purchase_orders
+                   SET received_at = COALESCE(received_at, NOW()),
+                       status = IF((SELECT COUNT(*) FROM purchase_order_items
+                                    WHERE purchase_order_id = %s
+                                      AND quantity_received < quantity_ordered) = 0, 'received', status)
+                   WHERE purchase_order_id = %s""",
+                (purchase_order_id, purchase_order_id)
+            )
+            conn.commit()
+            for medicine_id, quantity in per_medicine.items():
+                bus.publish(StockMoved(medicine_id, quantity, "receipt"))
+            return sum(per_medicine.values())
+        except ValueError:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to receive purchase order: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
 
 
 class Payment(BaseModel):
@@ -494,16 +1187,73 @@ class Payment(BaseModel):
 
 class Stock(BaseModel):
     TABLE = "stock"
+    LEVELS_QUERY = """SELECT s.medicine_id, m.name, s.quantity_in_stock, s.reorder_level, s.last_updated 
+                      FROM stock s JOIN medicines m ON s.medicine_id = m.medicine_id"""
+
+    @classmethod
+    def get_levels(cls, search_term: str = None) -> List[Dict]:
+        """Stock rows with the medicine name, optionally filtered by name"""
+        if search_term:
+            return Database.fetch_all(cls.LEVELS_QUERY + " WHERE m.name LIKE %s", (f"%{search_term}%",))
+        return Database.fetch_all(cls.LEVELS_QUERY)
+
+    @classmethod
+    def get_level(cls, medicine_id: int) -> Optional[Dict]:
+        return Database.fetch_one(cls.LEVELS_QUERY + " WHERE s.medicine_id = %s", (medicine_id,))
     
     @classmethod
-    def check_low_stock(cls, threshold: int = 10) -> List[Dict]:
+    def check_low_stock(cls, cover_days: int = 10) -> List[Dict]:
+        """Stock at or below its reorder level, or forecast to run out within cover_days days.
+
+        The forecast check uses medicines.quantity, the count checkout
+        decrements.
+        """
         query = """SELECT m.name, s.quantity_in_stock, s.reorder_level 
                    FROM stock s JOIN medicines m 
                    ON s.medicine_id = m.medicine_id 
-                   WHERE s.quantity_in_stock <= s.reorder_level"""
-        return Database.fetch_all(query)
-    
-    
+                   LEFT JOIN demand_forecasts f ON f.medicine_id = s.medicine_id
+                   WHERE s.quantity_in_stock <= s.reorder_level
+                      OR m.quantity < f.avg_daily_demand * %s"""
+        return Database.fetch_all(query, (cover_days,))
+
+    @classmethod
+    def update_levels(cls, medicine_id: int, quantity: int, reorder_level: int) -> int:
+        """Set a medicine's counted stock and reorder level"""
+        updated = Database.execute(
+            """UPDATE stock SET quantity_in_stock = %s, reorder_level = %s, last_updated = CURRENT_DATE
+               WHERE medicine_id = %s""",
+            (quantity, reorder_level, medicine_id)
+        )
+        bus.publish(StockMoved(medicine_id, None, "adjustment"))
+        return updated
+
+    @classmethod
+    def set_reorder_levels(cls, levels: List[tuple], batch_size: int = 5000) -> int:
+        """Apply (medicine_id, reorder_level) pairs in one transaction"""
+        conn = Database.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""CREATE TEMPORARY TABLE IF NOT EXISTS reorder_levels (
+                medicine_id int NOT NULL PRIMARY KEY, reorder_level int NOT NULL)""")
+            cursor.execute("DELETE FROM reorder_levels")
+            for i in range(0, len(levels), batch_size):
+                cursor.executemany(
+                    "INSERT INTO reorder_levels (medicine_id, reorder_level) VALUES (%s, %s)",
+                    levels[i:i + batch_size]
+                )
+            cursor.execute("""UPDATE stock s JOIN reorder_levels r ON s.medicine_id = r.medicine_id
+                              SET s.reorder_level = r.reorder_level""")
+            updated = cursor.rowcount
+            cursor.execute("DROP TEMPORARY TABLE reorder_levels")
+            conn.commit()
+            return updated
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Failed to update reorder levels: {str(e)}")
+        finally:
+            Database.close_connection(conn, cursor)
+
+
     @classmethod
     def delete_by_customer_id(cls, customer_id: int) -> bool:
         """Delete stock entries associated with a specific customer ID"""
@@ -0,0 +1,59 @@
+import argparse
+import sys
+from typing import Dict, Iterator
+from database import Database, SalesRollup
+from data_export import write_rows
+
+IDLE_DAYS = 90
+
+# Last sale per medicine comes from daily_sales_rollup, which checkout keeps
+# current; its (medicine_id, sale_date) index turns the MAX into one index
+# probe per medicine. Medicines with no rollup row at all have never sold and
+# are aged from the day they were added. On-hand is medicines.quantity, the
+# count checkout decrements; stock.quantity_in_stock only moves on receipts.
+# A rollup that was never backfilled would make every medicine look unsold,
+# so it is rebuilt from history before the report runs.
+DEAD_STOCK_QUERY = """
+    SELECT t.*, t.stock_value * t.idle_days AS idle_value
+    FROM (
+        SELECT m.medicine_id, m.name, m.category, m.supplier_id,
+               m.quantity AS on_hand,
+               m.price,
+               m.quantity * m.price AS stock_value,
+               l.last_sold,
+               DATEDIFF(CURDATE(), COALESCE(l.last_sold, DATE(m.created_at))) AS idle_days
+        FROM medicines m
+        LEFT JOIN (
+            SELECT medicine_id, MAX(sale_date) AS last_sold
+            FROM daily_sales_rollup
+            GROUP BY medicine_id
+        ) l ON l.medicine_id = m.medicine_id
+    ) t
+    WHERE t.on_hand > 0 AND t.idle_days >= %s
+    ORDER BY idle_value DESC
+"""
+
+
+def stream_dead_stock(idle_days: int = IDLE_DAYS, batch_size: int = 1000) -> Iterator[Dict]:
+    """Medicines on hand but unsold for idle_days or more, most capital tied up longest first"""
+    if SalesRollup.needs_backfill():
+        print(f"daily_sales_rollup does not cover sales history; rebuilt it with "
+              f"{SalesRollup.backfill()} rows", file=sys.stderr)
+    return Database.stream_query(DEAD_STOCK_QUERY, (idle_days,), batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report stock that has not sold recently")
+    parser.add_argument("--days", type=int, default=IDLE_DAYS, help="Minimum days since last sale")
+    parser.add_argument("--output", help="Write to this .csv/.jsonl(.gz) file instead of the console")
+    args = parser.parse_args()
+
+    rows = stream_dead_stock(args.days)
+    if args.output:
+        fmt = "jsonl" if ".jsonl" in args.output else "csv"
+        print(f"Wrote {write_rows(rows, args.output, fmt)} rows to {args.output}", file=sys.stderr)
+    else:
+        for row in rows:
+            last_sold = row['last_sold'] or "never"
+            print(f"{row['name']}: {row['on_hand']} on hand worth {row['stock_value']:.2f}, "
+                  f"last sold {last_sold} ({row['idle_days']} days)")
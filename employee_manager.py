@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from database import Employee
+from backend import Employee
+from change_feed import TreeviewSync
 
 class EmployeeManager:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, change_feed=None):
         self.frame = ttk.Frame(parent_frame)
         self.current_employee = None
         self.setup_ui()
+        if change_feed:
+            change_feed.subscribe("employees", TreeviewSync(
+                self.tree, self.format_row, include=lambda emp: not self.search_entry.get()
+            ), on_reset=self.search_employees)
 
     def setup_ui(self):
         # Search frame
@@ -63,18 +68,21 @@ class EmployeeManager:
         try:
             employees = Employee.get_all(search_term)
             for emp in employees:
-                self.tree.insert("", "end", values=(
-                    emp['employee_id'],
-                    emp['name'],
-                    emp['role'] or "N/A",
-                    emp['phone'] or "N/A",
-                    emp['email'] or "N/A",
-                    f"${emp['salary']:.2f}" if emp['salary'] else "N/A",
-                    emp['hire_date'].strftime("%Y-%m-%d") if emp['hire_date'] else "N/A"
-                ))
+                self.tree.insert("", "end", iid=str(emp['employee_id']), values=self.format_row(emp))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load employees: {str(e)}")
 
+    def format_row(self, emp):
+        return (
+            emp['employee_id'],
+            emp['name'],
+            emp['role'] or "N/A",
+            emp['phone'] or "N/A",
+            emp['email'] or "N/A",
+            f"${emp['salary']:.2f}" if emp['salary'] else "N/A",
+            emp['hire_date'].strftime("%Y-%m-%d") if emp['hire_date'] else "N/A"
+        )
+
     def search_employees(self, event=None):
         self.load_employees(self.search_entry.get())
 
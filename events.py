@@ -0,0 +1,86 @@
+import queue
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Type
+
+DISPATCH_MS = 100
+
+# Events published by the model layer in database.py once a write has
+# committed. Managers subscribe to the types they show and refresh only the
+# rows named in the event.
+
+
+class MedicineChanged(NamedTuple):
+    medicine_id: int
+    deleted: bool = False
+
+
+class StockMoved(NamedTuple):
+    """medicine_id's quantity changed by delta, or was set outright when delta is None"""
+    medicine_id: int
+    delta: Optional[int]
+    reason: str
+
+
+class CustomerChanged(NamedTuple):
+    customer_id: int
+    deleted: bool = False
+
+
+class OrderCreated(NamedTuple):
+    """A committed order (order_id) or SalesManager bill (order_id None)"""
+    order_id: Optional[int]
+    order_key: Optional[str]
+    customer_id: Optional[int]
+    medicine_ids: tuple
+
+
+class EventBus:
+    """Synchronous publish/subscribe within one process.
+
+    Handlers run in the publishing thread, except that once attach() has been
+    called with a Tk widget, events published from other threads (replay
+    worker, background jobs) are queued and delivered on the Tk thread.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[Type, List[Callable]] = {}
+        self.pending = queue.Queue()
+        self.widget = None
+
+    def subscribe(self, event_type: Type, handler: Callable):
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type: Type, handler: Callable):
+        if handler in self.handlers.get(event_type, []):
+            self.handlers[event_type].remove(handler)
+
+    def publish(self, event):
+        if self.widget is not None and threading.current_thread() is not threading.main_thread():
+            self.pending.put(event)
+        else:
+            self._deliver(event)
+
+    def _deliver(self, event):
+        for handler in list(self.handlers.get(type(event), [])):
+            try:
+                handler(event)
+            except Exception:
+                # One failing view must not keep the event from the others
+                pass
+
+    def attach(self, widget):
+        """Deliver events published off the Tk thread through widget's event loop"""
+        if self.widget is None:
+            self.widget = widget
+            self._dispatch()
+
+    def _dispatch(self):
+        while True:
+            try:
+                self._deliver(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        self.widget.after(DISPATCH_MS, self._dispatch)
+
+
+bus = EventBus()
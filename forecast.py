@@ -0,0 +1,232 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import product
+from typing import Dict, List, Tuple
+import numpy as np
+from database import Database
+from analytics import SALE_LINES, sale_lines_period
+
+HISTORY_DAYS = 730
+HORIZON_DAYS = 30
+CHUNK_SIZE = 5000
+WRITE_BATCH_SIZE = 1000
+
+# SKUs whose average interval between sales exceeds this are treated as
+# intermittent and forecast with Croston's method (Syntetos-Boylan cut-off).
+INTERMITTENT_ADI = 1.32
+
+HW_ALPHAS = (0.1, 0.3, 0.5)
+HW_BETAS = (0.01, 0.1)
+HW_GAMMAS = (0.05, 0.2, 0.4)
+HW_DAMPING = 0.9
+CROSTON_ALPHA = 0.1
+
+
+def load_daily_demand(history_days: int = HISTORY_DAYS) -> Tuple[np.ndarray, np.ndarray, date]:
+    """Return (medicine_ids, demand matrix [sku, day], first day) from all sales.
+
+    Order lines and counter bills both count as demand (analytics.SALE_LINES).
+
+    Units are summed per medicine and day in MySQL; the sparse result is
+    scattered into a dense matrix so every SKU shares the same time axis.
+    """
+    start = date.today() - timedelta(days=history_days)
+    rows = Database.fetch_all(
+        f"""SELECT l.medicine_id, DATE(l.sold_at) AS sale_day, SUM(l.quantity) AS units
+            FROM {SALE_LINES} l
+            GROUP BY l.medicine_id, DATE(l.sold_at)""",
+        sale_lines_period(start)
+    )
+    medicine_ids = np.array(
+        [r["medicine_id"] for r in Database.fetch_all("SELECT medicine_id FROM medicines ORDER BY medicine_id")],
+        dtype=np.int64
+    )
+    demand = np.zeros((len(medicine_ids), history_days), dtype=np.float64)
+    if rows and len(medicine_ids):
+        row_ids = np.fromiter((r["medicine_id"] for r in rows), dtype=np.int64, count=len(rows))
+        day = np.fromiter(((r["sale_day"] - start).days for r in rows), dtype=np.int64, count=len(rows))
+        units = np.fromiter((r["units"] for r in rows), dtype=np.float64, count=len(rows))
+        sku = np.minimum(np.searchsorted(medicine_ids, row_ids), len(medicine_ids) - 1)
+        keep = (medicine_ids[sku] == row_ids) & (day >= 0) & (day < history_days)
+        np.add.at(demand, (sku[keep], day[keep]), units[keep])
+    return medicine_ids, demand, start
+
+
+def to_weekly(demand: np.ndarray) -> np.ndarray:
+    """Sum daily demand into whole weeks, dropping the oldest partial week"""
+    weeks = demand.shape[1] // 7
+    trimmed = demand[:, demand.shape[1] - weeks * 7:]
+    return trimmed.reshape(demand.shape[0], weeks, 7).sum(axis=2)
+
+
+def holt_winters(demand: np.ndarray, season_length: int, horizon: int) -> np.ndarray:
+    """Damped additive Holt-Winters for every row of demand at once.
+
+    Each (alpha, beta, gamma) in the grid is run in parallel along a leading
+    axis and the combination with the lowest one-step squared error is kept
+    per SKU. Returns the forecast for the next horizon periods, shape [sku, horizon].
+    """
+    n_sku, n_periods = demand.shape
+    m = season_length
+    grid = np.array(list(product(HW_ALPHAS, HW_BETAS, HW_GAMMAS)))
+    alpha, beta, gamma = (grid[:, i][:, None] for i in range(3))
+
+    first = demand[:, :m].mean(axis=1)
+    second = demand[:, m:2 * m].mean(axis=1) if n_periods >= 2 * m else first
+    level = np.broadcast_to(first, (len(grid), n_sku)).copy()
+    trend = np.broadcast_to((second - first) / m, (len(grid), n_sku)).copy()
+    season = np.broadcast_to(demand[:, :m] - first[:, None], (len(grid), n_sku, m)).copy()
+    sse = np.zeros((len(grid), n_sku))
+
+    for t in range(n_periods):
+        y = demand[:, t]
+        s = season[:, :, t % m]
+        sse += (y - (level + HW_DAMPING * trend + s)) ** 2
+        new_level = alpha * (y - s) + (1 - alpha) * (level + HW_DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * HW_DAMPING * trend
+        season[:, :, t % m] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(n_sku)
+    level, trend, season = level[best, cols], trend[best, cols], season[best, cols]
+
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(HW_DAMPING ** steps)
+    season_idx = (n_periods + steps - 1) % m
+    forecast = level[:, None] + damped[None, :] * trend[:, None] + season[:, season_idx]
+    return np.maximum(forecast, 0)
+
+
+def croston(demand: np.ndarray, horizon: int, alpha: float = CROSTON_ALPHA) -> np.ndarray:
+    """Syntetos-Boylan corrected Croston forecast for intermittent demand rows"""
+    n_sku, n_periods = demand.shape
+    nonzero = demand > 0
+    counts = nonzero.sum(axis=1)
+    size = np.where(counts > 0, demand.sum(axis=1) / np.maximum(counts, 1), 0.0)
+    interval = np.where(counts > 0, n_periods / np.maximum(counts, 1), 1.0)
+    since_last = np.ones(n_sku)
+
+    for t in range(n_periods):
+        hit = nonzero[:, t]
+        size = np.where(hit, size + alpha * (demand[:, t] - size), size)
+        interval = np.where(hit, interval + alpha * (since_last - interval), interval)
+        since_last = np.where(hit, 1.0, since_last + 1.0)
+
+    rate = (1 - alpha / 2) * size / interval
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+def fit_chunk(demand: np.ndarray, horizon: int = HORIZON_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """Forecast daily demand for one block of SKUs.
+
+    With two years of history the series is fitted weekly with a 52-week
+    season so flu and allergy seasons are captured; otherwise it is fitted
+    daily with a 7-day season. Returns (forecast [sku, horizon], is_croston).
+    """
+    n_sku, n_days = demand.shape
+    sales_days = (demand > 0).sum(axis=1)
+    adi = np.where(sales_days > 0, n_days / np.maximum(sales_days, 1), np.inf)
+    intermittent = adi > INTERMITTENT_ADI
+
+    forecast = np.zeros((n_sku, horizon))
+    if intermittent.any():
+        forecast[intermittent] = croston(demand[intermittent], horizon)
+
+    smooth = ~intermittent
+    if smooth.any():
+        if n_days >= 2 * 364:
+            weeks_ahead = -(-horizon // 7)
+            weekly = holt_winters(to_weekly(demand[smooth]), 52, weeks_ahead)
+            forecast[smooth] = np.repeat(weekly / 7, 7, axis=1)[:, :horizon]
+        else:
+            forecast[smooth] = holt_winters(demand[smooth], 7, horizon)
+    return forecast, intermittent
+
+
+def fit_forecasts(demand: np.ndarray, horizon: int = HORIZON_DAYS, workers: int = 1,
+                  chunk_size: int = CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit every SKU, splitting large catalogues across a process pool"""
+    chunks = [demand[i:i + chunk_size] for i in range(0, len(demand), chunk_size)]
+    if not chunks:
+        return np.zeros((0, horizon)), np.zeros(0, dtype=bool)
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit_chunk, chunks, [horizon] * len(chunks)))
+    else:
+        results = [fit_chunk(chunk, horizon) for chunk in chunks]
+    return (np.concatenate([r[0] for r in results]),
+            np.concatenate([r[1] for r in results]))
+
+
+def save_forecasts(medicine_ids: np.ndarray, forecast: np.ndarray, intermittent: np.ndarray,
+                   history_days: int):
+    """Upsert one demand_forecasts row per medicine in multi-row batches"""
+    horizon = forecast.shape[1]
+    totals = forecast.sum(axis=1)
+    fitted_at = datetime.now()
+    conn = Database.get_connection()
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(medicine_ids), WRITE_BATCH_SIZE):
+            end = min(start + WRITE_BATCH_SIZE, len(medicine_ids))
+            params = []
+            for i in range(start, end):
+                params.extend((
+                    int(medicine_ids[i]),
+                    "croston" if intermittent[i] else "holt_winters",
+                    round(float(totals[i]) / horizon, 4),
+                    round(float(totals[i]), 2),
+                    horizon,
+                    history_days,
+                    fitted_at,
+                ))
+            cursor.execute(
+                f"""INSERT INTO demand_forecasts
+                    (medicine_id, model, avg_daily_demand, forecast_total, horizon_days, history_days, fitted_at)
+                    VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * (end - start))}
+                    ON DUPLICATE KEY UPDATE
+                        model = VALUES(model),
+                        avg_daily_demand = VALUES(avg_daily_demand),
+                        forecast_total = VALUES(forecast_total),
+                        horizon_days = VALUES(horizon_days),
+                        history_days = VALUES(history_days),
+                        fitted_at = VALUES(fitted_at)""",
+                tuple(params)
+            )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Failed to save forecasts: {str(e)}")
+    finally:
+        Database.close_connection(conn, cursor)
+
+
+def get_forecasts() -> List[Dict]:
+    """Persisted forecasts joined with medicine names"""
+    return Database.fetch_all(
+        """SELECT f.*, m.name FROM demand_forecasts f
+           JOIN medicines m ON f.medicine_id = m.medicine_id
+           ORDER BY f.forecast_total DESC"""
+    )
+
+
+def run(history_days: int = HISTORY_DAYS, horizon: int = HORIZON_DAYS, workers: int = 1) -> int:
+    """Refit and persist forecasts for the whole catalogue; returns SKUs fitted"""
+    medicine_ids, demand, _ = load_daily_demand(history_days)
+    forecast, intermittent = fit_forecasts(demand, horizon, workers)
+    if len(medicine_ids):
+        save_forecasts(medicine_ids, forecast, intermittent, history_days)
+    return len(medicine_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and store per-medicine demand forecasts")
+    parser.add_argument("--history-days", type=int, default=HISTORY_DAYS)
+    parser.add_argument("--horizon", type=int, default=HORIZON_DAYS)
+    parser.add_argument("--workers", type=int, default=1, help="Processes to fit large catalogues with")
+    args = parser.parse_args()
+
+    fitted = run(args.history_days, args.horizon, args.workers)
+    print(f"Stored {args.horizon}-day forecasts for {fitted} medicines")
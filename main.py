@@ -7,6 +7,8 @@ from order_manager import OrderManager
 from prescription_manager import PrescriptionManager
 from employee_manager import EmployeeManager
 from database import Database
+from events import bus
+from backend import CLIENT_MODE, ChangeFeed
 from logintoapp import LoginWindow  # Import the LoginWindow class
 
 class PharmacyApp:
@@ -15,13 +17,14 @@ class PharmacyApp:
         self.root.title("Pharmacy Management System")
         self.root.geometry("1200x800")
         
-        # Initialize database
-        try:
-            Database.initialize_pool()
-        except Exception as e:
-            messagebox.showerror("Database Error", str(e))
-            self.root.destroy()
-            return
+        # Initialize database; in client mode the service owns the pool
+        if not CLIENT_MODE:
+            try:
+                Database.initialize_pool()
+            except Exception as e:
+                messagebox.showerror("Database Error", str(e))
+                self.root.destroy()
+                return
         
         # Main container
         self.main_frame = ttk.Frame(root)
@@ -34,15 +37,20 @@ class PharmacyApp:
         self.content_frame = ttk.Frame(self.main_frame)
         self.content_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
         
+        # Other terminals' changes are pushed into the open views
+        self.change_feed = ChangeFeed()
+
         # Initialize managers
         self.managers = {
-            "medicines": MedicineManager(self.content_frame),
-            "suppliers": SupplierManager(self.content_frame),
-            "customers": CustomerManager(self.content_frame),
+            "medicines": MedicineManager(self.content_frame, self.change_feed),
+            "suppliers": SupplierManager(self.content_frame, self.change_feed),
+            "customers": CustomerManager(self.content_frame, self.change_feed),
             "orders": OrderManager(self.content_frame),
             "prescriptions": PrescriptionManager(self.content_frame),
-            "employees": EmployeeManager(self.content_frame)
+            "employees": EmployeeManager(self.content_frame, self.change_feed)
         }
+        self.change_feed.start(self.root)
+        bus.attach(self.root)
         
         # Show default view
         self.show_manager("medicines")
@@ -0,0 +1,259 @@
+import argparse
+import os
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from itertools import combinations
+from typing import List, Dict, Tuple, Iterator
+import numpy as np
+from database import Database
+from analytics import ALL_TIME, SALE_LINES, sale_lines_period
+
+MIN_SUPPORT = 0.001
+MIN_CONFIDENCE = 0.2
+MAX_ITEMSET_SIZE = 3
+
+# Upper bound on FP-tree nodes held at once. When a tree would grow past it
+# the item set is split into more groups and each group is mined from its
+# own, smaller projected tree.
+MAX_TREE_NODES = 2_000_000
+
+# A basket is an order or a counter bill (see analytics.SALE_LINES)
+ITEM_COUNTS_QUERY = """
+    SELECT l.medicine_id, COUNT(DISTINCT l.basket) AS orders
+    FROM """ + SALE_LINES + """ l
+    GROUP BY l.medicine_id
+"""
+
+ORDER_COUNT_QUERY = """
+    SELECT COUNT(DISTINCT l.basket) AS orders
+    FROM """ + SALE_LINES + """ l
+"""
+
+BASKETS_QUERY = """
+    SELECT l.basket, l.medicine_id
+    FROM """ + SALE_LINES + """ l
+    ORDER BY l.basket
+"""
+
+
+class _TreeTooLarge(Exception):
+    pass
+
+
+class FPTree:
+    """Prefix tree over rank-encoded transactions, stored as flat lists"""
+
+    __slots__ = ("item", "count", "parent", "children", "header", "max_nodes")
+
+    def __init__(self, max_nodes: int = None):
+        self.item = [-1]
+        self.count = [0]
+        self.parent = [-1]
+        self.children = {}
+        self.header = defaultdict(list)
+        self.max_nodes = max_nodes
+
+    def __len__(self) -> int:
+        return len(self.item)
+
+    def insert(self, items, count: int = 1):
+        node = 0
+        for item in items:
+            child = self.children.get((node, item))
+            if child is None:
+                child = len(self.item)
+                if self.max_nodes and child >= self.max_nodes:
+                    raise _TreeTooLarge()
+                self.item.append(item)
+                self.count.append(0)
+                self.parent.append(node)
+                self.children[(node, item)] = child
+                self.header[item].append(child)
+            self.count[child] += count
+            node = child
+
+    def support(self, item: int) -> int:
+        return sum(self.count[node] for node in self.header[item])
+
+    def prefix_paths(self, item: int) -> Iterator[Tuple[List[int], int]]:
+        for node in self.header[item]:
+            path = []
+            parent = self.parent[node]
+            while parent > 0:
+                path.append(self.item[parent])
+                parent = self.parent[parent]
+            path.reverse()
+            yield path, self.count[node]
+
+
+def _mine(tree: FPTree, suffix: Tuple[int, ...], items, min_count: int,
+          max_size: int, found: Dict[Tuple[int, ...], int]):
+    """FP-growth: every itemset ending in one of items, recursing on conditional trees"""
+    for item in items:
+        support = tree.support(item)
+        if support < min_count:
+            continue
+        itemset = (item,) + suffix
+        found[tuple(sorted(itemset))] = support
+        if len(itemset) >= max_size:
+            continue
+
+        paths = list(tree.prefix_paths(item))
+        counts = defaultdict(int)
+        for path, count in paths:
+            for prefix_item in path:
+                counts[prefix_item] += count
+        keep = {i for i, c in counts.items() if c >= min_count}
+        if not keep:
+            continue
+        conditional = FPTree()
+        for path, count in paths:
+            filtered = [i for i in path if i in keep]
+            if filtered:
+                conditional.insert(filtered, count)
+        _mine(conditional, itemset, sorted(keep, reverse=True), min_count, max_size, found)
+
+
+def _encode_baskets(ranks: Dict[int, int], start: datetime, end: datetime, directory: str):
+    """Stream baskets once, writing rank-encoded, sorted transactions to flat int32 files"""
+    items_path = os.path.join(directory, "items.bin")
+    lengths_path = os.path.join(directory, "lengths.bin")
+    with open(items_path, "wb") as items_file, open(lengths_path, "wb") as lengths_file:
+        current_order, basket = None, set()
+        items_buf, lengths_buf = [], []
+
+        def flush_basket():
+            if len(basket) > 0:
+                items_buf.extend(sorted(basket))
+                lengths_buf.append(len(basket))
+
+        for row in Database.stream_query(BASKETS_QUERY, sale_lines_period(start, end), batch_size=10000):
+            if row["basket"] != current_order:
+                flush_basket()
+                current_order, basket = row["basket"], set()
+                if len(items_buf) >= 1_000_000:
+                    np.asarray(items_buf, dtype=np.int32).tofile(items_file)
+                    np.asarray(lengths_buf, dtype=np.int32).tofile(lengths_file)
+                    items_buf, lengths_buf = [], []
+            rank = ranks.get(row["medicine_id"])
+            if rank is not None:
+                basket.add(rank)
+        flush_basket()
+        np.asarray(items_buf, dtype=np.int32).tofile(items_file)
+        np.asarray(lengths_buf, dtype=np.int32).tofile(lengths_file)
+    return items_path, lengths_path
+
+
+def _iter_transactions(items_path: str, lengths_path: str) -> Iterator[List[int]]:
+    if os.path.getsize(lengths_path) == 0:
+        return
+    items = np.memmap(items_path, dtype=np.int32, mode="r")
+    lengths = np.memmap(lengths_path, dtype=np.int32, mode="r")
+    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+    for i in range(len(lengths)):
+        yield items[offsets[i]:offsets[i + 1]].tolist()
+
+
+def frequent_itemsets(min_support: float = MIN_SUPPORT, max_size: int = MAX_ITEMSET_SIZE,
+                      start: datetime = None, end: datetime = None,
+                      max_nodes: int = MAX_TREE_NODES) -> Tuple[Dict[Tuple[int, ...], int], int]:
+    """Mine itemsets bought together in at least min_support of orders.
+
+    Returns ({(medicine_id, ...): order_count}, total_orders).
+    """
+    period = (start or ALL_TIME[0], end or ALL_TIME[1])
+    total = Database.fetch_one(ORDER_COUNT_QUERY, sale_lines_period(*period))["orders"] or 0
+    if total == 0:
+        return {}, 0
+    min_count = max(1, int(np.ceil(min_support * total)))
+
+    # Rank 0 is the most frequent medicine; transactions are inserted in rank
+    # order so common prefixes share tree nodes
+    item_counts = [r for r in Database.fetch_all(ITEM_COUNTS_QUERY, sale_lines_period(*period)) if r["orders"] >= min_count]
+    item_counts.sort(key=lambda r: (-r["orders"], r["medicine_id"]))
+    medicine_ids = [r["medicine_id"] for r in item_counts]
+    ranks = {medicine_id: rank for rank, medicine_id in enumerate(medicine_ids)}
+    if not ranks:
+        return {}, total
+
+    found = {}
+    with tempfile.TemporaryDirectory(prefix="basket_") as directory:
+        items_path, lengths_path = _encode_baskets(ranks, *period, directory)
+        groups = 1
+        while True:
+            try:
+                found = {}
+                for group in range(groups):
+                    # Projected tree for this group: each transaction is cut
+                    # after its last item belonging to the group
+                    tree = FPTree(max_nodes)
+                    for transaction in _iter_transactions(items_path, lengths_path):
+                        for cut in range(len(transaction) - 1, -1, -1):
+                            if transaction[cut] % groups == group:
+                                tree.insert(transaction[:cut + 1])
+                                break
+                    group_items = [r for r in range(len(medicine_ids) - 1, -1, -1) if r % groups == group]
+                    _mine(tree, (), group_items, min_count, max_size, found)
+                    del tree
+                break
+            except _TreeTooLarge:
+                if groups >= len(medicine_ids):
+                    raise Exception("Basket data does not fit the tree budget; raise max_nodes or min_support")
+                groups = min(groups * 2, len(medicine_ids))
+
+    return {tuple(sorted(medicine_ids[r] for r in itemset)): count for itemset, count in found.items()}, total
+
+
+def association_rules(itemsets: Dict[Tuple[int, ...], int], total: int,
+                      min_confidence: float = MIN_CONFIDENCE) -> List[Dict]:
+    """Rules antecedent -> consequent with support, confidence and lift, best lift first"""
+    rules = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for size in range(1, len(itemset)):
+            for antecedent in combinations(itemset, size):
+                consequent = tuple(i for i in itemset if i not in antecedent)
+                confidence = count / itemsets[antecedent]
+                if confidence < min_confidence:
+                    continue
+                rules.append({
+                    "antecedent": antecedent,
+                    "consequent": consequent,
+                    "support": count / total,
+                    "confidence": confidence,
+                    "lift": confidence / (itemsets[consequent] / total),
+                })
+    rules.sort(key=lambda r: (-r["lift"], -r["confidence"]))
+    return rules
+
+
+def get_rules(min_support: float = MIN_SUPPORT, min_confidence: float = MIN_CONFIDENCE,
+              max_size: int = MAX_ITEMSET_SIZE, start: datetime = None, end: datetime = None) -> List[Dict]:
+    """Association rules with medicine names filled in"""
+    itemsets, total = frequent_itemsets(min_support, max_size, start, end)
+    rules = association_rules(itemsets, total, min_confidence)
+    ids = sorted({i for rule in rules for i in rule["antecedent"] + rule["consequent"]})
+    names = {}
+    if ids:
+        placeholders = ", ".join(["%s"] * len(ids))
+        names = {row["medicine_id"]: row["name"] for row in Database.fetch_all(
+            f"SELECT medicine_id, name FROM medicines WHERE medicine_id IN ({placeholders})", tuple(ids))}
+    for rule in rules:
+        rule["antecedent_names"] = [names.get(i, str(i)) for i in rule["antecedent"]]
+        rule["consequent_names"] = [names.get(i, str(i)) for i in rule["consequent"]]
+    return rules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find medicines that are bought together")
+    parser.add_argument("--min-support", type=float, default=MIN_SUPPORT)
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    parser.add_argument("--max-size", type=int, default=MAX_ITEMSET_SIZE)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    for rule in get_rules(args.min_support, args.min_confidence, args.max_size)[:args.limit]:
+        print(f"{', '.join(rule['antecedent_names'])} -> {', '.join(rule['consequent_names'])}  "
+              f"support={rule['support']:.4f} confidence={rule['confidence']:.2f} lift={rule['lift']:.2f}")
@@ -1,14 +1,28 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import traceback
-from database import Medicine, Supplier, Database
+from database import Database
+from backend import Medicine, Supplier
+from change_feed import TreeviewSync
+from events import bus, MedicineChanged, StockMoved
+from bulk_import import BulkImporter
 
 class MedicineManager:
-    def __init__(self, parent):
+    def __init__(self, parent, change_feed=None):
         self.frame = ttk.Frame(parent)
         self.current_medicine = None
         self.setup_ui()
+        self.tree_sync = TreeviewSync(
+            self.tree, self.format_row,
+            include=lambda med: not self.search_entry.get(),
+            fetch=lambda medicine_id: Medicine.get_by_id(medicine_id, include_supplier=True),
+            joined=True
+        )
+        bus.subscribe(MedicineChanged, lambda event: self.tree_sync.refresh(event.medicine_id))
+        bus.subscribe(StockMoved, lambda event: self.tree_sync.refresh(event.medicine_id))
+        if change_feed:
+            change_feed.subscribe("medicines", self.tree_sync, on_reset=self.load_medicines)
 
     def setup_ui(self):
         """Initialize all UI components"""
@@ -56,6 +70,7 @@ class MedicineManager:
         self.delete_btn = ttk.Button(btn_frame, text="Delete", state=tk.DISABLED, command=self.delete_medicine)
         self.delete_btn.pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Refresh", command=self.load_medicines).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Import CSV", command=self.import_medicines).pack(side=tk.RIGHT, padx=5)
         
         # Load initial data
         self.load_medicines()
@@ -69,18 +84,21 @@ class MedicineManager:
         try:
             medicines = Medicine.get_all(search_term if search_term else None, include_supplier=True)
             for med in medicines:
-                self.tree.insert("", tk.END, values=(
-                    med['medicine_id'],
-                    med['name'],
-                    med['quantity'],
-                    f"${med['price']:.2f}",
-                    med['expiry_date'].strftime("%Y-%m-%d") if med['expiry_date'] else "N/A",
-                    med['category'] or "N/A",
-                    med.get('supplier_name', "N/A")
-                ))
+                self.tree.insert("", tk.END, iid=str(med['medicine_id']), values=self.format_row(med))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load medicines: {str(e)}")
 
+    def format_row(self, med):
+        return (
+            med['medicine_id'],
+            med['name'],
+            med['quantity'],
+            f"${med['price']:.2f}",
+            med['expiry_date'].strftime("%Y-%m-%d") if med['expiry_date'] else "N/A",
+            med['category'] or "N/A",
+            med.get('supplier_name', "N/A")
+        )
+
     def on_select(self, event):
         """Handle medicine selection"""
         selected = self.tree.selection()
@@ -110,6 +128,32 @@ class MedicineManager:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to add medicine: {str(e)}")
 
+    def import_medicines(self):
+        """Bulk import a medicine catalogue or stock receipt file"""
+        path = filedialog.askopenfilename(
+            title="Import Medicines",
+            filetypes=[("CSV/TSV files", "*.csv *.tsv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+
+        entity = "stock" if messagebox.askyesno(
+            "Import Type", "Is this a stock receipt file?\n\nChoose No for a medicine catalogue."
+        ) else "medicines"
+        try:
+            report = BulkImporter(entity).import_file(path)
+            self.load_medicines()
+            message = report.summary()
+            if report.errors:
+                message += "\n\n" + "\n".join(f"Line {line}: {error}" for line, error in report.errors[:20])
+                if len(report.errors) > 20:
+                    message += f"\n... and {len(report.errors) - 20} more"
+                messagebox.showwarning("Import Finished", message)
+            else:
+                messagebox.showinfo("Import Finished", message)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to import file: {str(e)}")
+
     def edit_medicine(self):
         """Open edit medicine dialog"""
         if not self.current_medicine:
@@ -134,6 +178,7 @@ class MedicineManager:
                     'manufacturer': medicine_data.get('manufacturer', ""),
                     'batch_number': medicine_data.get('batch_number', ""),
                     'description': medicine_data.get('description', ""),
+                    'sku': medicine_data.get('sku') or "",
                     'supplier_id': medicine_data['supplier_id']
                 }
             )
@@ -221,9 +266,7 @@ class MedicineManager:
     def is_medicine_referenced(self, medicine_id):
         """Check if medicine is referenced in order_items table"""
         try:
-            query = "SELECT COUNT(*) FROM order_items WHERE medicine_id = %s"
-            result = Database.fetch_one(query, (medicine_id,))
-            return result['COUNT(*)'] > 0 if result else False
+            return Medicine.is_referenced(medicine_id)
         except Exception as e:
             messagebox.showerror("Error", f"Could not check references: {str(e)}")
             return True  # Be conservative - prevent deletion if we can't check
@@ -243,7 +286,7 @@ class MedicineDialog(tk.Toplevel):
     def __init__(self, parent, title, initial_data=None):
         super().__init__(parent)
         self.title(title)
-        self.geometry("500x400")
+        self.geometry("500x440")
         self.resizable(False, False)
         self.result = None
         
@@ -256,7 +299,8 @@ class MedicineDialog(tk.Toplevel):
             ("Manufacturer", "manufacturer", False),
             ("Batch Number", "batch_number", False),
             ("Category", "category", False),
-            ("Description", "description", False)
+            ("Description", "description", False),
+            ("Barcode / SKU", "sku", False)
         ]
         
         self.entries = {}
@@ -325,9 +369,10 @@ class MedicineDialog(tk.Toplevel):
                 'price': self.entries['price'].get(),
                 'expiry_date': self.entries['expiry_date'].get() or None,
                 'manufacturer': self.entries['manufacturer'].get() or None,
-                'batch_number': self.entries['batch_number'].get() or None,
+                'batch_number': self.entries['batch_number'].get().strip(),
                 'category': self.entries['category'].get() or None,
                 'description': self.entries['description'].get() or None,
+                'sku': self.entries['sku'].get().strip() or None,
                 'supplier_id': int(self.supplier_combo.get().split(" - ")[0]) if self.supplier_combo.get() else None
             }
             self.destroy()
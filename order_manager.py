@@ -1,13 +1,17 @@
 import tkinter as tk
+import uuid
 from tkinter import ttk, messagebox
 from datetime import datetime
-from database import Order, Medicine, Customer, Employee, Stock, Database
+from database import Stock, Database
+from backend import Order, Medicine, Customer, Employee
 
 class OrderManager:
     def __init__(self, parent_frame):
         self.frame = ttk.Frame(parent_frame)
         self.current_order = None
         self.order_items = []
+        # Idempotency key for the order being edited, reused when saving is retried
+        self.order_key = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -166,6 +170,7 @@ class OrderManager:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
     def update_items_tree(self):
+        self.order_key = None
         for row in self.items_tree.get_children():
             self.items_tree.delete(row)
         
@@ -208,30 +213,28 @@ class OrderManager:
             customer_id = int(customer.split(" - ")[0])
             employee_id = int(employee.split(" - ")[0])
             
+            if self.order_key is None:
+                self.order_key = uuid.uuid4().hex
+            total_amount = sum(item['subtotal'] for item in self.order_items)
             order_data = {
                 'customer_id': customer_id,
                 'employee_id': employee_id,
                 'order_type': order_type,
-                'total_amount': sum(item['subtotal'] for item in self.order_items),
-                'order_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'total_amount': total_amount,
+                'order_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'order_key': self.order_key,
+                'loyalty_points': int(total_amount * 10)
             }
             
-            # Create order with items
-            order_id = Order.create_with_items(order_data, self.order_items)
+            # Stock and loyalty points are updated in the same transaction, so
+            # a retry after a lost reply returns the original order
+            order_id = Database.run_with_retries(
+                lambda: Order.create_with_details(order_data, self.order_items)
+            )
             
             if not order_id:
                 raise Exception("Failed to create order")
             
-            # Update medicine quantities
-            for item in self.order_items:
-                success = Medicine.reduce_stock(item['medicine_id'], item['quantity'], item['name'])
-                if not success:
-                    raise Exception(f"Failed to update stock for {item['name']}")
-            
-            # Update customer loyalty points
-            points = int(order_data['total_amount'] * 10)
-            Customer.add_loyalty_points(customer_id, points)
-            
             messagebox.showinfo("Success", f"Order #{order_id} created successfully")
             self.new_order()
             
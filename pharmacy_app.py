@@ -8,6 +8,8 @@ from medicine_manager import MedicineManager
 from sales_manager import SalesManager
 from logintoapp import LoginWindow
 from database import Database
+from events import bus
+from backend import CLIENT_MODE, Medicine, ChangeFeed
 
 class PharmacyApp:
     def __init__(self, root):
@@ -16,13 +18,14 @@ class PharmacyApp:
         self.root.geometry("1400x800")
         self.root.configure(bg="#f0f0f0")
 
-        # Initialize database
-        try:
-            Database.initialize_pool()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to connect to database: {str(e)}")
-            self.root.destroy()
-            return
+        # Initialize database; in client mode the service owns the pool
+        if not CLIENT_MODE:
+            try:
+                Database.initialize_pool()
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to connect to database: {str(e)}")
+                self.root.destroy()
+                return
 
         # Modern Theme
         self.style = ttk.Style()
@@ -56,11 +59,16 @@ class PharmacyApp:
         self.main_frame = ttk.Frame(root)
         self.main_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
 
+        # Other terminals' changes are pushed into the open views
+        self.change_feed = ChangeFeed()
+
         # Initialize all managers
-        self.medicine_manager = MedicineManager(self.main_frame)
-        self.sales_manager = SalesManager(self.main_frame)
-        self.customer_manager = CustomerManager(self.main_frame)
-        self.supplier_manager = SupplierManager(self.main_frame)
+        self.medicine_manager = MedicineManager(self.main_frame, self.change_feed)
+        self.sales_manager = SalesManager(self.main_frame, self.medicine_manager, self.change_feed)
+        self.customer_manager = CustomerManager(self.main_frame, self.change_feed)
+        self.supplier_manager = SupplierManager(self.main_frame, self.change_feed)
+        self.change_feed.start(self.root)
+        bus.attach(self.root)
 
         # Show default view
         self.show_medicine_management()
@@ -71,8 +79,7 @@ class PharmacyApp:
         try:
             today = datetime.now().date()
             alert_date = today + timedelta(days=30)
-            query = "SELECT name, expiry_date FROM medicines WHERE expiry_date <= %s"
-            expiring_medicines = Database.execute_query(query, (alert_date,), fetch=True)
+            expiring_medicines = Medicine.get_expiring(alert_date)
 
             if expiring_medicines:
                 alert_message = "The following medicines are nearing expiration:\n\n"
@@ -7,11 +7,19 @@ CREATE TABLE customers (
   address text DEFAULT NULL,
   age int DEFAULT NULL,
   loyalty_points int DEFAULT 0,
+  rfm_recency tinyint DEFAULT NULL,
+  rfm_frequency tinyint DEFAULT NULL,
+  rfm_monetary tinyint DEFAULT NULL,
+  rfm_segment varchar(20) DEFAULT NULL,
+  rfm_scored_at datetime DEFAULT NULL,
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (customer_id),
   UNIQUE KEY email (email),
-  KEY name (name)
+  KEY name (name),
+  KEY rfm_segment (rfm_segment),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE employees (
@@ -27,7 +35,9 @@ CREATE TABLE employees (
   PRIMARY KEY (employee_id),
   UNIQUE KEY email (email),
   KEY name (name),
-  KEY role (role)
+  KEY role (role),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE suppliers (
@@ -38,11 +48,16 @@ CREATE TABLE suppliers (
   email varchar(100) DEFAULT NULL,
   country varchar(50) DEFAULT NULL,
   payment_terms varchar(100) DEFAULT NULL,
+  lead_time_mean_days decimal(8, 2) DEFAULT NULL,
+  lead_time_std_days decimal(8, 2) DEFAULT NULL,
+  lead_time_samples int NOT NULL DEFAULT 0,
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (supplier_id),
   UNIQUE KEY email (email),
-  KEY name (name)
+  KEY name (name),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE medicines (
@@ -52,17 +67,22 @@ CREATE TABLE medicines (
   price decimal(10, 2) NOT NULL,
   expiry_date date DEFAULT NULL,
   manufacturer varchar(100) DEFAULT NULL,
-  batch_number varchar(50) DEFAULT NULL,
+  batch_number varchar(50) NOT NULL DEFAULT '',
   category varchar(50) DEFAULT NULL,
   description text DEFAULT NULL,
   supplier_id int DEFAULT NULL,
+  sku varchar(64) DEFAULT NULL,
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (medicine_id),
+  UNIQUE KEY name_batch (name, batch_number),
+  UNIQUE KEY sku (sku),
   KEY supplier_id (supplier_id),
   KEY name (name),
   KEY category (category),
-  KEY expiry_date (expiry_date)
+  KEY expiry_date (expiry_date),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE stock (
@@ -74,7 +94,9 @@ CREATE TABLE stock (
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (stock_id),
-  KEY medicine_id (medicine_id)
+  UNIQUE KEY medicine_id (medicine_id),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE orders (
@@ -84,11 +106,16 @@ CREATE TABLE orders (
   order_type varchar(50) DEFAULT NULL,
   total_amount decimal(10, 2) NOT NULL,
   order_date timestamp NOT NULL DEFAULT current_timestamp(),
+  order_key char(32) DEFAULT NULL,
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (order_id),
+  UNIQUE KEY order_key (order_key),
   KEY customer_id (customer_id),
-  KEY employee_id (employee_id)
+  KEY employee_id (employee_id),
+  KEY order_date (order_date),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE order_items (
@@ -105,6 +132,24 @@ CREATE TABLE order_items (
   KEY medicine_id (medicine_id)
 );
 
+CREATE TABLE sales (
+  sale_id int NOT NULL AUTO_INCREMENT,
+  medicine_id int NOT NULL,
+  quantity int NOT NULL,
+  unit_price decimal(10, 2) NOT NULL,
+  total_price decimal(10, 2) NOT NULL,
+  sale_date datetime NOT NULL,
+  customer_id int DEFAULT NULL,
+  order_key char(32) DEFAULT NULL,
+  created_at timestamp NOT NULL DEFAULT current_timestamp(),
+  updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
+  PRIMARY KEY (sale_id),
+  UNIQUE KEY order_key_medicine (order_key, medicine_id),
+  KEY medicine_id (medicine_id),
+  KEY customer_id (customer_id),
+  KEY sale_date (sale_date)
+);
+
 CREATE TABLE prescriptions (
   prescription_id int NOT NULL AUTO_INCREMENT,
   customer_id int NOT NULL,
@@ -116,7 +161,10 @@ CREATE TABLE prescriptions (
   created_at timestamp NOT NULL DEFAULT current_timestamp(),
   updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
   PRIMARY KEY (prescription_id),
-  KEY customer_id (customer_id)
+  KEY customer_issue (customer_id, issue_date),
+  KEY issue_date (issue_date),
+  KEY updated_at (updated_at),
+  KEY created_at (created_at)
 );
 
 CREATE TABLE prescription_items (
@@ -133,6 +181,120 @@ CREATE TABLE prescription_items (
   KEY medicine_id (medicine_id)
 );
 
+CREATE TABLE demand_forecasts (
+  medicine_id int NOT NULL,
+  model varchar(20) NOT NULL,
+  avg_daily_demand decimal(12, 4) NOT NULL,
+  forecast_total decimal(12, 2) NOT NULL,
+  horizon_days int NOT NULL,
+  history_days int NOT NULL,
+  fitted_at timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (medicine_id)
+);
+
+CREATE TABLE analytics_watermarks (
+  pipeline varchar(50) NOT NULL,
+  last_order_id int NOT NULL DEFAULT 0,
+  last_order_created_at timestamp NULL DEFAULT NULL,
+  last_sale_id int NOT NULL DEFAULT 0,
+  refreshed_at timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (pipeline)
+);
+
+CREATE TABLE daily_medicine_sales (
+  sale_date date NOT NULL,
+  medicine_id int NOT NULL,
+  units int NOT NULL DEFAULT 0,
+  revenue decimal(14, 2) NOT NULL DEFAULT 0,
+  order_lines int NOT NULL DEFAULT 0,
+  PRIMARY KEY (sale_date, medicine_id),
+  KEY medicine_id (medicine_id)
+);
+
+CREATE TABLE daily_employee_sales (
+  sale_date date NOT NULL,
+  employee_id int NOT NULL,
+  orders int NOT NULL DEFAULT 0,
+  revenue decimal(14, 2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (sale_date, employee_id),
+  KEY employee_id (employee_id)
+);
+
+CREATE TABLE daily_sales_rollup (
+  sale_date date NOT NULL,
+  medicine_id int NOT NULL,
+  employee_id int NOT NULL DEFAULT 0,
+  quantity int NOT NULL DEFAULT 0,
+  revenue decimal(14, 2) NOT NULL DEFAULT 0,
+  -- Orders/bills containing this medicine that day; summed over medicines this is order lines
+  order_count int NOT NULL DEFAULT 0,
+  PRIMARY KEY (sale_date, medicine_id, employee_id),
+  KEY medicine_date (medicine_id, sale_date),
+  KEY employee_id (employee_id)
+);
+
+CREATE TABLE purchase_orders (
+  purchase_order_id int NOT NULL AUTO_INCREMENT,
+  supplier_id int NOT NULL,
+  status varchar(20) NOT NULL DEFAULT 'open',
+  batch_ref varchar(36) DEFAULT NULL,
+  total_amount decimal(12, 2) NOT NULL DEFAULT 0,
+  sent_at datetime DEFAULT NULL,
+  received_at datetime DEFAULT NULL,
+  created_at timestamp NOT NULL DEFAULT current_timestamp(),
+  updated_at timestamp NULL DEFAULT NULL ON UPDATE current_timestamp(),
+  PRIMARY KEY (purchase_order_id),
+  KEY supplier_id (supplier_id),
+  KEY status (status),
+  KEY batch_ref (batch_ref)
+);
+
+CREATE TABLE purchase_order_items (
+  item_id int NOT NULL AUTO_INCREMENT,
+  purchase_order_id int NOT NULL,
+  medicine_id int NOT NULL,
+  quantity_ordered int NOT NULL,
+  quantity_received int NOT NULL DEFAULT 0,
+  unit_price decimal(10, 2) NOT NULL,
+  PRIMARY KEY (item_id),
+  KEY purchase_order_id (purchase_order_id),
+  KEY medicine_id (medicine_id)
+);
+
+-- Change feed: rows deleted from the watched tables, filled by the triggers
+-- below and read by change_feed.py. Deletes done by ON DELETE CASCADE do not
+-- fire triggers, so removing a customer or medicine is reported for the
+-- parent row only.
+CREATE TABLE deleted_rows (
+  tombstone_id bigint NOT NULL AUTO_INCREMENT,
+  table_name varchar(64) NOT NULL,
+  row_id int NOT NULL,
+  deleted_at timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (tombstone_id),
+  KEY deleted_at (deleted_at)
+);
+
+CREATE TRIGGER customers_tombstone AFTER DELETE ON customers
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('customers', OLD.customer_id);
+
+CREATE TRIGGER employees_tombstone AFTER DELETE ON employees
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('employees', OLD.employee_id);
+
+CREATE TRIGGER suppliers_tombstone AFTER DELETE ON suppliers
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('suppliers', OLD.supplier_id);
+
+CREATE TRIGGER medicines_tombstone AFTER DELETE ON medicines
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('medicines', OLD.medicine_id);
+
+CREATE TRIGGER stock_tombstone AFTER DELETE ON stock
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('stock', OLD.stock_id);
+
+CREATE TRIGGER orders_tombstone AFTER DELETE ON orders
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('orders', OLD.order_id);
+
+CREATE TRIGGER prescriptions_tombstone AFTER DELETE ON prescriptions
+FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('prescriptions', OLD.prescription_id);
+
 -- Foreign key constraints
 
 -- Foreign key for medicines → suppliers
@@ -190,6 +352,28 @@ ADD FOREIGN KEY (medicine_id) REFERENCES medicines(medicine_id)
 ON DELETE CASCADE
 ON UPDATE CASCADE;
 
+-- demand_forecasts → medicines
+ALTER TABLE demand_forecasts
+ADD FOREIGN KEY (medicine_id) REFERENCES medicines(medicine_id)
+ON DELETE CASCADE
+ON UPDATE CASCADE;
+
+-- purchase_orders → suppliers
+ALTER TABLE purchase_orders
+ADD FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+ON UPDATE CASCADE;
+
+-- purchase_order_items → purchase_orders
+ALTER TABLE purchase_order_items
+ADD FOREIGN KEY (purchase_order_id) REFERENCES purchase_orders(purchase_order_id)
+ON DELETE CASCADE
+ON UPDATE CASCADE;
+
+-- purchase_order_items → medicines
+ALTER TABLE purchase_order_items
+ADD FOREIGN KEY (medicine_id) REFERENCES medicines(medicine_id)
+ON UPDATE CASCADE;
+
 
 
 -- Sample data insertion
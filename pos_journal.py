@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import List, Dict, Iterator
+import mysql.connector
+from database import Database
+from backend import Sale
+
+JOURNAL_DIR = os.path.join(os.getcwd(), "journal")
+BATCH_SIZE = 50
+REPLAY_INTERVAL = 15
+
+# pending.jsonl holds checkouts taken while the database was unreachable, one
+# fsync'd JSON object per line. Each carries the bill's order_key, so replaying
+# an entry that already reached the database (the connection died after
+# COMMIT) is a no-op. Entries the database rejects, e.g. because stock ran out
+# in the meantime, move to conflicts.jsonl for someone to resolve by hand.
+
+# Rejections of the bill's data, which a later replay would only repeat. Any
+# other error stops the replay and leaves the bill pending.
+CONFLICT_ERRORS = (ValueError, mysql.connector.IntegrityError, mysql.connector.DataError)
+
+
+class OfflineJournal:
+    def __init__(self, root: str = JOURNAL_DIR):
+        self.root = root
+        self.pending_path = os.path.join(root, "pending.jsonl")
+        self.conflicts_path = os.path.join(root, "conflicts.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def _write(path: str, entries: List[Dict], mode: str):
+        with open(path, mode, encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    @staticmethod
+    def _read(path: str) -> Iterator[Dict]:
+        try:
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def append(self, order_key: str, lines: List[tuple], customer_id: int = None, sale_date: datetime = None):
+        """Durably record a bill of (medicine_id, quantity, unit_price, total) lines"""
+        entry = {
+            "order_key": order_key,
+            "customer_id": customer_id,
+            "sale_date": (sale_date or datetime.now()).isoformat(),
+            "lines": [[int(medicine_id), int(quantity), float(price), float(total)]
+                      for medicine_id, quantity, price, total in lines],
+        }
+        with self._lock:
+            self._write(self.pending_path, [entry], "a")
+
+    def pending(self) -> List[Dict]:
+        with self._lock:
+            return list(self._read(self.pending_path))
+
+    def conflicts(self) -> List[Dict]:
+        return list(self._read(self.conflicts_path))
+
+    def _settle(self, done: set, conflicts: List[Dict]):
+        """Drop replayed entries from pending and file the conflicts, atomically"""
+        with self._lock:
+            if conflicts:
+                self._write(self.conflicts_path, conflicts, "a")
+            remaining = [entry for entry in self._read(self.pending_path) if entry["order_key"] not in done]
+            tmp = self.pending_path + ".tmp"
+            self._write(tmp, remaining, "w")
+            os.replace(tmp, self.pending_path)
+
+    def replay(self, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        """Send pending bills to the database, batch_size at a time.
+
+        Only CONFLICT_ERRORS move a bill to conflicts. Stops at the first
+        connection failure and leaves the rest pending; other errors also
+        stop the replay and are raised. Returns counts of replayed,
+        duplicate, conflict and pending entries.
+        """
+        counts = {"replayed": 0, "duplicate": 0, "conflict": 0, "pending": 0}
+        entries = self.pending()
+        for start in range(0, len(entries), batch_size):
+            done, conflicts = set(), []
+            try:
+                for entry in entries[start:start + batch_size]:
+                    try:
+                        recorded = Database.run_with_retries(lambda: Sale.record_bill(
+                            entry["order_key"],
+                            [tuple(line) for line in entry["lines"]],
+                            entry["customer_id"],
+                            datetime.fromisoformat(entry["sale_date"])
+                        ))
+                        counts["replayed" if recorded else "duplicate"] += 1
+                    except CONFLICT_ERRORS as e:
+                        conflicts.append(dict(entry, error=str(e), flagged_at=datetime.now().isoformat()))
+                        counts["conflict"] += 1
+                    done.add(entry["order_key"])
+            except Exception as e:
+                # Keep what this batch already settled; the failed bill and
+                # everything after it stay pending
+                self._settle(done, conflicts)
+                if not Database.is_unreachable(e):
+                    raise
+                break
+            self._settle(done, conflicts)
+        counts["pending"] = len(self.pending())
+        return counts
+
+
+class ReplayWorker:
+    """Background thread that drains the journal whenever it has entries.
+
+    Each pass puts its (counts, error) pair on the results queue, for the Tk
+    side to poll from the main loop.
+    """
+
+    def __init__(self, journal: OfflineJournal, interval: float = REPLAY_INTERVAL):
+        self.journal = journal
+        self.interval = interval
+        self.results = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set() or not self.journal.pending():
+                continue
+            try:
+                self.results.put((self.journal.replay(), None))
+            except Exception as e:
+                self.results.put((None, e))
+
+    def drain(self) -> List[tuple]:
+        """Collect the results finished so far without blocking"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or replay the offline checkout journal")
+    parser.add_argument("command", choices=["status", "replay", "conflicts"])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    journal = OfflineJournal()
+    if args.command == "replay":
+        print(journal.replay(args.batch_size))
+    elif args.command == "conflicts":
+        for conflict in journal.conflicts():
+            print(f"{conflict['order_key']}  {conflict['sale_date']}  {conflict['error']}")
+    else:
+        print(f"{len(journal.pending())} pending, {len(journal.conflicts())} conflicts")
@@ -1,7 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-from database import Prescription, Customer, Medicine, Database
+from database import Database
+from backend import Prescription, Customer, Medicine
+from events import bus, CustomerChanged
+
+PAGE_SIZE = 200
 
 class PrescriptionDialog(tk.Toplevel):
     def __init__(self, parent, title, data=None):
@@ -374,7 +378,12 @@ class PrescriptionManager:
     def __init__(self, parent_frame):
         self.frame = ttk.Frame(parent_frame)
         self.current_prescription = None
+        self.page_customer_id = None
+        # First-row cursor of every page up to the current one, for Previous
+        self.page_starts = [None]
+        self.next_start = None
         self.setup_ui()
+        bus.subscribe(CustomerChanged, self.on_customer_changed)
 
     def setup_ui(self):
         # Search frame
@@ -407,6 +416,18 @@ class PrescriptionManager:
         self.tree.pack(fill="both", expand=True, padx=10, pady=5)
         self.tree.bind("<<TreeviewSelect>>", self.on_prescription_select)
         
+        # Paging
+        page_frame = ttk.Frame(self.frame)
+        page_frame.pack(fill="x", padx=10)
+        
+        self.prev_btn = ttk.Button(page_frame, text="< Previous", command=self.prev_page, state="disabled")
+        self.next_btn = ttk.Button(page_frame, text="Next >", command=self.next_page, state="disabled")
+        self.page_label = ttk.Label(page_frame, text="Page 1")
+        
+        self.prev_btn.pack(side="left", padx=5)
+        self.page_label.pack(side="left", padx=5)
+        self.next_btn.pack(side="left", padx=5)
+        
         # Button frame
         btn_frame = ttk.Frame(self.frame)
         btn_frame.pack(fill="x", padx=10, pady=10)
@@ -434,22 +455,38 @@ class PrescriptionManager:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load customers: {str(e)}")
 
+    def on_customer_changed(self, event):
+        """Replace the one combobox entry for the customer, keeping the selection"""
+        prefix = f"{event.customer_id} - "
+        values = [v for v in self.customer_combo['values'] if not v.startswith(prefix)]
+        customer = None if event.deleted else Customer.get_by_id(event.customer_id)
+        if customer:
+            values.append(f"{customer['customer_id']} - {customer['name']}")
+        selected = self.customer_combo.get()
+        self.customer_combo['values'] = values
+        if selected.startswith(prefix):
+            self.customer_combo.set(values[-1] if customer else "")
+
     def load_prescriptions(self, customer_id=None):
+        # A new listing starts again at the first page
+        self.page_customer_id = customer_id
+        self.page_starts = [None]
+        self.show_page()
+
+    def show_page(self):
         try:
             # Clear current entries
             for row in self.tree.get_children():
                 self.tree.delete(row)
             
-            query = """SELECT p.*, c.name as customer_name, 
-                      (SELECT COUNT(*) FROM prescription_items WHERE prescription_id = p.prescription_id) as item_count
-                      FROM prescriptions p JOIN customers c ON p.customer_id = c.customer_id"""
-            
-            params = []
-            if customer_id:
-                query += " WHERE p.customer_id = %s"
-                params.append(customer_id)
+            # One extra row tells whether there is a next page
+            prescriptions = Prescription.get_page(self.page_customer_id, self.page_starts[-1], PAGE_SIZE + 1)
+            has_next = len(prescriptions) > PAGE_SIZE
+            prescriptions = prescriptions[:PAGE_SIZE]
             
-            prescriptions = Database.execute_query(query, tuple(params) if params else None, fetch=True)
+            self.page_label.config(text=f"Page {len(self.page_starts)}")
+            self.prev_btn.config(state="normal" if len(self.page_starts) > 1 else "disabled")
+            self.next_btn.config(state="normal" if has_next else "disabled")
             
             if not prescriptions:
                 messagebox.showinfo("Info", "No prescriptions found for the selected criteria.")
@@ -465,9 +502,20 @@ class PrescriptionManager:
                     expiry_date,
                     pres['item_count']
                 ))
+            last = prescriptions[-1]
+            self.next_start = (last['issue_date'], last['prescription_id'])
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load prescriptions: {str(e)}")
 
+    def next_page(self):
+        self.page_starts.append(self.next_start)
+        self.show_page()
+
+    def prev_page(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+            self.show_page()
+
     def search_prescriptions(self):
         try:
             customer = self.customer_combo.get()
@@ -557,12 +605,7 @@ class PrescriptionManager:
                 raise Exception("Prescription not found")
             
             # Get existing items
-            items = Database.execute_query(
-                """SELECT medicine_id, quantity, dosage, instructions 
-                   FROM prescription_items 
-                   WHERE prescription_id = %s""",
-                (prescription_id,), fetch=True
-            )
+            items = Prescription.get_items(prescription_id)
             
             dialog = PrescriptionDialog(
                 self.frame,
@@ -694,12 +737,7 @@ class PrescriptionManager:
         
         prescription_id = self.current_prescription[0]
         try:
-            items = Database.execute_query(
-                """SELECT m.name, m.medicine_id, pi.quantity, pi.dosage, pi.instructions 
-                  FROM prescription_items pi JOIN medicines m 
-                  ON pi.medicine_id = m.medicine_id 
-                  WHERE pi.prescription_id = %s""",
-                (prescription_id,), fetch=True)
+            items = Prescription.get_items(prescription_id)
             
             if not items:
                 messagebox.showinfo("Info", "No items found for this prescription")
@@ -0,0 +1,111 @@
+import argparse
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple
+import numpy as np
+from database import Database, PurchaseOrder
+from analytics import SALE_LINES, sale_lines_period
+from restock import compute_restock, DEMAND_WINDOW_DAYS, MIN_COVER_DAYS, TARGET_COVER_DAYS
+
+# Everything needed to size an order, for every medicine that is at or below
+# its reorder level or short on forecast cover once open POs are counted.
+# Quantities already on order are added to on_hand so repeated runs do not
+# order the same shortfall twice. On-hand is medicines.quantity, the count
+# checkout decrements, and demand includes counter bills, as in restock.py.
+CANDIDATES_QUERY = """
+    SELECT t.*
+    FROM (
+        SELECT m.medicine_id, m.name, m.supplier_id, m.price,
+               m.quantity + COALESCE(p.on_order, 0) AS on_hand,
+               COALESCE(s.reorder_level, 0) AS reorder_level,
+               COALESCE(f.avg_daily_demand, COALESCE(d.units_sold, 0) / %s) AS avg_daily_demand
+        FROM medicines m
+        LEFT JOIN stock s ON s.medicine_id = m.medicine_id
+        LEFT JOIN demand_forecasts f ON f.medicine_id = m.medicine_id
+        LEFT JOIN (
+            SELECT l.medicine_id, SUM(l.quantity) AS units_sold
+            FROM """ + SALE_LINES + """ l
+            GROUP BY l.medicine_id
+        ) d ON d.medicine_id = m.medicine_id
+        LEFT JOIN (
+            SELECT i.medicine_id, SUM(i.quantity_ordered - i.quantity_received) AS on_order
+            FROM purchase_order_items i
+            JOIN purchase_orders po ON i.purchase_order_id = po.purchase_order_id
+            WHERE po.status = 'open'
+            GROUP BY i.medicine_id
+        ) p ON p.medicine_id = m.medicine_id
+    ) t
+    WHERE t.on_hand <= t.reorder_level OR t.on_hand < t.avg_daily_demand * %s
+    ORDER BY t.supplier_id, t.medicine_id
+"""
+
+
+def get_candidates(window_days: int = DEMAND_WINDOW_DAYS, min_cover_days: float = MIN_COVER_DAYS) -> List[Dict]:
+    since = datetime.now() - timedelta(days=window_days)
+    return Database.fetch_all(CANDIDATES_QUERY, (window_days,) + sale_lines_period(since) + (min_cover_days,))
+
+
+def plan_purchase_orders(candidates: List[Dict], min_cover_days: float = MIN_COVER_DAYS,
+                         target_cover_days: float = TARGET_COVER_DAYS) -> Tuple[Dict[int, List[tuple]], List[Dict]]:
+    """Group order lines by supplier.
+
+    Returns ({supplier_id: [(medicine_id, quantity, unit_price), ...]}, unassigned)
+    where unassigned lists candidates that have no supplier to order from.
+    """
+    if not candidates:
+        return {}, []
+    on_hand = np.array([c["on_hand"] for c in candidates], dtype=np.float64)
+    demand = np.array([c["avg_daily_demand"] for c in candidates], dtype=np.float64)
+    reorder_level = np.array([c["reorder_level"] for c in candidates], dtype=np.float64)
+    quantities = compute_restock(on_hand, demand, reorder_level, min_cover_days, target_cover_days)["recommended_reorder"]
+    # Sitting exactly on the reorder level with no measurable demand still
+    # warrants a top-up of one unit above it
+    quantities = np.maximum(quantities, np.where(on_hand <= reorder_level, reorder_level - on_hand + 1, 0))
+
+    orders, unassigned = {}, []
+    for candidate, quantity in zip(candidates, quantities.astype(np.int64).tolist()):
+        if quantity <= 0:
+            continue
+        if candidate["supplier_id"] is None:
+            unassigned.append(dict(candidate, quantity=quantity))
+            continue
+        orders.setdefault(candidate["supplier_id"], []).append(
+            (candidate["medicine_id"], quantity, candidate["price"])
+        )
+    return orders, unassigned
+
+
+def generate_purchase_orders(dry_run: bool = False) -> Tuple[List[int], Dict[int, List[tuple]], List[Dict]]:
+    """Raise POs for everything that needs restocking; returns (po_ids, plan, unassigned)"""
+    orders, unassigned = plan_purchase_orders(get_candidates())
+    po_ids = [] if dry_run else PurchaseOrder.create_batch(orders)
+    return po_ids, orders, unassigned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supplier purchase orders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="Raise POs for medicines below reorder level")
+    generate.add_argument("--dry-run", action="store_true", help="Show the plan without saving it")
+    send = commands.add_parser("send", help="Record that POs went out to their suppliers")
+    send.add_argument("purchase_order_ids", type=int, nargs="+")
+    receive = commands.add_parser("receive", help="Book in every outstanding line of a PO")
+    receive.add_argument("purchase_order_id", type=int)
+    commands.add_parser("open", help="List open POs")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        ids, plan, missing = generate_purchase_orders(args.dry_run)
+        for supplier, lines in plan.items():
+            print(f"Supplier {supplier}: {len(lines)} lines, {sum(q for _, q, _ in lines)} units")
+        for item in missing:
+            print(f"No supplier for {item['name']} (needs {item['quantity']})")
+        if ids:
+            print(f"Created purchase orders: {', '.join(map(str, ids))}")
+    elif args.command == "send":
+        print(f"Marked {PurchaseOrder.mark_sent(args.purchase_order_ids)} purchase orders as sent")
+    elif args.command == "receive":
+        print(f"Received {PurchaseOrder.receive(args.purchase_order_id)} units")
+    else:
+        for po in PurchaseOrder.get_open():
+            print(f"PO {po['purchase_order_id']} {po['supplier_name']}: {po['lines']} lines, "
+                  f"{po['total_amount']:.2f}, raised {po['created_at']:%Y-%m-%d}")
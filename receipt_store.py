@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, date, timedelta
+from typing import Dict, Iterator, Optional
+from receipts import RECEIPT_DIR, render_png, render_text
+
+STORE_DIR = os.path.join(RECEIPT_DIR, "store")
+RENDER_DIR = os.path.join(RECEIPT_DIR, "rendered")
+
+# One pair of files per day:
+#   YYYY-MM-DD.jsonl  receipts, one compact JSON object per line, append-only
+#   YYYY-MM-DD.idx    receipt_id, byte offset, length, customer_id, order_id, order_key
+# Receipt ids start with the day, so a lookup reads one small index file and
+# seeks straight to the record. order_key is the idempotency key a counter
+# bill was recorded under (sales.order_key); index lines written before it
+# existed have five fields.
+
+
+class ReceiptStore:
+    def __init__(self, root: str = STORE_DIR, render_dir: str = RENDER_DIR):
+        self.root = root
+        self.render_dir = render_dir
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        # ReceiptRenderer writes to rendered_path() from a worker thread
+        os.makedirs(render_dir, exist_ok=True)
+
+    def _shard(self, day: date) -> str:
+        return os.path.join(self.root, day.strftime("%Y-%m-%d"))
+
+    @staticmethod
+    def _day_of(receipt_id: str) -> date:
+        return datetime.strptime(receipt_id[:8], "%Y%m%d").date()
+
+    def append(self, receipt: Dict, order_id: int = None, customer_id: int = None,
+               order_key: str = None) -> str:
+        """Store a receipt built by receipts.build_receipt and return its id"""
+        issued_at = receipt["issued_at"]
+        receipt_id = f"{issued_at:%Y%m%d}-{uuid.uuid4().hex[:12]}"
+        record = dict(receipt, receipt_id=receipt_id, order_id=order_id, customer_id=customer_id,
+                      order_key=order_key, issued_at=issued_at.isoformat())
+        data = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        shard = self._shard(issued_at.date())
+        with self._lock:
+            with open(shard + ".jsonl", "ab") as records:
+                offset = records.seek(0, os.SEEK_END)
+                records.write(data)
+                records.flush()
+                os.fsync(records.fileno())
+            with open(shard + ".idx", "a", encoding="utf-8") as index:
+                index.write(f"{receipt_id}\t{offset}\t{len(data)}\t{customer_id or ''}\t{order_id or ''}"
+                            f"\t{order_key or ''}\n")
+        return receipt_id
+
+    def _index(self, day: date) -> Iterator[Dict]:
+        try:
+            with open(self._shard(day) + ".idx", encoding="utf-8") as index:
+                for line in index:
+                    fields = line.rstrip("\n").split("\t")
+                    receipt_id, offset, length, customer_id, order_id = fields[:5]
+                    order_key = fields[5] if len(fields) > 5 else ""
+                    yield {
+                        "receipt_id": receipt_id,
+                        "offset": int(offset),
+                        "length": int(length),
+                        "customer_id": int(customer_id) if customer_id else None,
+                        "order_id": int(order_id) if order_id else None,
+                        "order_key": order_key or None,
+                    }
+        except FileNotFoundError:
+            return
+
+    def _read(self, day: date, entry: Dict) -> Dict:
+        with open(self._shard(day) + ".jsonl", "rb") as records:
+            records.seek(entry["offset"])
+            record = json.loads(records.read(entry["length"]))
+        record["issued_at"] = datetime.fromisoformat(record["issued_at"])
+        record["lines"] = [tuple(line) for line in record["lines"]]
+        return record
+
+    def get(self, receipt_id: str) -> Optional[Dict]:
+        day = self._day_of(receipt_id)
+        for entry in self._index(day):
+            if entry["receipt_id"] == receipt_id:
+                return self._read(day, entry)
+        return None
+
+    def find(self, start: date, end: date = None, customer_id: int = None,
+             order_id: int = None, order_key: str = None) -> Iterator[Dict]:
+        """Receipts issued from start to end inclusive, optionally for one customer, order or bill"""
+        day, end = start, end or start
+        while day <= end:
+            for entry in self._index(day):
+                if customer_id is not None and entry["customer_id"] != customer_id:
+                    continue
+                if order_id is not None and entry["order_id"] != order_id:
+                    continue
+                if order_key is not None and entry["order_key"] != order_key:
+                    continue
+                yield self._read(day, entry)
+            day += timedelta(days=1)
+
+    def rendered_path(self, receipt_id: str, fmt: str = "png") -> str:
+        return os.path.join(self.render_dir, f"{receipt_id}.{fmt}")
+
+    def render(self, receipt_id: str, fmt: str = "png") -> str:
+        """Render a stored receipt as png, pdf or txt, reusing an earlier rendering"""
+        if fmt not in ("png", "pdf", "txt"):
+            raise ValueError("Receipt format must be 'png', 'pdf' or 'txt'")
+        path = self.rendered_path(receipt_id, fmt)
+        if os.path.exists(path):
+            return path
+        receipt = self.get(receipt_id)
+        if receipt is None:
+            raise ValueError(f"No receipt with ID {receipt_id}")
+        if fmt == "txt":
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(render_text(receipt))
+            return path
+        return render_png(receipt, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up and render stored receipts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("render", help="Render one receipt")
+    show.add_argument("receipt_id")
+    show.add_argument("--format", default="txt", choices=["png", "pdf", "txt"])
+    search = commands.add_parser("list", help="List receipts for a day range")
+    search.add_argument("start", type=date.fromisoformat)
+    search.add_argument("end", type=date.fromisoformat, nargs="?")
+    search.add_argument("--customer", type=int)
+    search.add_argument("--order-key", help="Only the receipt of the bill recorded under this key")
+    args = parser.parse_args()
+
+    store = ReceiptStore()
+    if args.command == "render":
+        print(store.render(args.receipt_id, args.format))
+    else:
+        for found in store.find(args.start, args.end, args.customer, order_key=args.order_key):
+            print(f"{found['receipt_id']}  {found['issued_at']:%Y-%m-%d %H:%M}  {found['total']:.2f}")
@@ -0,0 +1,187 @@
+import os
+import queue
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Dict, Optional, Callable
+from PIL import Image, ImageDraw, ImageFont
+
+RECEIPT_DIR = os.path.join(os.getcwd(), "receipts")
+TAX_RATE = 0.10
+WORKERS = 2
+
+PHARMACY_NAME = "Al-Khwarizmi Pharmacy"
+PHARMACY_ADDRESS = "Address: Baghdad University"
+PHARMACY_PHONE = "Phone: +123 456 7890"
+
+
+@lru_cache(maxsize=1)
+def get_fonts():
+    """Regular, bold and large fonts, loaded from disk once per process"""
+    try:
+        return (ImageFont.truetype("arial.ttf", 18),
+                ImageFont.truetype("arialbd.ttf", 20),
+                ImageFont.truetype("arialbd.ttf", 24))
+    except IOError:
+        default = ImageFont.load_default()
+        return default, default, default
+
+
+def build_receipt(bill_data: List[tuple], total_price: float, customer: Optional[Dict] = None,
+                  issued_at: datetime = None) -> Dict:
+    """Everything a receipt shows, from (name, quantity, price, total) lines already on the bill"""
+    tax = total_price * TAX_RATE
+    return {
+        "issued_at": issued_at or datetime.now(),
+        "customer": customer,
+        "lines": [(name, int(quantity), float(price), float(total)) for name, quantity, price, total in bill_data],
+        "subtotal": float(total_price),
+        "tax": tax,
+        "total": float(total_price) + tax,
+    }
+
+
+def render_png(receipt: Dict, path: str) -> str:
+    img = Image.new('RGB', (600, 800), color=(255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    font, font_bold, _ = get_fonts()
+
+    # Pharmacy name and address
+    draw.text((50, 20), PHARMACY_NAME, fill=(0, 0, 0), font=font_bold)
+    draw.text((50, 50), PHARMACY_ADDRESS, fill=(0, 0, 0), font=font)
+    draw.text((50, 80), PHARMACY_PHONE, fill=(0, 0, 0), font=font)
+    draw.text((50, 110), f"Date: {receipt['issued_at'].strftime('%m/%d/%Y %H:%M:%S')}", fill=(0, 0, 0), font=font)
+
+    y_offset = 140
+    customer = receipt.get("customer")
+    if customer:
+        draw.text((50, y_offset), f"Customer: {customer['name']}", fill=(0, 0, 0), font=font)
+        draw.text((50, y_offset + 30), f"Phone: {customer['phone']}" if customer.get('phone') else "",
+                  fill=(0, 0, 0), font=font)
+        y_offset += 60
+
+    draw.line((50, y_offset, 550, y_offset), fill=(0, 0, 0), width=2)
+    y_offset += 20
+
+    draw.text((50, y_offset), "Item", fill=(0, 0, 0), font=font_bold)
+    draw.text((350, y_offset), "Qty", fill=(0, 0, 0), font=font_bold)
+    draw.text((400, y_offset), "Price", fill=(0, 0, 0), font=font_bold)
+    draw.text((500, y_offset), "Total", fill=(0, 0, 0), font=font_bold)
+    y_offset += 30
+
+    for medicine, quantity, price, total in receipt["lines"]:
+        name_lines = [medicine[i:i+30] for i in range(0, len(medicine), 30)]
+        for i, line in enumerate(name_lines):
+            draw.text((50, y_offset + (i*25)), line, fill=(0, 0, 0), font=font)
+
+        draw.text((350, y_offset), str(quantity), fill=(0, 0, 0), font=font)
+        draw.text((400, y_offset), f"${price:.2f}", fill=(0, 0, 0), font=font)
+        draw.text((500, y_offset), f"${total:.2f}", fill=(0, 0, 0), font=font)
+
+        y_offset += 25 * max(1, len(name_lines)) + 10
+
+    draw.line((50, y_offset, 550, y_offset), fill=(0, 0, 0), width=2)
+    y_offset += 20
+
+    draw.text((400, y_offset), "Subtotal:", fill=(0, 0, 0), font=font)
+    draw.text((500, y_offset), f"${receipt['subtotal']:.2f}", fill=(0, 0, 0), font=font)
+    y_offset += 30
+
+    draw.text((400, y_offset), f"Tax ({TAX_RATE:.0%}):", fill=(0, 0, 0), font=font)
+    draw.text((500, y_offset), f"${receipt['tax']:.2f}", fill=(0, 0, 0), font=font)
+    y_offset += 30
+
+    draw.text((400, y_offset), "TOTAL:", fill=(0, 0, 0), font=font_bold)
+    draw.text((500, y_offset), f"${receipt['total']:.2f}", fill=(0, 0, 0), font=font_bold)
+    y_offset += 40
+
+    draw.text((125, y_offset), "THANK YOU FOR YOUR PURCHASE", fill=(0, 0, 0), font=font_bold)
+    y_offset += 30
+    draw.text((200, y_offset), "Please come again!", fill=(0, 0, 0), font=font)
+
+    # Stars divider
+    draw.text((125, y_offset + 40), "*" * 50, fill=(0, 0, 0), font=font)
+
+    img.save(path)
+    return path
+
+
+def render_text(receipt: Dict, width: int = 42) -> str:
+    """Plain monospaced receipt, width characters per line"""
+    rule = "-" * width
+    out = [PHARMACY_NAME.center(width), PHARMACY_ADDRESS.center(width), PHARMACY_PHONE.center(width),
+           f"Date: {receipt['issued_at'].strftime('%m/%d/%Y %H:%M:%S')}"]
+    customer = receipt.get("customer")
+    if customer:
+        out.append(f"Customer: {customer['name']}")
+        if customer.get("phone"):
+            out.append(f"Phone: {customer['phone']}")
+    out.append(rule)
+    for medicine, quantity, price, total in receipt["lines"]:
+        out.append(medicine[:width])
+        amounts = f"{quantity} x ${price:.2f}"
+        out.append(f"  {amounts}{f'${total:.2f}':>{width - len(amounts) - 2}}")
+    out.append(rule)
+    for label, amount in (("Subtotal:", receipt["subtotal"]), (f"Tax ({TAX_RATE:.0%}):", receipt["tax"]),
+                          ("TOTAL:", receipt["total"])):
+        out.append(f"{label}{f'${amount:.2f}':>{width - len(label)}}")
+    out.append("")
+    out.append("THANK YOU FOR YOUR PURCHASE".center(width))
+    out.append("Please come again!".center(width))
+    return "\n".join(out) + "\n"
+
+
+def receipt_path(receipt: Dict, receipt_dir: str = RECEIPT_DIR) -> str:
+    os.makedirs(receipt_dir, exist_ok=True)
+    return os.path.join(receipt_dir, f"receipt_{receipt['issued_at'].strftime('%Y%m%d_%H%M%S_%f')}.png")
+
+
+class ReceiptRenderer:
+    """Background threads that render queued receipts off the checkout path.
+
+    Finished (path, error) pairs are put on the results queue; the Tk side
+    polls it from the main loop, since widgets must not be touched from
+    worker threads.
+    """
+
+    def __init__(self, workers: int = WORKERS, receipt_dir: str = RECEIPT_DIR,
+                 render: Callable[[Dict, str], str] = render_png):
+        self.receipt_dir = receipt_dir
+        self.render = render
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, receipt: Dict, path: str = None):
+        self.jobs.put((receipt, path or receipt_path(receipt, self.receipt_dir)))
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            try:
+                self.results.put((self.render(*job), None))
+            except Exception as e:
+                self.results.put((None, e))
+            finally:
+                self.jobs.task_done()
+
+    def drain(self) -> List[tuple]:
+        """Collect the results finished so far without blocking"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def shutdown(self, wait: bool = True):
+        for _ in self.threads:
+            self.jobs.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
@@ -0,0 +1,124 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import List, Dict
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+REPORT_DIR = os.path.join(os.getcwd(), "reports")
+HASH_FILE = ".chart_hashes.json"
+FIGURE_SIZE = (10, 6)
+
+# A chart spec is a plain dict so it pickles cheaply into the worker pool:
+#     {"name": "top_medicines", "kind": "bar" | "line", "title": ...,
+#      "xlabel": ..., "ylabel": ..., "labels": [...], "values": [...],
+#      "rotate": 45}
+# Its hash covers the data and the labels, so a chart whose aggregates have
+# not changed since the last run is not drawn again.
+
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def chart_hash(spec: Dict) -> str:
+    payload = json.dumps(spec, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_chart(spec: Dict, path: str) -> str:
+    """Draw one chart on its own Figure; no pyplot state is touched"""
+    fig = Figure(figsize=FIGURE_SIZE)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    labels = [str(label) for label in spec["labels"]]
+    values = [float(value) for value in spec["values"]]
+    if spec.get("kind", "bar") == "line":
+        ax.plot(labels, values, marker="o")
+    else:
+        ax.bar(labels, values)
+    ax.set_title(spec.get("title", ""))
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.grid(axis="y", alpha=0.3)
+    if spec.get("rotate"):
+        ax.tick_params(axis="x", labelrotation=spec["rotate"])
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def _load_hashes(directory: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(directory, HASH_FILE)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_hashes(directory: str, hashes: Dict[str, str]):
+    with open(os.path.join(directory, HASH_FILE), "w") as handle:
+        json.dump(hashes, handle, indent=2, sort_keys=True)
+
+
+def render_packs(packs: Dict[str, List[Dict]], out_dir: str = REPORT_DIR,
+                 workers: int = None, force: bool = False) -> Dict[str, str]:
+    """Render several report packs, each into its own subdirectory, in one process pool.
+
+    Charts whose spec hash matches the previous run and whose PNG still
+    exists are skipped. Returns "rendered" or "skipped" per chart path.
+    """
+    results = {}
+    pending = []
+    manifests = {}
+    for pack, specs in packs.items():
+        directory = os.path.join(out_dir, pack) if pack else out_dir
+        os.makedirs(directory, exist_ok=True)
+        manifests[directory] = _load_hashes(directory)
+        for spec in specs:
+            path = os.path.join(directory, f"{spec['name']}.png")
+            digest = chart_hash(spec)
+            if not force and manifests[directory].get(spec["name"]) == digest and os.path.exists(path):
+                results[path] = "skipped"
+            else:
+                pending.append((directory, spec, path, digest))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(directory, spec["name"], digest, pool.submit(render_chart, spec, path))
+                       for directory, spec, path, digest in pending]
+            for directory, name, digest, future in futures:
+                path = future.result()
+                manifests[directory][name] = digest
+                results[path] = "rendered"
+
+    for directory, hashes in manifests.items():
+        _save_hashes(directory, hashes)
+    return results
+
+
+def render_pack(specs: List[Dict], out_dir: str = REPORT_DIR,
+                workers: int = None, force: bool = False) -> Dict[str, str]:
+    """Render a single report pack straight into out_dir"""
+    return render_packs({"": specs}, out_dir, workers, force)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render chart specs from a JSON file")
+    parser.add_argument("specs", help="JSON file mapping pack name to a list of chart specs")
+    parser.add_argument("--out", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Redraw charts even if unchanged")
+    args = parser.parse_args()
+
+    with open(args.specs) as handle:
+        rendered = render_packs(json.load(handle), args.out, args.workers, args.force)
+    for chart_path, status in sorted(rendered.items()):
+        print(f"{status:<9} {chart_path}")
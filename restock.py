@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from typing import List, Dict
+import numpy as np
+from database import Database
+from analytics import SALE_LINES, sale_lines_period
+
+# Reorder when stock covers fewer than MIN_COVER_DAYS of demand, and order
+# enough to bring it back up to TARGET_COVER_DAYS.
+DEMAND_WINDOW_DAYS = 30
+MIN_COVER_DAYS = 10
+TARGET_COVER_DAYS = 30
+
+
+def load_demand(window_days: int = DEMAND_WINDOW_DAYS, use_forecast: bool = True) -> Dict[str, np.ndarray]:
+    """Fetch on-hand stock, reorder level and daily demand for every medicine.
+
+    Demand covers order lines and counter bills and is summed in MySQL so only one row per medicine comes back. When
+    use_forecast is set, the stored forecast from forecast.py is preferred
+    over the trailing window average.
+    """
+    since = datetime.now() - timedelta(days=window_days)
+    forecast_column = "f.avg_daily_demand" if use_forecast else "NULL"
+    forecast_join = "LEFT JOIN demand_forecasts f ON f.medicine_id = m.medicine_id" if use_forecast else ""
+    query = f"""
+        SELECT m.medicine_id, m.name, m.quantity AS on_hand,
+               COALESCE(s.reorder_level, 0) AS reorder_level,
+               COALESCE({forecast_column}, COALESCE(d.units_sold, 0) / %s) AS avg_daily_sales
+        FROM medicines m
+        LEFT JOIN stock s ON s.medicine_id = m.medicine_id
+        {forecast_join}
+        LEFT JOIN (
+            SELECT l.medicine_id, SUM(l.quantity) AS units_sold
+            FROM {SALE_LINES} l
+            GROUP BY l.medicine_id
+        ) d ON d.medicine_id = m.medicine_id
+        ORDER BY m.medicine_id
+    """
+    rows = Database.fetch_all(query, (window_days,) + sale_lines_period(since))
+    count = len(rows)
+    return {
+        "medicine_id": np.fromiter((r["medicine_id"] for r in rows), dtype=np.int64, count=count),
+        "name": np.array([r["name"] for r in rows], dtype=object),
+        "on_hand": np.fromiter((r["on_hand"] for r in rows), dtype=np.int64, count=count),
+        "reorder_level": np.fromiter((r["reorder_level"] for r in rows), dtype=np.int64, count=count),
+        "avg_daily_sales": np.fromiter((r["avg_daily_sales"] for r in rows), dtype=np.float64, count=count),
+    }
+
+
+def compute_restock(on_hand: np.ndarray, avg_daily_sales: np.ndarray, reorder_level: np.ndarray,
+                    min_cover_days: float = MIN_COVER_DAYS,
+                    target_cover_days: float = TARGET_COVER_DAYS) -> Dict[str, np.ndarray]:
+    """Days of cover and recommended order quantity for every SKU at once.
+
+    A SKU is reordered when it covers fewer than min_cover_days of demand or
+    has fallen to its reorder level. The quantity tops it up to
+    target_cover_days of demand, and never leaves it below the reorder level.
+    """
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    avg_daily_sales = np.asarray(avg_daily_sales, dtype=np.float64)
+    reorder_level = np.asarray(reorder_level, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(avg_daily_sales > 0, on_hand / avg_daily_sales, np.inf)
+
+    needs_reorder = (days_left < min_cover_days) | (on_hand <= reorder_level)
+    shortfall = np.maximum(np.ceil(target_cover_days * avg_daily_sales) - on_hand,
+                           reorder_level - on_hand)
+    recommended = np.where(needs_reorder, np.maximum(shortfall, 0), 0).astype(np.int64)
+    return {"days_left": days_left, "recommended_reorder": recommended}
+
+
+def get_restock_recommendations(window_days: int = DEMAND_WINDOW_DAYS,
+                                min_cover_days: float = MIN_COVER_DAYS,
+                                target_cover_days: float = TARGET_COVER_DAYS,
+                                use_forecast: bool = True) -> List[Dict]:
+    """Medicines that need reordering, most urgent first"""
+    demand = load_demand(window_days, use_forecast)
+    result = compute_restock(demand["on_hand"], demand["avg_daily_sales"], demand["reorder_level"],
+                             min_cover_days, target_cover_days)
+
+    selected = np.flatnonzero(result["recommended_reorder"] > 0)
+    selected = selected[np.argsort(result["days_left"][selected], kind="stable")]
+    return [
+        {
+            "medicine_id": int(demand["medicine_id"][i]),
+            "name": demand["name"][i],
+            "quantity": int(demand["on_hand"][i]),
+            "reorder_level": int(demand["reorder_level"][i]),
+            "avg_daily_sales": float(demand["avg_daily_sales"][i]),
+            "days_left": float(result["days_left"][i]),
+            "recommended_reorder": int(result["recommended_reorder"][i]),
+        }
+        for i in selected
+    ]
+
+
+if __name__ == "__main__":
+    print("--- Restock Recommendations ---")
+    for item in get_restock_recommendations():
+        print(f"{item['name']}: {item['quantity']} on hand, "
+              f"{item['avg_daily_sales']:.2f}/day, {item['days_left']:.1f} days left, "
+              f"reorder {item['recommended_reorder']}")
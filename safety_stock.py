@@ -0,0 +1,113 @@
+import argparse
+from typing import Dict, List, Tuple
+import numpy as np
+from database import Database, Supplier, Stock
+from forecast import load_daily_demand
+
+DEMAND_HISTORY_DAYS = 90
+LEAD_TIME_HISTORY = 20
+SERVICE_Z = 1.65
+
+# Used for medicines without a supplier, or whose supplier has fewer than
+# MIN_SAMPLES completed deliveries
+DEFAULT_LEAD_TIME_DAYS = 7.0
+MIN_SAMPLES = 3
+
+# Lead time is measured from when the PO went out (or was raised, if it was
+# never marked sent) to the first delivery, over each supplier's most recent
+# LEAD_TIME_HISTORY received orders.
+LEAD_TIME_QUERY = """
+    SELECT supplier_id,
+           AVG(lead_days) AS mean_days,
+           STDDEV_SAMP(lead_days) AS std_days,
+           COUNT(*) AS samples
+    FROM (
+        SELECT supplier_id,
+               TIMESTAMPDIFF(MINUTE, COALESCE(sent_at, created_at), received_at) / 1440 AS lead_days,
+               ROW_NUMBER() OVER (PARTITION BY supplier_id ORDER BY received_at DESC) AS recency
+        FROM purchase_orders
+        WHERE received_at IS NOT NULL
+    ) t
+    WHERE recency <= %s
+    GROUP BY supplier_id
+"""
+
+
+def supplier_lead_times(history: int = LEAD_TIME_HISTORY) -> List[Dict]:
+    return Database.fetch_all(LEAD_TIME_QUERY, (history,))
+
+
+def safety_stock(demand_mean: np.ndarray, demand_std: np.ndarray, lead_mean: np.ndarray,
+                 lead_std: np.ndarray, z: float = SERVICE_Z) -> Dict[str, np.ndarray]:
+    """Safety stock and reorder point per SKU with both demand and lead time uncertain.
+
+    safety = z * sqrt(L * sd_d^2 + d^2 * sd_L^2); reorder point = d * L + safety,
+    with daily demand d and lead time L in days.
+    """
+    safety = z * np.sqrt(lead_mean * demand_std ** 2 + demand_mean ** 2 * lead_std ** 2)
+    reorder_point = np.ceil(demand_mean * lead_mean + safety)
+    return {"safety_stock": np.ceil(safety).astype(np.int64), "reorder_level": reorder_point.astype(np.int64)}
+
+
+def compute(history_days: int = DEMAND_HISTORY_DAYS, z: float = SERVICE_Z) -> Tuple[Dict[str, np.ndarray], List[Dict]]:
+    """Reorder levels for every medicine plus the per-supplier lead-time stats they used"""
+    medicine_ids, daily, _ = load_daily_demand(history_days)
+    lead_times = supplier_lead_times()
+
+    # Looked up by id, not position: medicines added or removed since
+    # load_daily_demand read its list must not shift the rows
+    supplier_by_medicine = {
+        row["medicine_id"]: row["supplier_id"] or 0
+        for row in Database.fetch_all("SELECT medicine_id, supplier_id FROM medicines")
+    }
+    supplier_of = np.fromiter((supplier_by_medicine.get(int(mid), 0) for mid in medicine_ids),
+                              dtype=np.int64, count=len(medicine_ids))
+
+    lead_mean = np.full(len(medicine_ids), DEFAULT_LEAD_TIME_DAYS)
+    lead_std = np.zeros(len(medicine_ids))
+    for stats in lead_times:
+        if stats["samples"] < MIN_SAMPLES:
+            continue
+        rows = supplier_of == stats["supplier_id"]
+        lead_mean[rows] = float(stats["mean_days"])
+        lead_std[rows] = float(stats["std_days"] or 0)
+
+    result = safety_stock(daily.mean(axis=1), daily.std(axis=1), lead_mean, lead_std, z)
+    result.update(medicine_id=medicine_ids, lead_time_days=lead_mean, has_demand=daily.sum(axis=1) > 0)
+    return result, lead_times
+
+
+def run(history_days: int = DEMAND_HISTORY_DAYS, z: float = SERVICE_Z, apply: bool = True) -> Dict[str, int]:
+    """Store supplier lead-time stats and the reorder level of every medicine that sold.
+
+    Medicines without demand in the window would get a level of 0, which
+    switches off their low-stock alert, so their current level is kept.
+    With apply False nothing is written; the counts are what would change.
+    """
+    result, lead_times = compute(history_days, z)
+    demand = result["has_demand"]
+    if not apply:
+        return {"suppliers": len(lead_times), "stock": int(demand.sum())}
+    suppliers_updated = Supplier.update_lead_times([
+        (row["supplier_id"], row["mean_days"], row["std_days"], row["samples"]) for row in lead_times
+    ])
+    stock_updated = Stock.set_reorder_levels(
+        list(zip(result["medicine_id"][demand].tolist(), result["reorder_level"][demand].tolist()))
+    )
+    return {"suppliers": suppliers_updated, "stock": stock_updated}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supplier lead times and safety-stock reorder levels")
+    parser.add_argument("--days", type=int, default=DEMAND_HISTORY_DAYS, help="Days of demand history")
+    parser.add_argument("--z", type=float, default=SERVICE_Z, help="Service-level z-score")
+    parser.add_argument("--dry-run", action="store_true", help="Compute without writing anything")
+    args = parser.parse_args()
+
+    counts = run(args.days, args.z, apply=not args.dry_run)
+    if args.dry_run:
+        print(f"Dry run: would update lead times for {counts['suppliers']} suppliers and "
+              f"reorder levels for {counts['stock']} medicines")
+    else:
+        print(f"Lead times updated for {counts['suppliers']} suppliers; "
+              f"reorder level set on {counts['stock']} stock rows")
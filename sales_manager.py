@@ -1,17 +1,41 @@
 import tkinter as tk
+import uuid
 from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-import os
 from database import Database
+from backend import Sale, Medicine, Customer, CLIENT_MODE
+from events import bus, MedicineChanged, StockMoved
+from receipts import ReceiptRenderer, build_receipt
+from receipt_store import ReceiptStore
+from thermal_printer import get_terminal_printer
+from sku_cache import SkuCache
+from pos_journal import OfflineJournal, ReplayWorker
 
 class SalesManager:
-    def __init__(self, parent_frame, connection, medicine_manager):
+    SKU_REFRESH_MS = 30000
+
+    def __init__(self, parent_frame, medicine_manager, change_feed=None):
         self.frame = ttk.Frame(parent_frame)
-        self.connection = connection
         self.medicine_manager = medicine_manager
         self.bill_items = []
+        self.customers = {}
+        self.receipt_store = ReceiptStore()
+        self.receipt_renderer = ReceiptRenderer()
+        self.printer = get_terminal_printer()
+        self.last_receipt_id = None
+        # Idempotency key of the bill on screen; kept across failed attempts
+        # so clicking Generate Bill again cannot record the sale twice
+        self.order_key = None
+        self.sku_cache = SkuCache()
+        self.journal = OfflineJournal()
+        self.replay_worker = ReplayWorker(self.journal)
+        self.load_sku_cache()
         self.setup_ui()
+        self.poll_receipts()
+        bus.subscribe(StockMoved, self.on_stock_moved)
+        bus.subscribe(MedicineChanged, self.on_medicine_event)
+        if change_feed:
+            change_feed.subscribe("medicines", self.on_medicine_changed, on_reset=self.reload_sku_cache)
+        self.frame.after(self.SKU_REFRESH_MS, self.refresh_sku_cache)
 
     def setup_ui(self):
         customer_frame = ttk.LabelFrame(self.frame, text="Customer Information", padding=10)
@@ -38,6 +62,11 @@ class SalesManager:
 
         ttk.Button(add_to_bill_frame, text="Add to Bill", command=self.add_to_bill).grid(row=2, column=1, pady=10)
 
+        ttk.Label(add_to_bill_frame, text="Scan Barcode").grid(row=3, column=0, padx=10, pady=5, sticky="e")
+        self.scan_entry = ttk.Entry(add_to_bill_frame, width=40)
+        self.scan_entry.grid(row=3, column=1, padx=10, pady=5)
+        self.scan_entry.bind("<Return>", self.scan_item)
+
         self.bill_tree = ttk.Treeview(self.frame, columns=("Medicine", "Quantity", "Price", "Total"), show="headings")
         self.bill_tree.heading("Medicine", text="Medicine")
         self.bill_tree.heading("Quantity", text="Quantity")
@@ -56,28 +85,89 @@ class SalesManager:
         ttk.Button(button_frame, text="Clear Bill", command=self.clear_bill).pack(side="left", padx=5)
 
         ttk.Button(self.frame, text="Generate Bill", command=self.generate_bill).pack(pady=10)
+        ttk.Button(self.frame, text="Print Receipt", command=self.print_receipt).pack(pady=5)
+
+        self.receipt_status = ttk.Label(self.frame, text="")
+        self.receipt_status.pack(pady=5)
+        self.sync_status = ttk.Label(self.frame, text="")
+        self.sync_status.pack(pady=5)
 
     def load_customer_names(self):
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("SELECT customer_id, name FROM customers ORDER BY name")
-            customers = [f"{row[0]} - {row[1]}" for row in cursor.fetchall()]
+            rows = sorted(Customer.get_all(), key=lambda row: row['name'] or "")
+            # Kept for receipts, so checkout never has to look the customer up again
+            self.customers = {row['customer_id']: {"name": row['name'], "phone": row['phone']} for row in rows}
+            customers = [f"{row['customer_id']} - {row['name']}" for row in rows]
             self.customer_dropdown['values'] = customers
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load customers: {e}")
-        finally:
-            cursor.close()
 
     def load_medicine_names(self):
-        cursor = self.connection.cursor()
+        medicines = [f"{entry['medicine_id']} - {entry['name']}" for entry in self.sku_cache.in_stock()]
+        self.medicine_dropdown['values'] = medicines
+
+    def load_sku_cache(self):
         try:
-            cursor.execute("SELECT medicine_id, name FROM medicines WHERE quantity > 0 ORDER BY name")
-            medicines = [f"{row[0]} - {row[1]}" for row in cursor.fetchall()]
-            self.medicine_dropdown['values'] = medicines
+            self.sku_cache.load()
+            self.sku_cache.save_snapshot()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load medicines: {e}")
-        finally:
-            cursor.close()
+            # Offline: sell against the last snapshot and journal the bills
+            if not Database.is_unreachable(e) or not self.sku_cache.load_snapshot():
+                raise
+
+    def on_medicine_changed(self, medicine_id, row):
+        self.sku_cache.apply_change(medicine_id, row)
+        self.load_medicine_names()
+
+    def reload_sku_cache(self):
+        try:
+            self.load_sku_cache()
+            self.load_medicine_names()
+        except Exception:
+            # Keep selling from the cached copy; the periodic refresh retries
+            pass
+
+    def on_medicine_event(self, event):
+        self.on_medicine_changed(event.medicine_id, None if event.deleted else Medicine.get_by_id(event.medicine_id))
+
+    def on_stock_moved(self, event):
+        # delta None is a stock-table recount, which the cache does not track
+        if event.delta is not None:
+            self.sku_cache.adjust(event.medicine_id, event.delta)
+            self.load_medicine_names()
+
+    def refresh_sku_cache(self):
+        try:
+            if self.sku_cache.refresh():
+                self.load_medicine_names()
+                self.sku_cache.save_snapshot()
+        except Exception:
+            # Keep selling from the cached copy; checkout still checks stock
+            pass
+        self.frame.after(self.SKU_REFRESH_MS, self.refresh_sku_cache)
+
+    def find_bill_line(self, medicine_id):
+        for item in self.bill_tree.get_children():
+            if int(self.bill_tree.item(item, "tags")[0]) == medicine_id:
+                return item
+        return None
+
+    def add_item(self, entry, quantity):
+        """Add quantity of a cached medicine to the bill, merging with an existing line"""
+        line = self.find_bill_line(entry['medicine_id'])
+        on_bill = int(self.bill_tree.item(line, "values")[1]) if line else 0
+        if on_bill + quantity > entry['available']:
+            messagebox.showerror("Error", f"Only {entry['available']} units available in stock")
+            return False
+
+        quantity += on_bill
+        values = (entry['name'], quantity, entry['price'], entry['price'] * quantity)
+        if line:
+            self.bill_tree.item(line, values=values)
+        else:
+            self.bill_tree.insert("", "end", values=values, tags=(entry['medicine_id'],))
+        self.update_total()
+        return True
 
     def add_to_bill(self):
         medicine_selection = self.medicine_var.get()
@@ -99,29 +189,26 @@ class SalesManager:
             messagebox.showerror("Error", "Please enter a valid positive quantity")
             return
 
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute("SELECT name, price, quantity FROM medicines WHERE medicine_id = %s", (medicine_id,))
-            medicine = cursor.fetchone()
-
-            if medicine:
-                medicine_name, price, available_quantity = medicine
-                if quantity > available_quantity:
-                    messagebox.showerror("Error", f"Only {available_quantity} units available in stock")
-                    return
-                    
-                total = price * quantity
-                self.bill_tree.insert("", "end", 
-                                    values=(medicine_name, quantity, price, total), 
-                                    tags=(medicine_id,))
-                self.update_total()
-                self.quantity_entry.delete(0, tk.END)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add to bill: {e}")
-        finally:
-            cursor.close()
+        entry = self.sku_cache.get(medicine_id)
+        if not entry:
+            messagebox.showerror("Error", "Medicine not found")
+            return
+        if self.add_item(entry, quantity):
+            self.quantity_entry.delete(0, tk.END)
+
+    def scan_item(self, event=None):
+        code = self.scan_entry.get()
+        self.scan_entry.delete(0, tk.END)
+        if not code.strip():
+            return
+        entry = self.sku_cache.lookup(code)
+        if not entry:
+            messagebox.showerror("Error", f"Unknown barcode: {code}")
+            return
+        self.add_item(entry, 1)
 
     def update_total(self):
+        self.order_key = None
         total = sum(float(self.bill_tree.item(item, "values")[3]) 
                 for item in self.bill_tree.get_children())
         self.total_label.config(text=f"Total: ${total:.2f}")
@@ -150,23 +237,15 @@ class SalesManager:
         )
         
         if new_quantity:
-            cursor = self.connection.cursor()
-            try:
-                cursor.execute("SELECT quantity FROM medicines WHERE medicine_id = %s", (medicine_id,))
-                available_quantity = cursor.fetchone()[0]
-                
-                if new_quantity > available_quantity:
-                    messagebox.showerror("Error", f"Only {available_quantity} units available in stock")
-                    return
-                    
-                total = float(price) * new_quantity
-                self.bill_tree.item(selected_item, 
-                                  values=(medicine_name, new_quantity, price, total))
-                self.update_total()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to change quantity: {e}")
-            finally:
-                cursor.close()
+            entry = self.sku_cache.get(medicine_id)
+            if entry and new_quantity > entry['available']:
+                messagebox.showerror("Error", f"Only {entry['available']} units available in stock")
+                return
+
+            total = float(price) * new_quantity
+            self.bill_tree.item(selected_item, 
+                              values=(medicine_name, new_quantity, price, total))
+            self.update_total()
 
     def clear_bill(self):
         if not self.bill_tree.get_children():
@@ -175,6 +254,7 @@ class SalesManager:
         if messagebox.askyesno("Confirm", "Are you sure you want to clear the bill?"):
             self.bill_tree.delete(*self.bill_tree.get_children())
             self.total_label.config(text="Total: $0.00")
+            self.order_key = None
 
     def generate_bill(self):
         if not self.bill_tree.get_children():
@@ -197,133 +277,100 @@ class SalesManager:
             bill_data.append((medicine_name, quantity, float(price), float(total), medicine_id))
 
         total_price = sum(item[3] for item in bill_data)
+        if self.order_key is None:
+            self.order_key = uuid.uuid4().hex
 
-        cursor = self.connection.cursor()
+        lines = [(medicine_id, int(quantity), price, total) for _, quantity, price, total, medicine_id in bill_data]
+        offline = False
         try:
-            self.connection.start_transaction()
-            
-            for medicine_name, quantity, price, total, medicine_id in bill_data:
-                cursor.execute(
-                    """INSERT INTO sales 
-                    (medicine_id, quantity, unit_price, total_price, sale_date, customer_id) 
-                    VALUES (%s, %s, %s, %s, NOW(), %s)""",
-                    (medicine_id, quantity, price, total, customer_id)
-                )
-                
-                if not self.medicine_manager.reduce_medicine_quantity(medicine_id, quantity):
-                    raise Exception("Failed to update medicine quantity")
-            
-            if customer_id:
-                points_to_add = int(total_price)
-                cursor.execute(
-                    "UPDATE customers SET loyalty_points = loyalty_points + %s WHERE customer_id = %s",
-                    (points_to_add, customer_id)
-                )
-            
-            self.connection.commit()
-            
-            self.generate_receipt_image(
-                [(item[0], item[1], item[2], item[3]) for item in bill_data], 
+            recorded = Database.run_with_retries(lambda: Sale.record_bill(self.order_key, lines, customer_id))
+        except Exception as e:
+            if not Database.is_unreachable(e):
+                messagebox.showerror("Error", f"Failed to generate bill: {str(e)}")
+                return
+            # Stock was checked against the cached snapshot while billing; the
+            # replay worker sends the bill once the database is back
+            try:
+                self.journal.append(self.order_key, lines, customer_id)
+            except OSError as journal_error:
+                messagebox.showerror("Error", f"Database offline and journal write failed: {journal_error}")
+                return
+            recorded, offline = True, True
+            self.sync_status.config(text=f"Offline: {len(self.journal.pending())} bill(s) waiting to sync")
+
+        # A bill that was already recorded got this far only because the
+        # first attempt's reply was lost, so its follow-up steps never ran.
+        # Its stock moved then and reaches the cache through the change feed
+        # or refresh_sku_cache, so adjusting it here would count it twice.
+        order_key, self.order_key = self.order_key, None
+        if recorded and (offline or CLIENT_MODE):
+            # Otherwise Sale.record_bill's StockMoved events update the cache;
+            # those are published in the service process in client mode
+            for medicine_id, quantity, _, _ in lines:
+                self.sku_cache.adjust(medicine_id, -quantity)
+        if offline:
+            self.sku_cache.save_snapshot()
+
+        # Only the structured record is written at checkout; images are
+        # rendered later, when a receipt is actually printed
+        try:
+            receipt = build_receipt(
+                [(item[0], item[1], item[2], item[3]) for item in bill_data],
                 total_price,
-                customer_id
+                self.customers.get(customer_id)
             )
-            
+            self.last_receipt_id = self.receipt_store.append(receipt, customer_id=customer_id,
+                                                              order_key=order_key)
+            self.receipt_status.config(text=f"Receipt {self.last_receipt_id} stored")
+            if self.printer:
+                # Text and ESC/POS output is cheap enough to print inline
+                self.printer.print_receipt(dict(receipt, receipt_id=self.last_receipt_id))
+        except OSError as e:
+            # The sale is already committed; a lost receipt must not undo it
+            self.receipt_status.config(text=f"Receipt not stored or printed: {e}")
+        
+        if recorded:
             messagebox.showinfo("Success", "Bill generated and saved!")
-            
-            self.clear_bill()
-            self.load_medicine_names()
-            self.medicine_manager.load_medicines()
+        else:
+            messagebox.showinfo("Success", "This bill was already saved; it was not recorded again.")
+        
+        self.clear_bill()
+        self.load_medicine_names()
 
-        except Exception as e:
-            self.connection.rollback()
-            messagebox.showerror("Error", f"Failed to generate bill: {str(e)}")
-        finally:
-            cursor.close()
-
-    def generate_receipt_image(self, bill_data, total_price, customer_id=None):
-        img = Image.new('RGB', (600, 800), color=(255, 255, 255))
-        draw = ImageDraw.Draw(img)
-    
+    def print_receipt(self):
+        receipt_id = simpledialog.askstring("Print Receipt", "Receipt ID:", initialvalue=self.last_receipt_id or "")
+        if not receipt_id:
+            return
         try:
-            font = ImageFont.truetype("arial.ttf", 18)
-            font_bold = ImageFont.truetype("arialbd.ttf", 20)
-            font_large = ImageFont.truetype("arialbd.ttf", 24)
-        except IOError:
-            font = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
-            font_large = ImageFont.load_default()
-    
-        # Pharmacy name and address
-        draw.text((50, 20), "Al-Khwarizmi Pharmacy", fill=(0, 0, 0), font=font_bold)
-        draw.text((50, 50), "Address: Baghdad University", fill=(0, 0, 0), font=font)
-        draw.text((50, 80), "Phone: +123 456 7890", fill=(0, 0, 0), font=font)
-    
-        current_datetime = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
-        draw.text((50, 110), f"Date: {current_datetime}", fill=(0, 0, 0), font=font)
-    
-        y_offset = 140
-        if customer_id:
-            cursor = self.connection.cursor()
+            receipt = self.receipt_store.get(receipt_id.strip())
+        except ValueError:
+            receipt = None
+        if receipt is None:
+            messagebox.showerror("Error", f"No receipt with ID {receipt_id}")
+            return
+        if self.printer:
             try:
-                cursor.execute("SELECT name, phone FROM customers WHERE customer_id = %s", (customer_id,))
-                customer = cursor.fetchone()
-                if customer:
-                    draw.text((50, y_offset), f"Customer: {customer[0]}", fill=(0, 0, 0), font=font)
-                    draw.text((50, y_offset+30), f"Phone: {customer[1]}" if customer[1] else "", 
-                             fill=(0, 0, 0), font=font)
-                    y_offset += 60
-            except Exception:
-                pass
-            finally:
-                cursor.close()
-    
-        draw.line((50, y_offset, 550, y_offset), fill=(0, 0, 0), width=2)
-        y_offset += 20
-    
-        draw.text((50, y_offset), "Item", fill=(0, 0, 0), font=font_bold)
-        draw.text((350, y_offset), "Qty", fill=(0, 0, 0), font=font_bold)
-        draw.text((400, y_offset), "Price", fill=(0, 0, 0), font=font_bold)
-        draw.text((500, y_offset), "Total", fill=(0, 0, 0), font=font_bold)
-        y_offset += 30
-    
-        for medicine, quantity, price, total in bill_data:
-            name_lines = [medicine[i:i+30] for i in range(0, len(medicine), 30)]
-            for i, line in enumerate(name_lines):
-                draw.text((50, y_offset + (i*25)), line, fill=(0, 0, 0), font=font)
-            
-            draw.text((350, y_offset), str(quantity), fill=(0, 0, 0), font=font)
-            draw.text((400, y_offset), f"${price:.2f}", fill=(0, 0, 0), font=font)
-            draw.text((500, y_offset), f"${total:.2f}", fill=(0, 0, 0), font=font)
-            
-            y_offset += 25 * max(1, len(name_lines)) + 10
-    
-        draw.line((50, y_offset, 550, y_offset), fill=(0, 0, 0), width=2)
-        y_offset += 20
-    
-        tax = total_price * 0.10
-        draw.text((400, y_offset), "Subtotal:", fill=(0, 0, 0), font=font)
-        draw.text((500, y_offset), f"${total_price:.2f}", fill=(0, 0, 0), font=font)
-        y_offset += 30
-        
-        draw.text((400, y_offset), "Tax (10%):", fill=(0, 0, 0), font=font)
-        draw.text((500, y_offset), f"${tax:.2f}", fill=(0, 0, 0), font=font)
-        y_offset += 30
-    
-        draw.text((400, y_offset), "TOTAL:", fill=(0, 0, 0), font=font_bold)
-        draw.text((500, y_offset), f"${total_price + tax:.2f}", fill=(0, 0, 0), font=font_bold)
-        y_offset += 40
-    
-        draw.text((125, y_offset), "THANK YOU FOR YOUR PURCHASE", fill=(0, 0, 0), font=font_bold)
-        y_offset += 30
-        draw.text((200, y_offset), "Please come again!", fill=(0, 0, 0), font=font)
-
-        # Stars divider
-        draw.text((125, y_offset + 40), "*" * 50, fill=(0, 0, 0), font=font)
-
-        receipt_dir = os.path.join(os.getcwd(), "receipts")
-        if not os.path.exists(receipt_dir):
-            os.makedirs(receipt_dir)
-            
-        receipt_path = os.path.join(receipt_dir, f"receipt_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-        img.save(receipt_path)
-        messagebox.showinfo("Receipt Saved", f"Receipt saved as:\n{receipt_path}")
\ No newline at end of file
+                self.receipt_status.config(text=f"Receipt printed to {self.printer.print_receipt(receipt)}")
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to print receipt: {e}")
+            return
+        self.receipt_renderer.submit(receipt, self.receipt_store.rendered_path(receipt['receipt_id']))
+
+    def poll_receipts(self):
+        for path, error in self.receipt_renderer.drain():
+            if error:
+                self.receipt_status.config(text=f"Receipt failed: {error}")
+            else:
+                self.receipt_status.config(text=f"Receipt saved as: {path}")
+        for counts, error in self.replay_worker.drain():
+            if error:
+                self.sync_status.config(text=f"Sync failed: {error}")
+            elif counts["conflict"]:
+                self.sync_status.config(
+                    text=f"Synced {counts['replayed']} offline bill(s); {counts['conflict']} need review "
+                         f"(python pos_journal.py conflicts)")
+            elif counts["pending"]:
+                self.sync_status.config(text=f"Offline: {counts['pending']} bill(s) waiting to sync")
+            else:
+                self.sync_status.config(text=f"Synced {counts['replayed']} offline bill(s)")
+        self.frame.after(200, self.poll_receipts)
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import List, Dict, Iterator, Optional
+import numpy as np
+from database import Database
+
+SNAPSHOT_DIR = os.path.join(os.getcwd(), "snapshots", "sales")
+
+# One .npy file per column per month. Money is stored in integer cents so
+# sums are exact; missing customer/employee ids are stored as -1. Counter
+# bills from `sales` are exported alongside order lines with negative ids:
+# item_id is -sale_id and order_id is minus the bill's lowest sale_id.
+COLUMNS = {
+    "item_id": np.int64,
+    "order_id": np.int64,
+    "medicine_id": np.int32,
+    "quantity": np.int32,
+    "unit_price_cents": np.int64,
+    "subtotal_cents": np.int64,
+    "customer_id": np.int64,
+    "employee_id": np.int64,
+    "order_date": "datetime64[s]",
+}
+
+SNAPSHOT_QUERY = """
+    SELECT oi.item_id, oi.order_id, oi.medicine_id, oi.quantity, oi.unit_price, oi.subtotal,
+           o.customer_id, o.employee_id, o.order_date
+    FROM order_items oi
+    JOIN orders o ON oi.order_id = o.order_id
+    WHERE o.order_date >= %s
+    UNION ALL
+    SELECT -s.sale_id, -MIN(s.sale_id) OVER (PARTITION BY COALESCE(s.order_key, s.sale_id)),
+           s.medicine_id, s.quantity, s.unit_price, s.total_price,
+           s.customer_id, NULL, s.sale_date
+    FROM sales s
+    WHERE s.sale_date >= %s
+    ORDER BY order_date, item_id
+"""
+
+
+def _cents(value) -> int:
+    return int(round(value * 100))
+
+
+def _write_partition(root: str, month: str, buffer: Dict[str, list]):
+    """Write one month's columns to a temporary directory and swap it in"""
+    final_dir = os.path.join(root, month)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for column, dtype in COLUMNS.items():
+        np.save(os.path.join(tmp_dir, f"{column}.npy"), np.array(buffer[column], dtype=dtype))
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as handle:
+        json.dump({"month": month, "rows": len(buffer["item_id"]),
+                   "exported_at": datetime.now().isoformat(timespec="seconds")}, handle)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+
+
+def export_snapshot(root: str = SNAPSHOT_DIR, since: datetime = None, full: bool = False) -> List[str]:
+    """Write order and counter-bill history into monthly column files.
+
+    Months already on disk are treated as closed and skipped, except the
+    latest one, which is rewritten because it may still be receiving sales.
+    full re-exports everything. An explicit since is rounded down to the
+    start of its month. Returns the months written.
+    """
+    os.makedirs(root, exist_ok=True)
+    existing = sorted(m for m in os.listdir(root) if len(m) == 7 and not m.endswith(".tmp"))
+    if since is None:
+        if existing and not full:
+            since = datetime.strptime(existing[-1], "%Y-%m")
+        else:
+            since = datetime(1970, 1, 1)
+    # Partitions are whole months and each one written replaces the old
+    # file, so start at the first of since's month or its earlier days are lost
+    since = datetime(since.year, since.month, 1)
+
+    written = []
+    month, buffer = None, None
+    for row in Database.stream_query(SNAPSHOT_QUERY, (since, since), batch_size=5000):
+        row_month = row["order_date"].strftime("%Y-%m")
+        if row_month != month:
+            if buffer:
+                _write_partition(root, month, buffer)
+                written.append(month)
+            month, buffer = row_month, {column: [] for column in COLUMNS}
+        buffer["item_id"].append(row["item_id"])
+        buffer["order_id"].append(row["order_id"])
+        buffer["medicine_id"].append(row["medicine_id"])
+        buffer["quantity"].append(row["quantity"])
+        buffer["unit_price_cents"].append(_cents(row["unit_price"]))
+        buffer["subtotal_cents"].append(_cents(row["subtotal"]))
+        buffer["customer_id"].append(row["customer_id"] if row["customer_id"] is not None else -1)
+        buffer["employee_id"].append(row["employee_id"] if row["employee_id"] is not None else -1)
+        buffer["order_date"].append(np.datetime64(row["order_date"], "s"))
+    if buffer:
+        _write_partition(root, month, buffer)
+        written.append(month)
+    return written
+
+
+class SalesSnapshot:
+    """Monthly column files opened as read-only memory maps.
+
+    Nothing is read until a column is touched, and per-partition arrays are
+    views straight onto the page cache, so repeated analysis runs work at
+    disk speed without a database connection.
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR, months: List[str] = None, columns: List[str] = None):
+        if not os.path.isdir(root):
+            raise ValueError(f"No sales snapshot found at {root}")
+        available = sorted(m for m in os.listdir(root) if len(m) == 7 and not m.endswith(".tmp"))
+        self.months = [m for m in available if months is None or m in months]
+        self.columns = columns or list(COLUMNS)
+        self.partitions = {
+            month: {
+                column: np.load(os.path.join(root, month, f"{column}.npy"), mmap_mode="r")
+                for column in self.columns
+            }
+            for month in self.months
+        }
+
+    def __len__(self) -> int:
+        return sum(len(p[self.columns[0]]) for p in self.partitions.values())
+
+    def iter_partitions(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield each month's zero-copy column arrays in date order"""
+        for month in self.months:
+            yield self.partitions[month]
+
+    def column(self, name: str) -> np.ndarray:
+        """One column across all selected months; a copy unless there is only one"""
+        parts = [self.partitions[month][name] for month in self.months]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.array([], dtype=COLUMNS[name])
+
+    def to_dataframe(self, months: Optional[List[str]] = None):
+        """Materialise the selected months as a pandas DataFrame"""
+        import pandas as pd
+        frames = [pd.DataFrame({c: self.partitions[m][c] for c in self.columns})
+                  for m in (months or self.months)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.columns)
+
+
+def units_by_medicine(snapshot: SalesSnapshot) -> Dict[int, int]:
+    """Units sold per medicine, summed partition by partition without copying"""
+    totals = np.zeros(0, dtype=np.int64)
+    for part in snapshot.iter_partitions():
+        counts = np.bincount(part["medicine_id"], weights=part["quantity"]).astype(np.int64)
+        if len(counts) > len(totals):
+            totals = np.pad(totals, (0, len(counts) - len(totals)))
+        totals[:len(counts)] += counts
+    ids = np.flatnonzero(totals)
+    return dict(zip(ids.tolist(), totals[ids].tolist()))
+
+
+def revenue_by_month(snapshot: SalesSnapshot) -> Dict[str, float]:
+    """Item revenue per month, in currency units"""
+    return {
+        month: int(np.sum(part["subtotal_cents"], dtype=np.int64)) / 100
+        for month, part in zip(snapshot.months, snapshot.iter_partitions())
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export sales history to memory-mappable column files")
+    parser.add_argument("--root", default=SNAPSHOT_DIR)
+    parser.add_argument("--full", action="store_true", help="Re-export every month")
+    args = parser.parse_args()
+
+    months_written = export_snapshot(args.root, full=args.full)
+    print(f"Wrote {len(months_written)} monthly partitions to {args.root}")
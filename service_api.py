@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+from database import (Database, DatabaseUnavailable, Medicine, Customer, Order, Prescription, Supplier,
+                      Employee, Sale, Stock, PurchaseOrder)
+from change_feed import ChangeFeed, ChangeLog, WATCHED
+
+HOST = "127.0.0.1"
+PORT = 8765
+POOL_SIZE = 10
+CACHE_TTL = 5.0
+BATCH_SIZE = 50
+BATCH_WAIT = 0.02
+
+# One process owns the connection pool for every terminal. Terminals call
+#
+#     POST /rpc/<Model>/<method>   {"args": [...], "kwargs": {...}}
+#
+# and get {"result": ...} or {"error": ..., "type": ...} back. Only the
+# methods listed in METHODS are callable. Reads are cached for CACHE_TTL
+# seconds and dropped as soon as a write touches the same tables; checkouts
+# are group-committed by CheckoutBatcher. The service runs the only change
+# feed; terminals read it through Changes.since. Set PHARMACY_SERVICE_TOKEN
+# on both ends to require a shared token.
+
+MODELS = {model.__name__: model for model in (Medicine, Customer, Order, Prescription, Supplier, Employee, Sale,
+                                              Stock, PurchaseOrder)}
+
+MODEL_READS = {"get_all", "get_by_id", "find_by_key"}
+# Reads are cached; anything else is a write and invalidates the cache
+READS = MODEL_READS | {"get_page", "get_items", "get_sku_rows", "get_expiring", "is_referenced",
+                       "get_levels", "get_level", "check_low_stock", "get_open"}
+METHODS = {
+    "Medicine": MODEL_READS | {"get_sku_rows", "get_expiring", "is_referenced", "create", "update", "delete"},
+    "Customer": MODEL_READS | {"create", "update", "delete", "add_loyalty_points"},
+    "Order": MODEL_READS | {"create_with_details", "delete_by_customer_id"},
+    "Prescription": MODEL_READS | {"get_page", "get_items", "create", "update", "delete", "delete_by_customer_id"},
+    "Supplier": MODEL_READS | {"create", "update", "delete"},
+    "Employee": MODEL_READS | {"create", "update", "delete"},
+    "Sale": {"record_bill"},
+    "Stock": {"get_levels", "get_level", "check_low_stock", "update_levels"},
+    "PurchaseOrder": {"get_open", "get_items", "generate", "mark_sent", "receive"},
+}
+
+# Cached models to drop when the change feed reports a write made elsewhere
+TABLE_MODELS = {
+    "medicines": "Medicine",
+    "stock": "Stock",
+    "customers": "Customer",
+    "suppliers": "Supplier",
+    "employees": "Employee",
+    "orders": "Order",
+    "prescriptions": "Prescription",
+}
+
+# Cached reads of these models go stale when the key model is written
+INVALIDATES = {
+    "Medicine": {"Medicine", "Stock", "Prescription", "PurchaseOrder"},
+    "Customer": {"Customer", "Order", "Prescription"},
+    "Order": {"Order", "Medicine", "Customer", "Stock"},
+    "Prescription": {"Prescription", "Medicine"},
+    "Supplier": {"Supplier", "Medicine", "PurchaseOrder"},
+    "Employee": {"Employee", "Order"},
+    "Sale": {"Medicine", "Customer", "Stock"},
+    "Stock": {"Stock", "Medicine"},
+    "PurchaseOrder": {"PurchaseOrder", "Stock", "Medicine"},
+}
+
+
+def encode(value):
+    """json.dumps default: tag dates and decimals so decode() restores their types"""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def decode(obj: Dict):
+    """json.loads object_hook matching encode()"""
+    if len(obj) == 1:
+        if "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+        if "$decimal" in obj:
+            return Decimal(obj["$decimal"])
+    return obj
+
+
+class ResultCache:
+    """Read results shared by every terminal, keyed by model, method and arguments"""
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, tuple]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, key: str):
+        with self._lock:
+            entry = self.entries.get(model, {}).get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return True, entry[1]
+        return False, None
+
+    def put(self, model: str, key: str, value):
+        with self._lock:
+            self.entries.setdefault(model, {})[key] = (time.monotonic(), value)
+
+    def invalidate(self, models):
+        with self._lock:
+            for model in models:
+                self.entries.pop(model, None)
+
+
+class CheckoutBatcher:
+    """Collects concurrent checkouts and writes them with one Sale.record_bills commit.
+
+    A batch closes after BATCH_SIZE bills or BATCH_WAIT seconds, whichever
+    comes first, so a lone checkout waits at most BATCH_WAIT.
+    """
+
+    def __init__(self, flush: Callable[[List[tuple]], List] = None, batch_size: int = BATCH_SIZE,
+                 wait: float = BATCH_WAIT):
+        self.flush = flush or Sale.record_bills
+        self.batch_size = batch_size
+        self.wait = wait
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def submit(self, order_key: str, lines: List, customer_id: int = None, sale_date: datetime = None) -> bool:
+        future = Future()
+        self.jobs.put(((order_key, [tuple(line) for line in lines], customer_id, sale_date), future))
+        return future.result()
+
+    def _work(self):
+        while True:
+            batch = [self.jobs.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.jobs.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = Database.run_with_retries(lambda: self.flush([bill for bill, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class PharmacyService:
+    def __init__(self, pool_size: int = POOL_SIZE, cache_ttl: float = CACHE_TTL):
+        Database.initialize_pool(pool_size)
+        self.cache = ResultCache(cache_ttl)
+        self.batcher = CheckoutBatcher()
+        # One connection stays free for the checkout batcher
+        self.slots = threading.BoundedSemaphore(pool_size - 1)
+        # Writes that bypass the service (scripts, terminals not in client
+        # mode) reach the cache through the change feed, and every change is
+        # kept in change_log for the terminals' views
+        self.change_feed = ChangeFeed()
+        self.change_log = ChangeLog()
+        for table, model in TABLE_MODELS.items():
+            self.change_feed.subscribe(table, lambda row_id, row, model=model: self.cache.invalidate(INVALIDATES[model]))
+        for table in WATCHED:
+            self.change_feed.subscribe(table, lambda row_id, row, table=table: self.change_log.record(table, row_id, row))
+        self.change_feed.start()
+
+    def call(self, model: str, method: str, args: List, kwargs: Dict):
+        if model == "Changes" and method == "since":
+            return self.change_log.since(*args, **kwargs)
+        if method not in METHODS.get(model, ()):
+            raise PermissionError(f"{model}.{method} is not available")
+        if model == "Sale":
+            self.cache.invalidate(INVALIDATES[model])
+            result = self.batcher.submit(*args, **kwargs)
+            self.cache.invalidate(INVALIDATES[model])
+            return result
+
+        if method in READS:
+            key = json.dumps([method, args, kwargs], default=encode, sort_keys=True)
+            hit, value = self.cache.get(model, key)
+            if hit:
+                return value
+            with self.slots:
+                value = getattr(MODELS[model], method)(*args, **kwargs)
+            self.cache.put(model, key, value)
+            return value
+
+        with self.slots:
+            try:
+                return getattr(MODELS[model], method)(*args, **kwargs)
+            finally:
+                self.cache.invalidate(INVALIDATES[model])
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service: PharmacyService = None
+    token: str = None
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, default=encode).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"result": "ok"})
+        else:
+            self._reply(404, {"error": "Not found", "type": "LookupError"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "rpc":
+            self._reply(404, {"error": "Not found", "type": "LookupError"})
+            return
+        if self.token and self.headers.get("X-Pharmacy-Token") != self.token:
+            self._reply(403, {"error": "Invalid service token", "type": "PermissionError"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}", object_hook=decode)
+            result = self.service.call(parts[1], parts[2], request.get("args", []), request.get("kwargs", {}))
+            self._reply(200, {"result": result})
+        except PermissionError as e:
+            self._reply(403, {"error": str(e), "type": "PermissionError"})
+        except DatabaseUnavailable as e:
+            self._reply(503, {"error": str(e), "type": "DatabaseUnavailable"})
+        except Exception as e:
+            if Database.is_unreachable(e):
+                # Terminals journal the work and replay it once the service answers 200 again
+                self._reply(503, {"error": str(e), "type": "DatabaseUnavailable"})
+            else:
+                self._reply(400 if isinstance(e, ValueError) else 500, {"error": str(e), "type": type(e).__name__})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = HOST, port: int = PORT, pool_size: int = POOL_SIZE):
+    ServiceHandler.service = PharmacyService(pool_size)
+    ServiceHandler.token = os.environ.get("PHARMACY_SERVICE_TOKEN")
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    print(f"Pharmacy service listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the pharmacy models to Tk terminals over HTTP/JSON")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.pool_size)
@@ -0,0 +1,101 @@
+import http.client
+import json
+import os
+import threading
+from urllib.parse import urlparse
+import mysql.connector
+from database import DatabaseUnavailable
+from service_api import encode, decode
+from change_feed import ChangeFeed
+
+SERVICE_URL = os.environ.get("PHARMACY_SERVICE_URL")
+TIMEOUT = 10
+
+ERROR_TYPES = {"ValueError": ValueError, "PermissionError": PermissionError,
+               "DatabaseUnavailable": DatabaseUnavailable,
+               "IntegrityError": mysql.connector.IntegrityError, "DataError": mysql.connector.DataError}
+
+
+class ServiceClient:
+    """Calls service_api over one kept-alive HTTP connection per thread"""
+
+    def __init__(self, url: str = SERVICE_URL, token: str = None, timeout: float = TIMEOUT):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.token = token or os.environ.get("PHARMACY_SERVICE_TOKEN")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def call(self, model: str, method: str, *args, **kwargs):
+        body = json.dumps({"args": args, "kwargs": kwargs}, default=encode)
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["X-Pharmacy-Token"] = self.token
+        for attempt in range(2):
+            reused = getattr(self._local, "conn", None) is not None
+            try:
+                conn = self._connection()
+                conn.request("POST", f"/rpc/{model}/{method}", body, headers)
+                reply = json.loads(conn.getresponse().read(), object_hook=decode)
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._local.conn = None
+                # The server closes idle kept-alive connections; retry those
+                # once on a fresh connection before giving up
+                if attempt == 0 and reused and isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError)):
+                    continue
+                # Counts as unreachable, so checkouts fall back to the offline journal
+                raise DatabaseUnavailable(f"Pharmacy service unreachable: {e}")
+        if "error" in reply:
+            raise ERROR_TYPES.get(reply["type"], Exception)(reply["error"])
+        return reply["result"]
+
+
+class RemoteModel:
+    """Stands in for a database model class; every classmethod call goes to the service"""
+
+    def __init__(self, client: ServiceClient, name: str):
+        self.client = client
+        self.__name__ = name
+
+    def __getattr__(self, method: str):
+        return lambda *args, **kwargs: self.client.call(self.__name__, method, *args, **kwargs)
+
+
+class RemoteChangeFeed(ChangeFeed):
+    """ChangeFeed fed from the service's change log instead of polling MySQL.
+
+    The watermark is the log position returned by Changes.since. When the
+    log no longer reaches back to it, every subscribed table is reset.
+    """
+
+    def __init__(self, service: ServiceClient = None, **kwargs):
+        super().__init__(**kwargs)
+        self.client = service or client
+
+    def poll(self):
+        tables = [table for table, callbacks in self.subscribers.items() if callbacks]
+        reply = self.client.call("Changes", "since", self.watermark, tables)
+        self.watermark = reply["seq"]
+        if reply.get("reset"):
+            return [(table, None, None) for table in tables]
+        return [tuple(change) for change in reply["changes"]]
+
+
+client = ServiceClient(SERVICE_URL) if SERVICE_URL else None
+
+Medicine = RemoteModel(client, "Medicine")
+Customer = RemoteModel(client, "Customer")
+Order = RemoteModel(client, "Order")
+Prescription = RemoteModel(client, "Prescription")
+Supplier = RemoteModel(client, "Supplier")
+Employee = RemoteModel(client, "Employee")
+Sale = RemoteModel(client, "Sale")
+Stock = RemoteModel(client, "Stock")
+PurchaseOrder = RemoteModel(client, "PurchaseOrder")
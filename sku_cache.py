@@ -0,0 +1,110 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from backend import Medicine
+
+SNAPSHOT_PATH = os.path.join(os.getcwd(), "journal", "sku_snapshot.json")
+
+
+class SkuCache:
+    """Medicines in memory, keyed by barcode/SKU and by id, for scan-to-bill.
+
+    Each entry is a dict with medicine_id, sku, name, price and available.
+    The counter's own sales are applied with adjust(); changes made
+    elsewhere are picked up by refresh(), which only reads rows whose
+    updated_at moved since the previous call.
+    """
+
+    # Overlap between refreshes so a row committed just as the previous
+    # refresh ran is not missed
+    REFRESH_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, snapshot_path: str = SNAPSHOT_PATH):
+        self.by_sku: Dict[str, Dict] = {}
+        self.by_id: Dict[int, Dict] = {}
+        self.refreshed_at: Optional[datetime] = None
+        self.snapshot_path = snapshot_path
+
+    def load(self):
+        self.by_sku, self.by_id = {}, {}
+        self._apply(Medicine.get_sku_rows())
+
+    def refresh(self) -> int:
+        """Fold in medicines changed since the last load or refresh; returns how many"""
+        if self.refreshed_at is None:
+            self.load()
+            return len(self.by_id)
+        rows = Medicine.get_sku_rows(self.refreshed_at - self.REFRESH_OVERLAP)
+        self._apply(rows)
+        return len(rows)
+
+    def _remove(self, medicine_id: int):
+        old = self.by_id.pop(medicine_id, None)
+        if old and old['sku'] and self.by_sku.get(old['sku']) is old:
+            del self.by_sku[old['sku']]
+
+    def _store(self, row: Dict):
+        self._remove(row['medicine_id'])
+        entry = {
+            'medicine_id': row['medicine_id'],
+            'sku': row['sku'],
+            'name': row['name'],
+            'price': float(row['price']),
+            'available': row['quantity'],
+        }
+        self.by_id[row['medicine_id']] = entry
+        if row['sku']:
+            self.by_sku[row['sku']] = entry
+
+    def _apply(self, rows: List[Dict]):
+        for row in rows:
+            self._store(row)
+        if rows:
+            self.refreshed_at = rows[0]['server_time']
+        elif self.refreshed_at is None:
+            self.refreshed_at = datetime.now()
+
+    def apply_change(self, medicine_id: int, row: Optional[Dict]):
+        """change_feed subscriber: replace or drop one medicine"""
+        if row is None:
+            self._remove(medicine_id)
+        else:
+            self._store(row)
+
+    def lookup(self, code: str) -> Optional[Dict]:
+        """Find a medicine by scanned barcode/SKU"""
+        return self.by_sku.get(code.strip())
+
+    def get(self, medicine_id: int) -> Optional[Dict]:
+        return self.by_id.get(int(medicine_id))
+
+    def adjust(self, medicine_id: int, delta: int):
+        """Apply a stock movement already committed to the database"""
+        entry = self.by_id.get(int(medicine_id))
+        if entry:
+            entry['available'] += delta
+
+    def in_stock(self) -> List[Dict]:
+        return sorted((e for e in self.by_id.values() if e['available'] > 0), key=lambda e: e['name'])
+
+    def save_snapshot(self):
+        """Write the cache to disk so an offline restart can still check stock"""
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump({"refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+                       "medicines": list(self.by_id.values())}, handle)
+        os.replace(tmp, self.snapshot_path)
+
+    def load_snapshot(self) -> bool:
+        """Restore the last saved snapshot; False if there is none"""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as handle:
+                snapshot = json.load(handle)
+        except FileNotFoundError:
+            return False
+        self.by_id = {entry['medicine_id']: entry for entry in snapshot["medicines"]}
+        self.by_sku = {entry['sku']: entry for entry in snapshot["medicines"] if entry['sku']}
+        self.refreshed_at = datetime.fromisoformat(snapshot["refreshed_at"]) if snapshot["refreshed_at"] else None
+        return True
@@ -1,11 +1,27 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import Stock, Medicine, Database
+from tkinter import ttk, messagebox, simpledialog
+from backend import Stock, PurchaseOrder
+from change_feed import TreeviewSync
+from events import bus, MedicineChanged, StockMoved
 
 class StockManager:
     def __init__(self, parent_frame):
         self.frame = ttk.Frame(parent_frame)
         self.setup_ui()
+        self.stock_sync = TreeviewSync(
+            self.stock_tree, self.format_row,
+            include=lambda item: not self.search_entry.get(),
+            fetch=Stock.get_level
+        )
+        bus.subscribe(StockMoved, self.on_stock_moved)
+        bus.subscribe(MedicineChanged, lambda event: self.stock_sync.refresh(event.medicine_id))
+
+    def on_stock_moved(self, event):
+        self.stock_sync.refresh(event.medicine_id)
+        # Sales only move medicines.quantity; receipts and recounts change
+        # the stock table the alerts are computed from
+        if event.reason in ("receipt", "adjustment"):
+            self.load_low_stock()
 
     def setup_ui(self):
         # Low stock alert frame
@@ -18,8 +34,14 @@ class StockManager:
         self.alert_tree.heading("Reorder", text="Reorder Level")
         self.alert_tree.pack(fill="both", expand=True)
         
-        ttk.Button(alert_frame, text="Refresh Alerts", 
-                  command=self.load_low_stock).pack(pady=5)
+        alert_btn_frame = ttk.Frame(alert_frame)
+        alert_btn_frame.pack(pady=5)
+        ttk.Button(alert_btn_frame, text="Refresh Alerts", 
+                  command=self.load_low_stock).pack(side="left", padx=5)
+        ttk.Button(alert_btn_frame, text="Generate Purchase Orders",
+                  command=self.create_purchase_orders).pack(side="left", padx=5)
+        ttk.Button(alert_btn_frame, text="Receive PO",
+                  command=self.receive_purchase_order).pack(side="left", padx=5)
         
         # Stock management frame
         stock_frame = ttk.LabelFrame(self.frame, text="Stock Management", padding=10)
@@ -87,34 +109,60 @@ class StockManager:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load low stock alerts: {str(e)}")
 
+    def create_purchase_orders(self):
+        try:
+            po_ids, plan, unassigned = PurchaseOrder.generate()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to generate purchase orders: {str(e)}")
+            return
+
+        if not po_ids and not unassigned:
+            messagebox.showinfo("Purchase Orders", "Nothing needs reordering")
+            return
+        message = f"Created {len(po_ids)} purchase orders covering {sum(len(l) for l in plan.values())} medicines"
+        if unassigned:
+            names = ", ".join(item['name'] for item in unassigned[:10])
+            message += f"\n\nNo supplier set for {len(unassigned)} medicines: {names}"
+        messagebox.showinfo("Purchase Orders", message)
+        if po_ids and messagebox.askyesno("Purchase Orders", "Mark these purchase orders as sent to the suppliers now?"):
+            PurchaseOrder.mark_sent(po_ids)
+
+    def receive_purchase_order(self):
+        open_orders = PurchaseOrder.get_open()
+        if not open_orders:
+            messagebox.showinfo("Receive PO", "There are no open purchase orders")
+            return
+        listing = "\n".join(f"{po['purchase_order_id']}: {po['supplier_name']} ({po['lines']} lines)"
+                            for po in open_orders[:15])
+        po_id = simpledialog.askinteger("Receive PO", f"Open purchase orders:\n{listing}\n\nPO number to receive:")
+        if po_id is None:
+            return
+        try:
+            units = PurchaseOrder.receive(po_id)
+            messagebox.showinfo("Success", f"Received {units} units into stock")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to receive purchase order: {str(e)}")
+
     def load_stock(self, search_term=None):
         for row in self.stock_tree.get_children():
             self.stock_tree.delete(row)
         
-        query = """SELECT m.name, s.quantity_in_stock, s.reorder_level, s.last_updated 
-                  FROM stock s JOIN medicines m ON s.medicine_id = m.medicine_id"""
-        
-        if search_term:
-            query += " WHERE m.name LIKE %s"
-            try:
-                stock_items = Database.execute_query(query, (f"%{search_term}%",), fetch=True)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load stock: {str(e)}")
-                return
-        else:
-            try:
-                stock_items = Database.execute_query(query, fetch=True)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load stock: {str(e)}")
-                return
+        try:
+            stock_items = Stock.get_levels(search_term)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load stock: {str(e)}")
+            return
         
         for item in stock_items:
-            self.stock_tree.insert("", "end", values=(
-                item['name'],
-                item['quantity_in_stock'],
-                item['reorder_level'],
-                item['last_updated'].strftime("%Y-%m-%d") if item['last_updated'] else "N/A"
-            ))
+            self.stock_tree.insert("", "end", iid=str(item['medicine_id']), values=self.format_row(item))
+
+    def format_row(self, item):
+        return (
+            item['name'],
+            item['quantity_in_stock'],
+            item['reorder_level'],
+            item['last_updated'].strftime("%Y-%m-%d") if item['last_updated'] else "N/A"
+        )
 
     def search_stock(self, event=None):
         self.load_stock(self.search_entry.get())
@@ -133,7 +181,8 @@ class StockManager:
         if not selected:
             return
         
-        medicine_name = self.stock_tree.item(selected[0])['values'][0]
+        # Stock rows are keyed by medicine id
+        medicine_id = int(selected[0])
         new_qty = self.qty_entry.get()
         new_reorder = self.reorder_entry.get()
         
@@ -141,24 +190,10 @@ class StockManager:
             new_qty = int(new_qty)
             new_reorder = int(new_reorder)
             
-            # Get medicine ID
-            med = next((m for m in Medicine.get_all() if m['name'] == medicine_name), None)
-            if not med:
-                messagebox.showerror("Error", "Medicine not found")
-                return
-            
-            # Update stock
+            # Update stock; the StockMoved event refreshes the row and alerts
             try:
-                Database.execute_query(
-                    """UPDATE stock SET quantity_in_stock = %s, 
-                      reorder_level = %s, last_updated = CURRENT_DATE 
-                      WHERE medicine_id = %s""",
-                    (new_qty, new_reorder, med['medicine_id'])
-                )
-                
+                Stock.update_levels(medicine_id, new_qty, new_reorder)
                 messagebox.showinfo("Success", "Stock updated successfully")
-                self.load_low_stock()
-                self.load_stock()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to update stock: {str(e)}")
             
@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from database import Supplier
+from backend import Supplier
+from change_feed import TreeviewSync
 
 class SupplierManager:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, change_feed=None):
         self.frame = ttk.Frame(parent_frame)
         self.current_supplier = None
         self.setup_ui()
+        if change_feed:
+            change_feed.subscribe("suppliers", TreeviewSync(
+                self.tree, self.format_row, include=lambda sup: not self.search_entry.get()
+            ), on_reset=self.search_suppliers)
 
     def setup_ui(self):
         # Search frame
@@ -20,7 +25,7 @@ class SupplierManager:
         
         # Supplier treeview
         self.tree = ttk.Treeview(self.frame, columns=(
-            "ID", "Name", "Contact", "Phone", "Email", "Country", "Terms"
+            "ID", "Name", "Contact", "Phone", "Email", "Country", "Terms", "Lead Time"
         ), show="headings", selectmode="browse")
         
         columns = [
@@ -30,7 +35,8 @@ class SupplierManager:
             ("Phone", "Phone", 100),
             ("Email", "Email", 150),
             ("Country", "Country", 100),
-            ("Terms", "Payment Terms", 120)
+            ("Terms", "Payment Terms", 120),
+            ("Lead Time", "Lead Time (days)", 110)
         ]
         
         for col_id, col_text, width in columns:
@@ -63,18 +69,23 @@ class SupplierManager:
         try:
             suppliers = Supplier.get_all(search_term)
             for sup in suppliers:
-                self.tree.insert("", "end", values=(
-                    sup['supplier_id'],
-                    sup['name'],
-                    sup['contact_person'] or "N/A",
-                    sup['phone'] or "N/A",
-                    sup['email'] or "N/A",
-                    sup['country'] or "N/A",
-                    sup['payment_terms'] or "N/A"
-                ))
+                self.tree.insert("", "end", iid=str(sup['supplier_id']), values=self.format_row(sup))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load suppliers: {str(e)}")
 
+    def format_row(self, sup):
+        return (
+            sup['supplier_id'],
+            sup['name'],
+            sup['contact_person'] or "N/A",
+            sup['phone'] or "N/A",
+            sup['email'] or "N/A",
+            sup['country'] or "N/A",
+            sup['payment_terms'] or "N/A",
+            f"{sup['lead_time_mean_days']:.1f} ± {sup['lead_time_std_days'] or 0:.1f}"
+            if sup.get('lead_time_mean_days') is not None else "N/A"
+        )
+
     def search_suppliers(self, event=None):
         self.load_suppliers(self.search_entry.get())
 
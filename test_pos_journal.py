@@ -0,0 +1,76 @@
+import mysql.connector
+import pytest
+import database
+import pos_journal
+from database import DatabaseUnavailable
+from pos_journal import OfflineJournal
+
+
+def make_journal(tmp_path, keys):
+    journal = OfflineJournal(str(tmp_path))
+    for key in keys:
+        journal.append(key, [(1, 2, 5.0, 10.0)], customer_id=7)
+    return journal
+
+
+def fake_record_bill(monkeypatch, outcomes):
+    """Sale.record_bill stand-in: True/False for replayed/duplicate, or an exception to raise"""
+    calls = []
+
+    def record_bill(order_key, lines, customer_id=None, sale_date=None):
+        calls.append(order_key)
+        outcome = outcomes[order_key]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(pos_journal.Sale, "record_bill", record_bill)
+    monkeypatch.setattr(database.time, "sleep", lambda seconds: None)
+    return calls
+
+
+def test_replay_settles_replayed_duplicate_and_conflicts(tmp_path, monkeypatch):
+    journal = make_journal(tmp_path, ["a", "b", "c", "d"])
+    fake_record_bill(monkeypatch, {
+        "a": True,
+        "b": False,
+        "c": ValueError("Not enough stock for 1"),
+        "d": mysql.connector.IntegrityError(msg="Cannot add or update a child row", errno=1452),
+    })
+
+    counts = journal.replay(batch_size=3)
+
+    assert counts == {"replayed": 1, "duplicate": 1, "conflict": 2, "pending": 0}
+    assert journal.pending() == []
+    conflicts = journal.conflicts()
+    assert [c["order_key"] for c in conflicts] == ["c", "d"]
+    assert "Not enough stock" in conflicts[0]["error"]
+    assert conflicts[0]["lines"] == [[1, 2, 5.0, 10.0]]
+
+
+def test_replay_stops_when_database_unavailable(tmp_path, monkeypatch):
+    journal = make_journal(tmp_path, ["a", "b", "c"])
+    calls = fake_record_bill(monkeypatch, {
+        "a": True,
+        "b": DatabaseUnavailable("Pharmacy service unreachable"),
+        "c": True,
+    })
+
+    counts = journal.replay()
+
+    assert counts == {"replayed": 1, "duplicate": 0, "conflict": 0, "pending": 2}
+    assert [entry["order_key"] for entry in journal.pending()] == ["b", "c"]
+    assert journal.conflicts() == []
+    # Retried as transient, then the rest of the journal was left alone
+    assert calls == ["a", "b", "b", "b"]
+
+
+def test_replay_raises_unexpected_errors_and_keeps_bill(tmp_path, monkeypatch):
+    journal = make_journal(tmp_path, ["a", "b"])
+    fake_record_bill(monkeypatch, {"a": True, "b": RuntimeError("boom")})
+
+    with pytest.raises(RuntimeError):
+        journal.replay()
+
+    assert [entry["order_key"] for entry in journal.pending()] == ["b"]
+    assert journal.conflicts() == []
@@ -0,0 +1,33 @@
+import numpy as np
+from rfm import quantile_scores, score
+
+
+def test_quantile_scores_spread_distinct_values():
+    values = np.arange(100)
+    scores = quantile_scores(values)
+    assert scores.min() == 1 and scores.max() == 5
+    assert np.bincount(scores)[1:].tolist() == [20, 20, 20, 20, 20]
+    assert quantile_scores(values, reverse=True)[0] == 5
+
+
+def test_quantile_scores_heavy_ties():
+    # 85% one-time buyers, 10% with two orders, 5% with five
+    frequency = np.array([1] * 85 + [2] * 10 + [5] * 5)
+    scores = quantile_scores(frequency)
+    assert set(scores[:85]) == {1}
+    assert set(scores[85:95]) == {5}
+    assert set(scores[95:]) == {5}
+
+
+def test_one_time_recent_buyers_are_new():
+    n = 100
+    rfm = {
+        "customer_id": np.arange(n),
+        "recency_days": np.arange(n),
+        "frequency": np.array([1] * 85 + [2] * 10 + [5] * 5),
+        "monetary": np.linspace(10, 1000, n),
+    }
+    result = score(rfm)
+    assert (result["f"][:85] == 1).all()
+    assert "New" in set(result["segment"][:20])
+    assert not {"Champions", "Loyal"} & set(result["segment"][:85])
@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+import thermal_printer
+from receipts import build_receipt
+from thermal_printer import get_terminal_printer, INIT, FEED_AND_CUT, BOLD_ON, BOLD_OFF
+
+
+def sample_receipt():
+    receipt = build_receipt([("Paracetamol 500mg", 2, 1.5, 3.0), ("Ibuprofen 200mg", 1, 4.25, 4.25)], 7.25,
+                            {"name": "Jane Doe", "phone": "555-0100"}, datetime(2024, 3, 1, 9, 30))
+    return dict(receipt, receipt_id="20240301-abc123")
+
+
+def write_config(tmp_path, entry):
+    config = tmp_path / "printers.json"
+    config.write_text(json.dumps({"counter-1": entry}))
+    return str(config)
+
+
+def test_escpos_receipt_appended_to_device_file(tmp_path):
+    device = tmp_path / "lp0"
+    printer = get_terminal_printer("counter-1", write_config(tmp_path, {"format": "escpos", "device": str(device),
+                                                                       "width": 32}))
+
+    assert printer.print_receipt(sample_receipt()) == str(device)
+    printer.print_receipt(sample_receipt())
+
+    total = f"${sample_receipt()['total']:.2f}".encode()
+    data = device.read_bytes()
+    first = data[:len(data) // 2]
+    assert data.count(INIT) == 2 and data.count(FEED_AND_CUT) == 2
+    assert first.startswith(INIT) and first.endswith(FEED_AND_CUT)
+    lines = first.split(b"\n")
+    assert b"Receipt: 20240301-abc123" in lines
+    assert b"Customer: Jane Doe" in lines
+    assert b"-" * 32 in lines
+    # Amounts are right-aligned to the configured width
+    assert b"  2 x $1.50" + b" " * 16 + b"$3.00" in lines
+    assert BOLD_ON + b"TOTAL:" + b" " * (32 - 6 - len(total)) + total + b"\n" + BOLD_OFF in first
+    assert all(len(line) <= 32 for line in lines if not line.startswith((b"\x1b", b"\x1d")))
+
+
+def test_text_receipt_spooled_one_file_each(tmp_path):
+    spool = tmp_path / "spool" / "counter-1"
+    printer = get_terminal_printer("counter-1", write_config(tmp_path, {"format": "text",
+                                                                       "device": str(spool) + "/"}))
+
+    target = printer.print_receipt(sample_receipt())
+
+    assert target == str(spool / "20240301-abc123.txt")
+    text = (spool / "20240301-abc123.txt").read_text(encoding="utf-8")
+    assert "Paracetamol 500mg" in text and INIT.decode() not in text
+
+
+def test_png_or_unconfigured_terminal_has_no_printer(tmp_path, monkeypatch):
+    monkeypatch.setattr(thermal_printer, "terminal_name", lambda: "counter-9")
+    assert get_terminal_printer(config_path=write_config(tmp_path, {"format": "escpos", "device": "x"})) is None
+    assert get_terminal_printer("counter-1", write_config(tmp_path, {"format": "png"})) is None
+    assert get_terminal_printer("counter-1", str(tmp_path / "missing.json")) is None
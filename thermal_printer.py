@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import socket
+import uuid
+from typing import Dict, Optional
+from receipts import PHARMACY_NAME, PHARMACY_ADDRESS, PHARMACY_PHONE, TAX_RATE, render_text
+
+PRINTER_CONFIG = os.path.join(os.getcwd(), "printers.json")
+
+# printers.json maps a terminal name to its receipt printer:
+#
+#     {"counter-1": {"format": "escpos", "device": "/dev/usb/lp0", "width": 42},
+#      "counter-2": {"format": "text", "device": "spool/counter-2/"},
+#      "default":   {"format": "png"}}
+#
+# device is a character device or file that receipts are appended to, or a
+# directory (trailing slash) that gets one spool file per receipt. The
+# terminal name comes from PHARMACY_TERMINAL, falling back to the host name.
+
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+BOLD_ON = ESC + b"E\x01"
+BOLD_OFF = ESC + b"E\x00"
+ALIGN_LEFT = ESC + b"a\x00"
+ALIGN_CENTER = ESC + b"a\x01"
+DOUBLE_SIZE = GS + b"!\x11"
+NORMAL_SIZE = GS + b"!\x00"
+FEED_AND_CUT = GS + b"V\x42\x03"
+
+ENCODING = "cp437"
+
+
+def _line(text: str = "") -> bytes:
+    return text.encode(ENCODING, errors="replace") + b"\n"
+
+
+def _columns(left: str, right: str, width: int) -> bytes:
+    return _line(f"{left}{right:>{width - len(left)}}")
+
+
+def format_escpos(receipt: Dict, width: int = 42) -> bytes:
+    """ESC/POS byte stream for a receipt built by receipts.build_receipt"""
+    out = [INIT, ALIGN_CENTER, BOLD_ON, DOUBLE_SIZE, _line(PHARMACY_NAME[:width // 2]), NORMAL_SIZE, BOLD_OFF,
+           _line(PHARMACY_ADDRESS), _line(PHARMACY_PHONE), ALIGN_LEFT,
+           _line(f"Date: {receipt['issued_at'].strftime('%m/%d/%Y %H:%M:%S')}")]
+    if receipt.get("receipt_id"):
+        out.append(_line(f"Receipt: {receipt['receipt_id']}"))
+    customer = receipt.get("customer")
+    if customer:
+        out.append(_line(f"Customer: {customer['name']}"))
+        if customer.get("phone"):
+            out.append(_line(f"Phone: {customer['phone']}"))
+    out.append(_line("-" * width))
+    for medicine, quantity, price, total in receipt["lines"]:
+        out.append(_line(medicine[:width]))
+        out.append(_columns(f"  {quantity} x ${price:.2f}", f"${total:.2f}", width))
+    out.append(_line("-" * width))
+    out.append(_columns("Subtotal:", f"${receipt['subtotal']:.2f}", width))
+    out.append(_columns(f"Tax ({TAX_RATE:.0%}):", f"${receipt['tax']:.2f}", width))
+    out.extend([BOLD_ON, _columns("TOTAL:", f"${receipt['total']:.2f}", width), BOLD_OFF])
+    out.extend([_line(), ALIGN_CENTER, _line("THANK YOU FOR YOUR PURCHASE"), _line("Please come again!"),
+                FEED_AND_CUT])
+    return b"".join(out)
+
+
+class ReceiptPrinter:
+    """Sends text or ESC/POS receipts to a device, file or spool directory"""
+
+    def __init__(self, device: str, fmt: str = "escpos", width: int = 42):
+        if fmt not in ("escpos", "text"):
+            raise ValueError("Printer format must be 'escpos' or 'text'")
+        self.device = device
+        self.format = fmt
+        self.width = width
+
+    def encode(self, receipt: Dict) -> bytes:
+        if self.format == "escpos":
+            return format_escpos(receipt, self.width)
+        return render_text(receipt, self.width).encode("utf-8")
+
+    def print_receipt(self, receipt: Dict) -> str:
+        """Write one receipt and return where it went"""
+        data = self.encode(receipt)
+        if self.device.endswith(("/", os.sep)) or os.path.isdir(self.device):
+            os.makedirs(self.device, exist_ok=True)
+            name = receipt.get("receipt_id") or uuid.uuid4().hex
+            target = os.path.join(self.device, f"{name}.{'bin' if self.format == 'escpos' else 'txt'}")
+            with open(target, "wb") as spool:
+                spool.write(data)
+            return target
+        with open(self.device, "ab") as device:
+            device.write(data)
+        return self.device
+
+
+def terminal_name() -> str:
+    return os.environ.get("PHARMACY_TERMINAL") or socket.gethostname()
+
+
+def get_terminal_printer(terminal: str = None, config_path: str = PRINTER_CONFIG) -> Optional[ReceiptPrinter]:
+    """The configured text/ESC-POS printer for this terminal, or None for PNG receipts"""
+    try:
+        with open(config_path, encoding="utf-8") as handle:
+            config = json.load(handle)
+    except FileNotFoundError:
+        return None
+    entry = config.get(terminal or terminal_name()) or config.get("default")
+    if not entry or entry.get("format", "png") == "png":
+        return None
+    return ReceiptPrinter(entry["device"], entry["format"], entry.get("width", 42))
+
+
+if __name__ == "__main__":
+    from receipt_store import ReceiptStore
+
+    parser = argparse.ArgumentParser(description="Print a stored receipt to a thermal printer or file")
+    parser.add_argument("receipt_id")
+    parser.add_argument("--device", help="Device, file or spool directory (default: this terminal's printer)")
+    parser.add_argument("--format", default="escpos", choices=["escpos", "text"])
+    args = parser.parse_args()
+
+    stored = ReceiptStore().get(args.receipt_id)
+    if stored is None:
+        parser.error(f"No receipt with ID {args.receipt_id}")
+    printer = ReceiptPrinter(args.device, args.format) if args.device else get_terminal_printer()
+    if printer is None:
+        parser.error("No text or ESC/POS printer configured for this terminal; pass --device")
+    print(f"Printed to {printer.print_receipt(stored)}")